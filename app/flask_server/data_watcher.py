@@ -0,0 +1,131 @@
+"""
+Hot reload of the stock_data/ directory without restarting the server
+"""
+import glob
+import hashlib
+import logging
+import os
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+from stock_store import StockStore, parse_stock_file
+
+logger = logging.getLogger(__name__)
+
+
+def _reuse(store: StockStore, file_name: str) -> Tuple[list, str]:
+    """(records, digest) of a file as already loaded in `store`"""
+    source = store.sources[file_name]
+    records = [store.get(name) for name in source.stocks]
+    return [r for r in records if r is not None], source.digest
+
+
+class StockDataWatcher:
+    """Polls a stock_data directory and publishes a new StockStore when files change.
+
+    Changes are detected by (mtime, size) first and confirmed by content hash,
+    so touching a file without editing it does not trigger a rebuild. Only the
+    changed files are parsed again; records of untouched files are reused from
+    the current store. The new store is published with a single reference
+    assignment, which is atomic for readers: they grab `watcher.current` once
+    per request and never observe a half-built universe.
+
+    A file that fails to parse is remembered by content hash and skipped
+    (and logged once) until it changes; a poll whose only changes failed to
+    parse publishes nothing and builds nothing.
+    """
+
+    def __init__(self, directory: str, store: StockStore, interval: float = 5.0,
+                 on_swap: Optional[Callable[[StockStore], None]] = None):
+        self.directory = directory
+        self.interval = interval
+        self.on_swap = on_swap
+        self.current = store
+        self._stop = threading.Event()
+        self._stats: Dict[str, Tuple[int, int]] = {}
+        # File name -> digest of the content that failed to parse
+        self._failed: Dict[str, str] = {}
+        for path in self._json_files():
+            stat = os.stat(path)
+            self._stats[os.path.basename(path)] = (stat.st_mtime_ns, stat.st_size)
+
+    def _json_files(self) -> List[str]:
+        return sorted(glob.glob(os.path.join(self.directory, "*.json")))
+
+    def poll(self) -> bool:
+        """Check the directory once; returns True when a new store was published"""
+        store = self.current
+        stats = {}
+        changed = {}
+        for path in self._json_files():
+            file_name = os.path.basename(path)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            stats[file_name] = (stat.st_mtime_ns, stat.st_size)
+            known = file_name in store.sources or file_name in self._failed
+            if self._stats.get(file_name) == stats[file_name] and known:
+                continue
+            with open(path, "rb") as file:
+                raw = file.read()
+            digest = hashlib.sha1(raw).hexdigest()
+            source = store.sources.get(file_name)
+            if source is not None and source.digest == digest:
+                # Put back as it was when last loaded
+                self._failed.pop(file_name, None)
+            elif self._failed.get(file_name) != digest:
+                changed[file_name] = (raw, digest)
+
+        removed = set(store.sources) - set(stats)
+        self._stats = stats
+        self._failed = {name: digest for name, digest in self._failed.items() if name in stats}
+        if not changed and not removed:
+            return False
+
+        files = {file_name: _reuse(store, file_name) for file_name in store.sources
+                 if file_name not in removed and file_name not in changed}
+        reused = set(files)
+        parsed = 0
+        for file_name, (raw, digest) in changed.items():
+            try:
+                files[file_name] = (parse_stock_file(raw, file_name), digest)
+                self._failed.pop(file_name, None)
+                parsed += 1
+            except ValueError as e:
+                # Keep serving the previous version of a file that is mid-write or malformed;
+                # it is parsed again once its content changes
+                logger.error(f"Error reloading {file_name}: {e}")
+                self._failed[file_name] = digest
+                if file_name in store.sources:
+                    files[file_name] = _reuse(store, file_name)
+                    reused.add(file_name)
+        if not parsed and not removed:
+            return False
+
+        last_modified = max((st[0] for st in stats.values()), default=0) / 1e9 or None
+        file_quality = {file_name: store.file_quality[file_name] for file_name in reused
+                        if file_name in store.file_quality}
+        new_store = StockStore.from_files(files, last_modified=last_modified, file_quality=file_quality)
+        if new_store.version == store.version:
+            return False
+        self.current = new_store
+        logger.info(f"Stock data reloaded: version {store.version} -> {new_store.version}, "
+                    f"{len(changed)} changed, {len(removed)} removed, {len(new_store)} stocks")
+        if self.on_swap:
+            self.on_swap(new_store)
+        return True
+
+    def run(self):
+        """Poll loop; meant to run as a background (green) thread"""
+        while not self._stop.is_set():
+            self._stop.wait(self.interval)
+            if self._stop.is_set():
+                break
+            try:
+                self.poll()
+            except Exception as e:
+                logger.error(f"Stock data watcher error: {e}")
+
+    def stop(self):
+        self._stop.set()
@@ -0,0 +1,54 @@
+"""
+Run independent sections of a report concurrently and assemble them in order
+"""
+import contextvars
+import threading
+from dataclasses import replace
+from typing import Callable, Dict, Mapping, TypeVar
+
+from request_context import current_request, request_scope
+
+T = TypeVar("T")
+
+
+def fan_out(sections: Mapping[str, Callable[[], T]]) -> Dict[str, T]:
+    """Call every section at once and return their results keyed in the order given.
+
+    Each section runs on its own thread, which is a greenlet once eventlet has
+    patched threading, inside a copy of the caller's contextvars so the request
+    deadline still applies. Streaming is switched off within sections because
+    tokens from several LLM calls would interleave. Wall time is that of the
+    slowest section; if any section raises, the first failure in order is
+    re-raised after all of them have finished.
+    """
+    names = list(sections)
+    if len(names) <= 1:
+        return {name: sections[name]() for name in names}
+
+    parent = current_request()
+    results: Dict[str, T] = {}
+    errors: Dict[str, Exception] = {}
+
+    def run(name: str, section: Callable[[], T]):
+        try:
+            if parent is None:
+                results[name] = section()
+            else:
+                with request_scope(replace(parent, on_chunk=None)) as context:
+                    results[name] = section()
+                if context.degraded:
+                    parent.degraded = True
+        except Exception as e:
+            errors[name] = e
+
+    threads = [threading.Thread(target=contextvars.copy_context().run, args=(run, name, sections[name]),
+                                name=f"fan-out:{name}", daemon=True)
+               for name in names]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for name in names:
+        if name in errors:
+            raise errors[name]
+    return {name: results[name] for name in names}
@@ -0,0 +1,70 @@
+"""
+Fiscal year labels ("2023-24") as an ordered value type with O(1) neighbours
+"""
+import re
+from typing import Dict, Optional
+
+_LABEL = re.compile(r"^\s*(\d{4})(?:\s*[-/]\s*(\d{2}|\d{4}))?\s*$")
+_CACHE: Dict[str, "FiscalYear"] = {}
+
+
+class FiscalYear(str):
+    """A fiscal year label that compares by its integer ordinal (the start year).
+
+    It is still a `str`, so it works as a key in the existing `stock['years']`
+    dicts and looks up the same entries as the plain label. Instances are
+    interned: parsing the same label twice returns the same object.
+    """
+
+    ordinal: int
+
+    def __new__(cls, label: str, ordinal: int):
+        obj = super().__new__(cls, label)
+        obj.ordinal = ordinal
+        return obj
+
+    @classmethod
+    def parse(cls, label) -> "FiscalYear":
+        if isinstance(label, FiscalYear):
+            return label
+        label = str(label)
+        cached = _CACHE.get(label)
+        if cached is not None:
+            return cached
+        match = _LABEL.match(label)
+        if not match:
+            raise ValueError(f"Unrecognized fiscal year label: {label!r}")
+        year = _CACHE[label] = cls(label, int(match.group(1)))
+        return year
+
+    @classmethod
+    def of(cls, ordinal: int) -> "FiscalYear":
+        """Canonical "YYYY-YY" fiscal year starting in `ordinal`"""
+        return cls.parse(f"{ordinal}-{(ordinal + 1) % 100:02d}")
+
+    def previous(self) -> "FiscalYear":
+        return FiscalYear.of(self.ordinal - 1)
+
+    def next(self) -> "FiscalYear":
+        return FiscalYear.of(self.ordinal + 1)
+
+    def __lt__(self, other):
+        return self.ordinal < FiscalYear.parse(other).ordinal
+
+    def __le__(self, other):
+        return self.ordinal <= FiscalYear.parse(other).ordinal
+
+    def __gt__(self, other):
+        return self.ordinal > FiscalYear.parse(other).ordinal
+
+    def __ge__(self, other):
+        return self.ordinal >= FiscalYear.parse(other).ordinal
+
+    def __reduce__(self):
+        return FiscalYear.parse, (str(self),)
+
+
+def latest_year(stock) -> Optional[FiscalYear]:
+    """Most recent fiscal year of a stock whose years were sorted at load"""
+    return next(iter(stock['years']), None)
+
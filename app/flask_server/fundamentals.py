@@ -0,0 +1,169 @@
+"""
+Columnar fundamentals store: one dense float64 array shaped stocks x years x metrics
+"""
+from functools import cached_property
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from fiscal_year import FiscalYear
+
+
+def _to_float(value) -> float:
+    """Numeric cell value or NaN for missing / non-numeric entries"""
+    if isinstance(value, bool) or value is None:
+        return np.nan
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        cleaned = str(value).replace('%', '').replace(',', '').strip()
+        return float(cleaned) if cleaned else np.nan
+    except (TypeError, ValueError):
+        return np.nan
+
+
+class FundamentalsMatrix:
+    """Dense metric cube with index maps for stock, fiscal year and metric names.
+
+    `values[s, y, m]` is NaN wherever the source record has no numeric value,
+    and `mask` is the matching boolean "value present" array. `present[s, y]`
+    records which fiscal years a stock reports at all, so per-stock year lists
+    do not depend on any single metric being filled in.
+
+    The year axis is contiguous in FiscalYear ordinal order (gaps are simply
+    not `present`), so "previous year" is column - 1 and "since 2019" is a
+    column offset.
+    """
+
+    def __init__(self, stocks: List[str], years: List[str], metrics: List[str],
+                 values: np.ndarray, present: np.ndarray):
+        self.stocks = tuple(stocks)
+        self.years = tuple(FiscalYear.parse(y) for y in years)
+        self.metrics = tuple(metrics)
+        self.values = values
+        self.present = present
+        self.first_ordinal = self.years[0].ordinal if self.years else 0
+        self.stock_index: Dict[str, int] = {n: i for i, n in enumerate(self.stocks)}
+        self.metric_index: Dict[str, int] = {m: i for i, m in enumerate(self.metrics)}
+
+    @cached_property
+    def mask(self) -> np.ndarray:
+        """Value-present booleans; computed on first use so a mapped snapshot is not read in full at boot"""
+        return ~np.isnan(self.values)
+
+    @classmethod
+    def from_records(cls, records: Iterable[dict]) -> "FundamentalsMatrix":
+        records = [r for r in records if r.get('Stock')]
+        ordinals = set()
+        metrics = {}
+        for record in records:
+            for year, data in record.get('years', {}).items():
+                ordinals.add(FiscalYear.parse(year).ordinal)
+                for key, value in data.items():
+                    if not np.isnan(_to_float(value)):
+                        metrics.setdefault(key, None)
+        first = min(ordinals, default=0)
+        years = [FiscalYear.of(o) for o in range(first, max(ordinals, default=-1) + 1)]
+        metrics = list(metrics)
+        metric_index = {m: i for i, m in enumerate(metrics)}
+
+        values = np.full((len(records), len(years), len(metrics)), np.nan, dtype=np.float64)
+        present = np.zeros((len(records), len(years)), dtype=bool)
+        for s, record in enumerate(records):
+            for year, data in record.get('years', {}).items():
+                y = FiscalYear.parse(year).ordinal - first
+                present[s, y] = True
+                for key, value in data.items():
+                    m = metric_index.get(key)
+                    if m is not None:
+                        values[s, y, m] = _to_float(value)
+        return cls([r['Stock'] for r in records], years, metrics, values, present)
+
+    def row(self, stock_name: str) -> Optional[int]:
+        """Row of a stock by its exact record name (stock['Stock'])"""
+        return self.stock_index.get(stock_name)
+
+    def year_column(self, year) -> Optional[int]:
+        """Column of a fiscal year label or FiscalYear, None outside the axis"""
+        try:
+            y = FiscalYear.parse(year).ordinal - self.first_ordinal
+        except ValueError:
+            return None
+        return y if 0 <= y < len(self.years) else None
+
+    def stock_years(self, stock_name: str) -> List[FiscalYear]:
+        """Fiscal years reported by a stock, latest first"""
+        s = self.row(stock_name)
+        if s is None:
+            return []
+        return [self.years[y] for y in np.flatnonzero(self.present[s])[::-1]]
+
+    def value(self, stock_name: str, year, metric: str) -> Optional[float]:
+        s, y, m = self.row(stock_name), self.year_column(year), self.metric_index.get(metric)
+        if s is None or y is None or m is None:
+            return None
+        value = float(self.values[s, y, m])
+        return None if np.isnan(value) else value
+
+    def previous_value(self, stock_name: str, year, metric: str) -> Optional[float]:
+        """Value of `metric` in the fiscal year before `year`"""
+        y = self.year_column(year)
+        if y is None or y == 0:
+            return None
+        return self.value(stock_name, self.years[y - 1], metric)
+
+    def series(self, stock_name: str, metric: str, start_year: Optional[int] = None,
+               limit: Optional[int] = None, dropna: bool = True) -> Tuple[List[FiscalYear], np.ndarray]:
+        """Year labels and values of one metric for one stock, latest first.
+
+        `limit` counts reported years before missing values are dropped, the
+        same way the trend table takes the last N fiscal years.
+        """
+        s, m = self.row(stock_name), self.metric_index.get(metric)
+        if s is None:
+            return [], np.empty(0)
+        cols = np.flatnonzero(self.present[s])[::-1]
+        if start_year:
+            cols = cols[cols >= start_year - self.first_ordinal]
+        if limit is not None:
+            cols = cols[:limit]
+        if m is None:
+            vals = np.full(len(cols), np.nan)
+        else:
+            vals = self.values[s, cols, m]
+        if dropna:
+            keep = ~np.isnan(vals)
+            cols, vals = cols[keep], vals[keep]
+        return [self.years[y] for y in cols], vals
+
+    def has_metric(self, stock_name: str, metric: str) -> bool:
+        s, m = self.row(stock_name), self.metric_index.get(metric)
+        return s is not None and m is not None and not bool(np.isnan(self.values[s, :, m]).all())
+
+    def latest_values(self, stock_names: List[str], metrics: List[str]) -> Tuple[List[Optional[FiscalYear]], np.ndarray]:
+        """Each stock's latest reported year and its values of `metrics`, gathered in one indexing step.
+
+        Returns (years, values) with values shaped stocks x metrics; unknown
+        stocks or metrics and missing cells are NaN, and unknown stocks get
+        year None.
+        """
+        rows = np.array([self.stock_index.get(name, -1) for name in stock_names], dtype=np.intp)
+        cols = np.array([self.metric_index.get(metric, -1) for metric in metrics], dtype=np.intp)
+        known = rows >= 0
+        if not len(self.years) or not len(self.metrics):
+            return [None] * len(rows), np.full((len(rows), len(cols)), np.nan)
+        present = self.present[np.where(known, rows, 0)] & known[:, None]
+        reported = present.any(axis=1)
+        # Last True column per row: argmax over the reversed year axis
+        latest = len(self.years) - 1 - np.argmax(present[:, ::-1], axis=1)
+        values = self.values[np.where(known, rows, 0)[:, None], latest[:, None], np.where(cols >= 0, cols, 0)[None, :]]
+        values = np.where(reported[:, None] & (cols >= 0)[None, :], values, np.nan)
+        years = [self.years[y] if ok else None for y, ok in zip(latest.tolist(), reported.tolist())]
+        return years, values
+
+    def cross_section(self, metric: str, year) -> np.ndarray:
+        """One metric for every stock in a given fiscal year (NaN where missing)"""
+        y, m = self.year_column(year), self.metric_index.get(metric)
+        if y is None or m is None:
+            return np.full(len(self.stocks), np.nan)
+        return self.values[:, y, m]
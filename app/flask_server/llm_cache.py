@@ -0,0 +1,191 @@
+"""
+Persistent SQLite cache for LLM completions, shared by every worker on the host
+"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# Bumped whenever the table layout changes; an older cache file is simply rebuilt
+SCHEMA_VERSION = 2
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS completions (
+    key TEXT PRIMARY KEY,
+    prompt_class TEXT NOT NULL,
+    data_version TEXT NOT NULL,
+    content TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    expires REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS completions_last_access ON completions (last_access);
+"""
+# Hits only note their access time in memory; the notes are written in one batch
+# once this many are pending or the oldest is this many seconds old
+TOUCH_BATCH_SIZE = 64
+TOUCH_FLUSH_SECONDS = 30.0
+
+
+def cache_key(prompt_class: str, system_content: str, user_content: str, temperature: float) -> str:
+    """SHA-256 of the request fields; prompts themselves are never used as keys"""
+    raw = json.dumps([prompt_class, system_content, user_content, temperature], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """Completion cache keyed by (prompt class, system, user, temperature).
+
+    Each entry belongs to the stock data version it was generated against:
+    the version is part of the stored key, so a lookup only sees entries for
+    the data currently served, and workers running different versions during
+    a hot reload keep separate entries instead of overwriting each other.
+    Entries of other versions are never deleted on read; they expire after
+    `ttl` seconds or are evicted first once the stored content exceeds
+    `max_bytes`, followed by the least recently used ones. Lookups are plain
+    reads: access times are batched in memory and written with the next
+    insert or every TOUCH_FLUSH_SECONDS. The database runs in WAL mode so
+    several server processes can share one file. It is opened on first use,
+    so creating a cache (e.g. at import time) never touches the disk.
+    """
+
+    def __init__(self, path: str, max_bytes: int = DEFAULT_MAX_BYTES, ttl: float = DEFAULT_TTL_SECONDS,
+                 data_version: str = "", clear_on_open: bool = False):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        # Version of the stock data currently served; set on load and on hot reload
+        self.data_version = data_version
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._touched: Dict[str, float] = {}
+        self._touched_since = 0.0
+        self._clear_on_open = clear_on_open
+        self._connection: Optional[sqlite3.Connection] = None
+
+    @property
+    def _db(self) -> sqlite3.Connection:
+        """The connection, opened on first use (every caller holds the lock)"""
+        if self._connection is None:
+            db = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            if db.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+                db.execute("DROP TABLE IF EXISTS completions")
+                db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            db.executescript(_SCHEMA)
+            if self._clear_on_open:
+                db.execute("DELETE FROM completions")
+                logger.info(f"Cleared LLM cache at {self.path}")
+            self._connection = db
+        return self._connection
+
+    @classmethod
+    def from_env(cls, default_path: str) -> "LLMCache":
+        """Cache configured by LLM_CACHE_* variables; a relative LLM_CACHE_PATH is taken
+        from the directory of `default_path`, not the working directory"""
+        path = os.path.join(os.path.dirname(default_path), os.getenv("LLM_CACHE_PATH", default_path))
+        # Flag semantics: CLEAR_CACHE=true wipes the cache once at startup
+        clear = os.getenv("CLEAR_CACHE", "").strip().lower() in ("1", "true", "yes", "on")
+        return cls(path,
+                   max_bytes=int(os.getenv("LLM_CACHE_MAX_BYTES", str(DEFAULT_MAX_BYTES))),
+                   ttl=float(os.getenv("LLM_CACHE_TTL", str(DEFAULT_TTL_SECONDS))),
+                   clear_on_open=clear)
+
+    def _stored_key(self, prompt_class: str, system_content: str, user_content: str, temperature: float) -> str:
+        return f"{cache_key(prompt_class, system_content, user_content, temperature)}:{self.data_version}"
+
+    def get(self, prompt_class: str, system_content: str, user_content: str, temperature: float) -> Optional[str]:
+        return self._lookup(self._stored_key(prompt_class, system_content, user_content, temperature), count=True)
+
+    def peek(self, prompt_class: str, system_content: str, user_content: str, temperature: float) -> Optional[str]:
+        """Like get() but without touching the hit/miss counters"""
+        return self._lookup(self._stored_key(prompt_class, system_content, user_content, temperature), count=False)
+
+    def _lookup(self, key: str, count: bool) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT content, expires FROM completions WHERE key = ?", (key,)).fetchone()
+            if row is None or row[1] < now:
+                self.misses += count
+                return None
+            if not self._touched:
+                self._touched_since = now
+            self._touched[key] = now
+            if len(self._touched) >= TOUCH_BATCH_SIZE or now - self._touched_since >= TOUCH_FLUSH_SECONDS:
+                self._flush_touches()
+            self.hits += count
+            return row[0]
+
+    def _flush_touches(self):
+        """Write the batched access times (caller holds the lock)"""
+        if self._touched:
+            self._db.executemany("UPDATE completions SET last_access = ? WHERE key = ?",
+                                 [(at, key) for key, at in self._touched.items()])
+            self._touched.clear()
+
+    def put(self, prompt_class: str, system_content: str, user_content: str, temperature: float, content: str):
+        key = self._stored_key(prompt_class, system_content, user_content, temperature)
+        now = time.time()
+        size = len(content.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO completions "
+                "(key, prompt_class, data_version, content, size, created, expires, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, prompt_class, self.data_version, content, size, now, now + self.ttl, now))
+            self._flush_touches()
+            self._evict()
+
+    def _evict(self):
+        """Drop expired entries, then other data versions' and least recently used ones until under max_bytes"""
+        self._db.execute("DELETE FROM completions WHERE expires < ?", (time.time(),))
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM completions").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        freed = 0
+        victims = []
+        for key, size in self._db.execute("SELECT key, size FROM completions "
+                                          "ORDER BY data_version = ?, last_access", (self.data_version,)):
+            victims.append((key,))
+            freed += size
+            if total - freed <= self.max_bytes:
+                break
+        self._db.executemany("DELETE FROM completions WHERE key = ?", victims)
+        self.evictions += len(victims)
+
+    def clear(self):
+        with self._lock:
+            self._touched.clear()
+            self._db.execute("DELETE FROM completions")
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries, total = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM completions").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "path": self.path,
+            "entries": entries,
+            "bytes": total,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "evictions": self.evictions,
+            "data_version": self.data_version,
+        }
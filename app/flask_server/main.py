@@ -2,6 +2,8 @@ import eventlet
 eventlet.monkey_patch()
 
 import os
+import itertools
+import time
 import logging
 import traceback
 import re
@@ -14,14 +16,33 @@ from eventlet.timeout import Timeout
 from process_chat import (
     process_query, 
     load_stock_data,
+    llm_cache,
+    llm_requests,
+    model_router,
+    llm_limiter,
+    LLM_MIN_BUDGET_SECONDS,
+    quote_service,
+    tick_store,
     FivePaisaClient,
     NeoAPI
 )
+from stock_store import StockStore
+from data_watcher import StockDataWatcher
+from market_feed import feed_from_env, scrips_for
+from openrouter_client import warm_up as warm_up_openrouter
+from request_context import RequestContext, request_scope
 
 # Configuration
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 STOCK_DATA_DIRECTORY = os.path.join(BASE_DIR, "stock_data")
+STOCK_SNAPSHOT_PATH = os.getenv("STOCK_SNAPSHOT_PATH", os.path.join(BASE_DIR, "stock_data.snap"))
+# Processes used to parse stock_data/*.json when no fresh snapshot exists
+STOCK_DATA_WORKERS = int(os.getenv("STOCK_DATA_WORKERS", "1"))
+# Seconds between checks of stock_data/ for changed files (0 disables hot reload)
+STOCK_DATA_POLL_INTERVAL = float(os.getenv("STOCK_DATA_POLL_INTERVAL", "5"))
 AI_RESPONSE_TIMEOUT = 30
+# Forward LLM tokens as `message_chunk` events while a query is still running
+STREAM_RESPONSES = os.getenv("STREAM_RESPONSES", "true").strip().lower() in ("1", "true", "yes", "on")
 
 # Initialize application
 app = Flask(__name__)
@@ -61,15 +82,41 @@ socketio = SocketIO(
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Global data storage
+# Global data storage: the watcher owns the current immutable StockStore and swaps it on reload
 try:
-    stock_data = load_stock_data(STOCK_DATA_DIRECTORY)
-    data_loaded = True
-    logger.info("Successfully loaded stock data")
+    initial_stock_data = load_stock_data(STOCK_DATA_DIRECTORY, snapshot_path=STOCK_SNAPSHOT_PATH,
+                                         workers=STOCK_DATA_WORKERS)
+    logger.info(f"Successfully loaded stock data (version {initial_stock_data.version})")
+    load_report = initial_stock_data.load_report
+    if load_report is not None:
+        logger.info(f"Parsed {len(load_report.reports)} files ({load_report.record_count} records) "
+                    f"in {load_report.seconds * 1000:.1f} ms")
+        for report in load_report.errors:
+            logger.error(f"Error loading {report.path}: {report.error}")
+    if initial_stock_data.quality is not None:
+        logger.info(f"Stock data quality: {initial_stock_data.quality.summary()}")
 except Exception as e:
     logger.error(f"Error loading stock data: {str(e)}")
-    data_loaded = False
-    stock_data = {}
+    initial_stock_data = StockStore()
+
+def on_stock_data_swap(store):
+    # Answers generated from the previous data must not be served for the new one
+    llm_cache.data_version = store.version
+    # Search indexes are lazy; build them off the request path before the first query needs them
+    socketio.start_background_task(store.warm_indexes)
+
+stock_data_watcher = StockDataWatcher(STOCK_DATA_DIRECTORY, initial_stock_data,
+                                      interval=STOCK_DATA_POLL_INTERVAL,
+                                      on_swap=on_stock_data_swap)
+if STOCK_DATA_POLL_INTERVAL > 0:
+    socketio.start_background_task(stock_data_watcher.run)
+socketio.start_background_task(initial_stock_data.warm_indexes)
+
+# Open the OpenRouter keep-alive connection in the background so boot is not delayed
+socketio.start_background_task(warm_up_openrouter)
+
+def data_loaded():
+    return bool(stock_data_watcher.current)
 
 # Initialize API clients (optional, safe to skip when creds absent)
 five_paisa_client = None
@@ -135,12 +182,18 @@ def initialize_api_clients():
 
 initialize_api_clients()
 
+# Streaming quotes for every stock in the data set; price answers read them from memory
+market_feed = feed_from_env(tick_store, lambda: five_paisa_client,
+                            lambda: scrips_for(stock_data_watcher.current))
+if market_feed is not None:
+    socketio.start_background_task(market_feed.run)
+
 def sanitize_content(content):
     if isinstance(content, str):
         content = re.sub(r'\033\[\d+m', '', content)
     return content
 
-def format_response(correlation_id, content, status="success"):
+def format_response(correlation_id, content, status="success", degraded=False):
     if isinstance(content, str):
         content = sanitize_content(content)
     return {
@@ -148,9 +201,28 @@ def format_response(correlation_id, content, status="success"):
         "status": status,
         "content": content if status == "success" else None,
         "error": content if status == "error" else None,
+        # Part of the answer is a rule-based stand-in; asking again later may return the AI version
+        "degraded": degraded,
+        "timestamp": eventlet.hubs.get_hub().clock()
+    }
+
+def format_chunk(correlation_id, content, sequence):
+    return {
+        "correlation_id": correlation_id,
+        "status": "streaming",
+        "content": sanitize_content(content),
+        "sequence": sequence,
         "timestamp": eventlet.hubs.get_hub().clock()
     }
 
+def chunk_emitter(correlation_id, sid):
+    """Callback that forwards streamed LLM text to the requesting client only"""
+    sequence = itertools.count()
+
+    def on_chunk(text):
+        socketio.emit("message_chunk", format_chunk(correlation_id, text, next(sequence)), to=sid)
+    return on_chunk
+
 def get_connected_clients_count():
     try:
         participants = socketio.server.manager.get_participants('/', '/')
@@ -174,7 +246,7 @@ def handle_connect():
     emit("connection_status", format_response(
         correlation_id="system",
         content={
-            "service_ready": data_loaded,
+            "service_ready": data_loaded(),
             "api_clients_ready": {
                 "five_paisa": five_paisa_client is not None,
                 "neo": neo_client is not None
@@ -200,13 +272,21 @@ def handle_process_message(data):
             raise ValueError("Missing correlation ID")
         query = data.get("content", "").strip()
         logger.info(f"Processing message [{correlation_id}]: {query[:50]}...")
-        if not data_loaded:
+        # One reference read per request: a concurrent reload cannot change the data mid-query
+        stock_data = stock_data_watcher.current
+        if not stock_data:
             raise RuntimeError("Stock data not loaded")
         if not query:
             raise ValueError("Empty query received")
 
+        # Clients may opt out per message with {"stream": false}
+        stream = STREAM_RESPONSES and data.get("stream", True)
+        # LLM and broker calls size their timeouts and retries to this deadline
+        context = RequestContext(correlation_id,
+                                 on_chunk=chunk_emitter(correlation_id, request.sid) if stream else None,
+                                 deadline=time.monotonic() + AI_RESPONSE_TIMEOUT)
         try:
-            with Timeout(AI_RESPONSE_TIMEOUT):
+            with Timeout(AI_RESPONSE_TIMEOUT), request_scope(context):
                 ai_response = process_query(query, stock_data, five_paisa_client, neo_client)
                 if isinstance(ai_response, str):
                     response_content = ai_response
@@ -214,7 +294,8 @@ def handle_process_message(data):
                     response_content = ai_response
                 else:
                     response_content = str(ai_response)
-                emit("message_response", format_response(correlation_id, response_content))
+                emit("message_response", format_response(correlation_id, response_content,
+                                                         degraded=context.degraded))
         except Timeout:
             error_msg = f"Processing timeout for [{correlation_id}] (>{AI_RESPONSE_TIMEOUT}s)"
             logger.warning(error_msg)
@@ -239,7 +320,7 @@ def handle_ping(data):
 def health_check():
     return jsonify({
         "status": "up",
-        "data_loaded": data_loaded,
+        "data_loaded": data_loaded(),
         "connected_clients": get_connected_clients_count(),
         "api_clients": {
             "five_paisa": five_paisa_client is not None,
@@ -249,10 +330,11 @@ def health_check():
 
 @app.route('/system/status')
 def system_status():
+    stock_data = stock_data_watcher.current
     return jsonify({
         "service": "financial-chatbot",
         "version": "1.0.0",
-        "data_loaded": data_loaded,
+        "data_loaded": data_loaded(),
         "websocket_clients": get_connected_clients_count(),
         "api_clients_status": {
             "five_paisa_ready": five_paisa_client is not None,
@@ -260,10 +342,20 @@ def system_status():
         },
         "stock_data_stats": {
             "entries": len(stock_data),
-            "last_updated": "2024-02-20"
+            "version": stock_data.version,
+            "last_updated": stock_data.last_updated,
+            "data_quality": stock_data.quality.summary() if stock_data.quality else None
         },
+        "llm_cache": llm_cache.stats(),
+        "llm_requests": llm_requests.stats(),
+        "model_router": model_router.stats(),
+        "llm_limiter": llm_limiter.stats(),
+        "quotes": quote_service.stats(),
+        "ticks": dict(tick_store.stats(), feed=market_feed.stats() if market_feed else None),
         "configuration": {
             "ai_response_timeout": AI_RESPONSE_TIMEOUT,
+            "stream_responses": STREAM_RESPONSES,
+            "llm_min_budget_seconds": LLM_MIN_BUDGET_SECONDS,
             "websocket_transports": ["websocket"],
             "cors_origins": ALLOWED_ORIGINS
         }
@@ -297,7 +389,7 @@ def reinitialize_clients():
 
 if __name__ == "__main__":
     logger.info("Starting Financial Chatbot WebSocket Server...")
-    logger.info(f"Data loaded: {data_loaded}")
+    logger.info(f"Data loaded: {data_loaded()}")
     logger.info(f"Five Paisa client ready: {five_paisa_client is not None}")
     logger.info(f"Neo client ready: {neo_client is not None}")
     try:
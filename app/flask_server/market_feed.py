@@ -0,0 +1,302 @@
+"""
+Streaming sources that keep a TickStore current: the 5paisa market feed WebSocket, or a recorded tick file.
+
+    python market_feed.py synth --scrips ITC_EQ,TCS_EQ --seconds 60 --seed 1 -o ticks.jsonl
+    TICK_FEED=replay TICK_REPLAY_PATH=ticks.jsonl python main.py
+
+A tick file is JSON lines of {"t": seconds since start, "scrip", "last", "bid",
+"ask", "volume"}. The live feed writes the same format to TICK_RECORD_PATH
+when it is set, so a recorded session can be replayed offline.
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+from quote_service import feed_request
+from tick_store import TickStore
+
+logger = logging.getLogger(__name__)
+
+# off | live (5paisa WebSocket) | replay (TICK_REPLAY_PATH)
+TICK_FEED = os.getenv("TICK_FEED", "off").strip().lower()
+TICK_REPLAY_PATH = os.getenv("TICK_REPLAY_PATH", "")
+# Replay speed multiplier (0 = as fast as possible); loop restarts the file when it ends
+TICK_REPLAY_SPEED = float(os.getenv("TICK_REPLAY_SPEED", "1"))
+TICK_REPLAY_LOOP = os.getenv("TICK_REPLAY_LOOP", "true").strip().lower() in ("1", "true", "yes", "on")
+TICK_RECORD_PATH = os.getenv("TICK_RECORD_PATH", "")
+# Seconds between reconnect attempts of the live feed, doubling up to the max
+TICK_RECONNECT_DELAY = float(os.getenv("TICK_RECONNECT_DELAY", "2"))
+TICK_RECONNECT_MAX_DELAY = float(os.getenv("TICK_RECONNECT_MAX_DELAY", "60"))
+
+_TICK_DATE = re.compile(r"/Date\((\d+)")
+
+
+def scrips_for(store) -> List[str]:
+    """Feed scrip names ("ITC_EQ") for every stock with a ticker"""
+    return list(dict.fromkeys(f"{stock['Ticker']}_EQ" for stock in store if stock.get('Ticker')))
+
+
+def _number(value, default=float("nan")) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _exchange_time(row: dict) -> Optional[float]:
+    """Epoch seconds from a "/Date(1690000000000)/" TickDt field"""
+    match = _TICK_DATE.search(str(row.get("TickDt", "")))
+    return int(match.group(1)) / 1000 if match else None
+
+
+class _Recorder:
+    """Appends applied ticks to a JSON lines file in the replay format"""
+
+    def __init__(self, path: str):
+        self.file = open(path, "a", encoding="utf-8")
+        self.started = time.monotonic()
+
+    def write(self, scrip: str, last: float, bid: float, ask: float, volume: int):
+        tick = {"t": round(time.monotonic() - self.started, 3), "scrip": scrip,
+                "last": last, "bid": bid, "ask": ask, "volume": volume}
+        self.file.write(json.dumps(tick) + "\n")
+
+    def close(self):
+        self.file.close()
+
+
+class FivePaisaFeed:
+    """Subscribes to the 5paisa market feed WebSocket and writes every tick into `store`.
+
+    The WebSocket addresses scrips by numeric scrip code, so each connect
+    first resolves codes with one batched REST market feed call (which also
+    seeds the store with current prices). `client` and `scrips` are callables
+    so a reconnect picks up re-initialized credentials and reloaded stock
+    data; a change of scrip list forces a resubscribe. Disconnects end the
+    store's session and are retried with exponential backoff.
+    """
+
+    def __init__(self, store: TickStore, client: Callable[[], object], scrips: Callable[[], Iterable[str]],
+                 record_path: str = TICK_RECORD_PATH, reconnect_delay: float = TICK_RECONNECT_DELAY,
+                 max_reconnect_delay: float = TICK_RECONNECT_MAX_DELAY):
+        self.store = store
+        self.client = client
+        self.scrips = scrips
+        self.record_path = record_path
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self._stop = threading.Event()
+        self._subscribed: tuple = ()
+        self._tokens: Dict[str, str] = {}
+        self._recorder: Optional[_Recorder] = None
+        self.connects = 0
+        self.messages = 0
+
+    def _resolve(self, client, scrips: List[str]) -> List[dict]:
+        """WebSocket subscription entries for `scrips`, seeding the store from the REST snapshot"""
+        response = client.fetch_market_feed_scrip([feed_request(scrip) for scrip in scrips])
+        rows = (response or {}).get('Data') or []
+        if len(rows) != len(scrips):
+            raise ValueError(f"Market feed returned {len(rows)} rows for {len(scrips)} scrips")
+        self._tokens = {}
+        subscriptions = []
+        for scrip, row in zip(scrips, rows):
+            token = row.get('Token')
+            if not token:
+                continue
+            self._tokens[str(token)] = scrip
+            subscriptions.append({"Exch": "N", "ExchType": "C", "ScripCode": int(token)})
+            if row.get('LastRate') is not None:
+                self.store.update(scrip, _number(row.get('LastRate')), volume=int(_number(row.get('TotalQty'), 0)),
+                                  exchange_time=_exchange_time(row))
+        return subscriptions
+
+    def _on_message(self, ws, message):
+        self.messages += 1
+        try:
+            rows = json.loads(message)
+        except (TypeError, ValueError):
+            return
+        for row in rows if isinstance(rows, list) else [rows]:
+            scrip = self._tokens.get(str(row.get('Token')))
+            if scrip is None or row.get('LastRate') is None:
+                continue
+            last, bid, ask = _number(row.get('LastRate')), _number(row.get('BidRate')), _number(row.get('OffRate'))
+            volume = int(_number(row.get('TotalQty'), 0))
+            self.store.update(scrip, last, bid, ask, volume, _exchange_time(row))
+            if self._recorder is not None:
+                self._recorder.write(scrip, last, bid, ask, volume)
+        if self._subscribed != tuple(self.scrips()):
+            # Stock data was reloaded: drop the socket so run() resubscribes
+            self._close(ws)
+
+    def _close(self, ws=None):
+        client = self.client()
+        try:
+            if hasattr(client, "close_data"):
+                client.close_data()
+            elif ws is not None:
+                ws.close()
+        except Exception as e:
+            logger.debug(f"Closing market feed: {e}")
+
+    def _session(self) -> bool:
+        """One connect/receive cycle; returns True if ticks were subscribed"""
+        client = self.client()
+        if client is None:
+            return False
+        scrips = list(self.scrips())
+        self.store.track(scrips)
+        self._subscribed = tuple(scrips)
+        self.store.begin_session()
+        try:
+            subscriptions = self._resolve(client, scrips)
+            if not subscriptions:
+                return False
+            request = client.Request_Feed('mf', 's', subscriptions)
+            client.connect(request)
+            self.connects += 1
+            logger.info(f"Market feed subscribed to {len(subscriptions)} scrips")
+            client.receive_data(self._on_message)
+        finally:
+            self.store.end_session()
+        return True
+
+    def run(self):
+        """Blocking loop; start it as a background task"""
+        if self.record_path:
+            self._recorder = _Recorder(self.record_path)
+        delay = self.reconnect_delay
+        try:
+            while not self._stop.is_set():
+                try:
+                    if self._session():
+                        delay = self.reconnect_delay
+                except Exception as e:
+                    logger.warning(f"Market feed disconnected: {e}")
+                if self._stop.wait(delay):
+                    break
+                delay = min(delay * 2, self.max_reconnect_delay)
+        finally:
+            if self._recorder is not None:
+                self._recorder.close()
+
+    def stop(self):
+        self._stop.set()
+        self._close()
+
+    def stats(self) -> dict:
+        return {"source": "live", "subscribed": len(self._tokens), "connects": self.connects,
+                "messages": self.messages}
+
+
+def read_ticks(path: str) -> List[dict]:
+    with open(path, encoding="utf-8") as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+class ReplayFeed:
+    """Plays a recorded tick file into `store` with its original spacing scaled by `speed`.
+
+    Stand-in for the live feed in offline tests and benchmarks: the same
+    store, session and fallback behaviour, without broker credentials.
+    """
+
+    def __init__(self, store: TickStore, path: str = TICK_REPLAY_PATH, speed: float = TICK_REPLAY_SPEED,
+                 loop: bool = TICK_REPLAY_LOOP):
+        self.store = store
+        self.ticks = read_ticks(path)
+        self.speed = speed
+        self.loop = loop
+        self._stop = threading.Event()
+        self.passes = 0
+        self.replayed = 0
+
+    def run(self):
+        self.store.track(dict.fromkeys(tick["scrip"] for tick in self.ticks))
+        self.store.begin_session()
+        try:
+            while not self._stop.is_set():
+                started = time.monotonic()
+                for tick in self.ticks:
+                    if self.speed > 0:
+                        wait = tick["t"] / self.speed - (time.monotonic() - started)
+                        if wait > 0 and self._stop.wait(wait):
+                            return
+                    elif self._stop.is_set():
+                        return
+                    self.store.update(tick["scrip"], tick["last"], tick.get("bid", float("nan")),
+                                      tick.get("ask", float("nan")), tick.get("volume", 0))
+                    self.replayed += 1
+                self.passes += 1
+                if not self.loop:
+                    return
+        finally:
+            self.store.end_session()
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self) -> dict:
+        return {"source": "replay", "ticks": len(self.ticks), "passes": self.passes,
+                "replayed": self.replayed}
+
+
+def feed_from_env(store: TickStore, client: Callable[[], object], scrips: Callable[[], Iterable[str]]):
+    """The feed selected by TICK_FEED, or None when streaming is off"""
+    if TICK_FEED == "live":
+        return FivePaisaFeed(store, client, scrips)
+    if TICK_FEED == "replay":
+        if not TICK_REPLAY_PATH:
+            logger.error("TICK_FEED=replay needs TICK_REPLAY_PATH")
+            return None
+        return ReplayFeed(store)
+    if TICK_FEED not in ("", "off"):
+        logger.error(f"Unknown TICK_FEED {TICK_FEED!r}; streaming quotes disabled")
+    return None
+
+
+def synthesize(scrips: List[str], seconds: float, rate: float, seed=None) -> List[dict]:
+    """Random-walk ticks, `rate` per second across `scrips`, for replay tests"""
+    rng = random.Random(seed)
+    prices = {scrip: rng.uniform(100, 3000) for scrip in scrips}
+    volumes = {scrip: 0 for scrip in scrips}
+    ticks = []
+    t = 0.0
+    while t < seconds:
+        scrip = rng.choice(scrips)
+        price = prices[scrip] = round(max(1.0, prices[scrip] * (1 + rng.gauss(0, 0.0005))), 2)
+        spread = max(0.05, round(price * 0.0002, 2))
+        volumes[scrip] += rng.randint(1, 500)
+        ticks.append({"t": round(t, 3), "scrip": scrip, "last": price, "bid": round(price - spread, 2),
+                      "ask": round(price + spread, 2), "volume": volumes[scrip]})
+        t += rng.expovariate(rate)
+    return ticks
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tick files for the replay market feed")
+    sub = parser.add_subparsers(dest="command", required=True)
+    synth = sub.add_parser("synth", help="write a random-walk tick file")
+    synth.add_argument("--scrips", required=True, help="comma-separated feed scrips, e.g. ITC_EQ,TCS_EQ")
+    synth.add_argument("--seconds", type=float, default=60.0)
+    synth.add_argument("--rate", type=float, default=20.0, help="ticks per second across all scrips")
+    synth.add_argument("--seed", type=int, default=None)
+    synth.add_argument("-o", "--output", required=True)
+    args = parser.parse_args()
+
+    ticks = synthesize([s.strip() for s in args.scrips.split(",") if s.strip()], args.seconds, args.rate, args.seed)
+    with open(args.output, "w", encoding="utf-8") as file:
+        for tick in ticks:
+            file.write(json.dumps(tick) + "\n")
+    print(f"Wrote {len(ticks)} ticks to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
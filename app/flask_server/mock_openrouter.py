@@ -0,0 +1,191 @@
+"""
+Local stand-in for the OpenRouter chat completions API, for offline and reproducible benchmarks.
+
+    python mock_openrouter.py --port 8799 --latency lognormal:800:0.5 --error-rate 0.02 --rate-limit-rate 0.05
+    OPENROUTER_BASE_URL=http://127.0.0.1:8799/api/v1 python main.py
+
+Serves POST /api/v1/chat/completions (plain JSON, or SSE when the payload
+has "stream": true) and GET/HEAD /api/v1/models. Latency before the first
+byte is drawn from the configured distribution; a fraction of requests get a
+500 or a 429 with Retry-After instead. Completions are derived from a hash of
+the model and messages, so the same prompt always yields the same text, and
+with --seed the whole run (latencies and injected errors) is repeatable.
+"""
+import argparse
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable
+
+_WORDS = ("revenue", "margin", "growth", "debt", "coverage", "promoter", "holding", "trend",
+          "stable", "improved", "declined", "year", "outlook", "risk", "cash", "flow")
+
+
+def latency_sampler(spec: str, rng: random.Random) -> Callable[[], float]:
+    """Seconds of latency per call from "fixed:MS", "uniform:LOW_MS:HIGH_MS",
+    "normal:MEAN_MS:STDDEV_MS" or "lognormal:MEDIAN_MS:SIGMA"."""
+    kind, *params = spec.split(":")
+    values = [float(p) for p in params]
+    if kind == "fixed" and len(values) == 1:
+        return lambda: values[0] / 1000
+    if kind == "uniform" and len(values) == 2:
+        return lambda: rng.uniform(values[0], values[1]) / 1000
+    if kind == "normal" and len(values) == 2:
+        return lambda: max(0.0, rng.gauss(values[0], values[1])) / 1000
+    if kind == "lognormal" and len(values) == 2:
+        mu = math.log(max(values[0], 1e-3))
+        return lambda: rng.lognormvariate(mu, values[1]) / 1000
+    raise ValueError(f"Unrecognized latency spec: {spec!r}")
+
+
+def completion_text(model: str, messages, words: int) -> str:
+    """Deterministic pseudo-analysis for a prompt; always ends with a full stop"""
+    digest = hashlib.sha256(json.dumps([model, messages], sort_keys=True).encode("utf-8")).digest()
+    picked = [_WORDS[digest[i % len(digest)] % len(_WORDS)] for i in range(words)]
+    return f"Mock analysis from {model}: " + " ".join(picked) + "."
+
+
+class MockOpenRouter(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency: str = "fixed:200", error_rate: float = 0.0,
+                 rate_limit_rate: float = 0.0, retry_after: float = 1.0, words: int = 120,
+                 chunk_words: int = 4, chunk_delay_ms: float = 20.0, seed=None):
+        super().__init__(address, _Handler)
+        self.rng = random.Random(seed)
+        self.rng_lock = threading.Lock()
+        self.sample_latency = latency_sampler(latency, self.rng)
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.words = words
+        self.chunk_words = chunk_words
+        self.chunk_delay = chunk_delay_ms / 1000
+        self.counts = {"requests": 0, "streamed": 0, "errors": 0, "rate_limited": 0}
+
+    def draw(self):
+        """(latency seconds, injected status or None) for one request"""
+        with self.rng_lock:
+            self.counts["requests"] += 1
+            latency = self.sample_latency()
+            roll = self.rng.random()
+            if roll < self.rate_limit_rate:
+                self.counts["rate_limited"] += 1
+                return latency, 429
+            if roll < self.rate_limit_rate + self.error_rate:
+                self.counts["errors"] += 1
+                return latency, 500
+        return latency, None
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: MockOpenRouter
+
+    def _send_json(self, status: int, body: dict, headers=None):
+        raw = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(raw)
+
+    def do_HEAD(self):
+        self.do_GET()
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/api/v1/models":
+            self._send_json(200, {"data": []})
+        else:
+            self._send_json(404, {"error": {"message": "Not found"}})
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/api/v1/chat/completions":
+            self._send_json(404, {"error": {"message": "Not found"}})
+            return
+        payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        model = payload.get("model", "mock/model")
+        latency, status = self.server.draw()
+        time.sleep(latency)
+        if status == 429:
+            self._send_json(429, {"error": {"code": 429, "message": "Rate limit exceeded (mock)"}},
+                            {"Retry-After": f"{self.server.retry_after:g}"})
+            return
+        if status == 500:
+            self._send_json(500, {"error": {"code": 500, "message": "Upstream error (mock)"}})
+            return
+        text = completion_text(model, payload.get("messages", []), self.server.words)
+        if payload.get("stream"):
+            with self.server.rng_lock:
+                self.server.counts["streamed"] += 1
+            self._stream(model, text)
+        else:
+            self._send_json(200, {
+                "id": "mock-" + hashlib.sha1(text.encode("utf-8")).hexdigest()[:12],
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text},
+                             "finish_reason": "stop"}],
+                "usage": {"completion_tokens": self.server.words},
+            })
+
+    def _stream(self, model: str, text: str):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        words = text.split(" ")
+        step = max(1, self.server.chunk_words)
+        for i in range(0, len(words), step):
+            delta = " ".join(words[i:i + step]) + (" " if i + step < len(words) else "")
+            event = {"model": model, "choices": [{"index": 0, "delta": {"content": delta}}]}
+            self.wfile.write(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+            time.sleep(self.server.chunk_delay)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock OpenRouter chat completions server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8799)
+    parser.add_argument("--latency", default="fixed:200",
+                        help="fixed:MS | uniform:LOW:HIGH | normal:MEAN:STDDEV | lognormal:MEDIAN:SIGMA")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="fraction answered with 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with 429s")
+    parser.add_argument("--words", type=int, default=120, help="words per completion")
+    parser.add_argument("--chunk-words", type=int, default=4, help="words per SSE event")
+    parser.add_argument("--chunk-delay-ms", type=float, default=20.0, help="pause between SSE events")
+    parser.add_argument("--seed", type=int, default=None, help="seed for latencies and injected errors")
+    args = parser.parse_args()
+
+    server = MockOpenRouter((args.host, args.port), latency=args.latency, error_rate=args.error_rate,
+                            rate_limit_rate=args.rate_limit_rate, retry_after=args.retry_after,
+                            words=args.words, chunk_words=args.chunk_words,
+                            chunk_delay_ms=args.chunk_delay_ms, seed=args.seed)
+    print(f"Mock OpenRouter on http://{args.host}:{args.port}/api/v1 "
+          f"(latency {args.latency}, errors {args.error_rate:.0%}, 429s {args.rate_limit_rate:.0%})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"Served {server.counts}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""
+Latency-aware routing of prompt classes across OpenRouter models, with per-model circuit breakers
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter, deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Prompt class -> models to try, in preference order. A JSON file at
+# MODEL_ROUTES_PATH with the same shape replaces individual classes.
+DEFAULT_ROUTES: Dict[str, List[str]] = {
+    "explanation": ["mistralai/mistral-7b-instruct:free",
+                    "meta-llama/llama-3.3-70b-instruct:free",
+                    "nousresearch/deephermes-3-llama-3-8b-preview:free"],
+    "summary": ["mistralai/mistral-7b-instruct:free",
+                "meta-llama/llama-3.3-70b-instruct:free"],
+    "forensic": ["anthropic/claude-3-haiku",
+                 "meta-llama/llama-3.3-70b-instruct:free",
+                 "mistralai/mistral-7b-instruct:free"],
+    "verdict": ["meta-llama/llama-3.3-70b-instruct:free",
+                "mistralai/mistral-7b-instruct:free"],
+    "chat": ["nousresearch/deephermes-3-llama-3-8b-preview:free",
+             "meta-llama/llama-3.3-70b-instruct:free",
+             "mistralai/mistral-7b-instruct:free"],
+}
+
+WINDOW_SIZE = int(os.getenv("MODEL_ROUTER_WINDOW", "50"))
+# Open a model's circuit after this many failures in a row...
+FAILURE_THRESHOLD = int(os.getenv("MODEL_CIRCUIT_FAILURES", "3"))
+# ...or when this share of the recent window failed (once it holds MIN_SAMPLES calls)
+ERROR_RATE_THRESHOLD = float(os.getenv("MODEL_CIRCUIT_ERROR_RATE", "0.5"))
+MIN_SAMPLES = 10
+# Seconds an open circuit waits before letting one probe call through
+COOLDOWN_SECONDS = float(os.getenv("MODEL_CIRCUIT_COOLDOWN", "30"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+def load_routes(path: Optional[str] = None) -> Dict[str, List[str]]:
+    routes = {name: list(models) for name, models in DEFAULT_ROUTES.items()}
+    path = path or os.getenv("MODEL_ROUTES_PATH")
+    if path and os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as file:
+            routes.update({name: list(models) for name, models in json.load(file).items()})
+    return routes
+
+
+def _percentile(ordered: List[float], fraction: float) -> Optional[float]:
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class ModelHealth:
+    """Rolling latency/error window and circuit breaker for one model"""
+
+    def __init__(self, window: int = WINDOW_SIZE):
+        self.samples: Deque[Tuple[float, bool]] = deque(maxlen=window)
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.times_opened = 0
+
+    def available(self, now: float) -> bool:
+        if self.state == OPEN and now - self.opened_at >= COOLDOWN_SECONDS:
+            self.state = HALF_OPEN
+        if self.state == HALF_OPEN:
+            return not self.probe_in_flight
+        return self.state == CLOSED
+
+    def record(self, latency: float, ok: bool, now: float):
+        self.samples.append((latency, ok))
+        self.probe_in_flight = False
+        if ok:
+            self.consecutive_failures = 0
+            self.state = CLOSED
+            return
+        self.consecutive_failures += 1
+        if (self.state == HALF_OPEN or self.consecutive_failures >= FAILURE_THRESHOLD
+                or (len(self.samples) >= MIN_SAMPLES and self.error_rate() >= ERROR_RATE_THRESHOLD)):
+            if self.state != OPEN:
+                self.times_opened += 1
+            self.state = OPEN
+            self.opened_at = now
+
+    def error_rate(self) -> Optional[float]:
+        if not self.samples:
+            return None
+        return sum(1 for _, ok in self.samples if not ok) / len(self.samples)
+
+    def latencies(self) -> List[float]:
+        """Sorted latencies of successful calls in the window"""
+        return sorted(latency for latency, ok in self.samples if ok)
+
+    def p50(self) -> Optional[float]:
+        return _percentile(self.latencies(), 0.5)
+
+    def stats(self) -> dict:
+        ordered = self.latencies()
+        p50, p95 = _percentile(ordered, 0.5), _percentile(ordered, 0.95)
+        error_rate = self.error_rate()
+        return {
+            "state": self.state,
+            "samples": len(self.samples),
+            "p50_ms": round(p50 * 1000) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000) if p95 is not None else None,
+            "error_rate": round(error_rate, 3) if error_rate is not None else None,
+            "consecutive_failures": self.consecutive_failures,
+            "times_opened": self.times_opened,
+        }
+
+
+class ModelRouter:
+    """Orders each prompt class's fallback list by health and speed.
+
+    `candidates(prompt_class)` returns the models whose circuit lets a call
+    through, fastest rolling p50 first. Models without latency samples yet
+    sort ahead of measured ones so they get measured; ties keep the
+    configured order. A half-open model is handed to one caller at a time as
+    a probe. Callers report every attempt with `record()`.
+    """
+
+    def __init__(self, routes: Optional[Dict[str, List[str]]] = None):
+        self.routes = routes if routes is not None else load_routes()
+        self._health: Dict[str, ModelHealth] = {}
+        self._lock = threading.Lock()
+        # (prompt class, model) -> calls it served / calls it failed
+        self._served: Counter = Counter()
+        self._failed: Counter = Counter()
+        # Calls answered by a model other than the class's first choice
+        self._fallbacks: Counter = Counter()
+        self._unavailable: Counter = Counter()
+
+    def _model(self, model: str) -> ModelHealth:
+        health = self._health.get(model)
+        if health is None:
+            health = self._health[model] = ModelHealth()
+        return health
+
+    def candidates(self, prompt_class: str) -> List[str]:
+        models = self.routes.get(prompt_class)
+        if not models:
+            raise KeyError(f"No models configured for prompt class {prompt_class!r}")
+        now = time.monotonic()
+        with self._lock:
+            available = [(self._model(m).p50(), i, m) for i, m in enumerate(models)
+                         if self._model(m).available(now)]
+            available.sort(key=lambda item: (item[0] is not None, item[0] or 0.0, item[1]))
+            ordered = [m for _, _, m in available]
+            for model in ordered:
+                if self._model(model).state == HALF_OPEN:
+                    self._model(model).probe_in_flight = True
+            if not ordered:
+                self._unavailable[prompt_class] += 1
+        return ordered
+
+    def expected_latency(self, prompt_class: str) -> Optional[float]:
+        """p95 of the fastest model that would take a call now (0.0 if none is measured yet).
+
+        None means every circuit in the class is open. Unlike candidates(),
+        this does not claim a half-open probe.
+        """
+        now = time.monotonic()
+        with self._lock:
+            available = [self._model(m) for m in self.routes.get(prompt_class, ()) if self._model(m).available(now)]
+            if not available:
+                return None
+            measured = [_percentile(health.latencies(), 0.95) for health in available]
+            measured = [latency for latency in measured if latency is not None]
+            return min(measured) if len(measured) == len(available) else 0.0
+
+    def record(self, prompt_class: str, model: str, latency: float, ok: bool):
+        with self._lock:
+            health = self._model(model)
+            previous_state = health.state
+            health.record(latency, ok, time.monotonic())
+            if ok:
+                self._served[prompt_class, model] += 1
+                if model != self.routes[prompt_class][0]:
+                    self._fallbacks[prompt_class] += 1
+            else:
+                self._failed[prompt_class, model] += 1
+            if health.state != previous_state:
+                logger.warning(f"Circuit for {model} is now {health.state}")
+
+    def release(self, models: List[str]):
+        """Hand back half-open probes that were offered but never tried"""
+        with self._lock:
+            for model in models:
+                health = self._health.get(model)
+                if health is not None and health.state == HALF_OPEN:
+                    health.probe_in_flight = False
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "models": {model: health.stats() for model, health in self._health.items()},
+                "routes": {
+                    prompt_class: {
+                        "models": list(models),
+                        "served": {m: self._served[prompt_class, m] for m in models if self._served[prompt_class, m]},
+                        "failed": {m: self._failed[prompt_class, m] for m in models if self._failed[prompt_class, m]},
+                        "fallbacks": self._fallbacks[prompt_class],
+                        "unavailable": self._unavailable[prompt_class],
+                    }
+                    for prompt_class, models in self.routes.items()
+                },
+            }
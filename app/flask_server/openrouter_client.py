@@ -0,0 +1,81 @@
+"""
+Shared keep-alive HTTP session for OpenRouter calls
+"""
+import logging
+import os
+import threading
+import time
+from typing import Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from model_router import load_routes
+from rate_limiter import LLM_MAX_CONCURRENT_PER_MODEL
+
+logger = logging.getLogger(__name__)
+
+# Point at mock_openrouter.py (e.g. http://127.0.0.1:8799/api/v1) for offline benchmarks
+OPENROUTER_API_BASE = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1").rstrip("/")
+OPENROUTER_CHAT_URL = f"{OPENROUTER_API_BASE}/chat/completions"
+
+
+def _limiter_concurrency() -> int:
+    """Most OpenRouter calls the LLM limiter lets run at once: its per-model bulkhead times the routed models"""
+    models = {model for route in load_routes().values() for model in route}
+    return LLM_MAX_CONCURRENT_PER_MODEL * len(models)
+
+
+# Connections kept open to OpenRouter; callers beyond this wait for a free one. requests
+# gives that wait no timeout, so the pool is never smaller than what the limiter admits.
+POOL_SIZE = max(int(os.getenv("OPENROUTER_POOL_SIZE", "10")), _limiter_concurrency())
+CONNECT_TIMEOUT = float(os.getenv("OPENROUTER_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.getenv("OPENROUTER_READ_TIMEOUT", "60"))
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """Process-wide session; its urllib3 pool reuses TCP+TLS connections across calls.
+
+    urllib3 hands pooled connections out through a queue, which eventlet's
+    monkey patching makes greenlet-aware, so one session serves every
+    greenlet. `pool_block` makes a burst wait for a pooled connection
+    instead of opening throwaway ones.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE, pool_block=True)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                session.headers.update({"Connection": "keep-alive"})
+                _session = session
+    return _session
+
+
+def request_timeout(remaining: Optional[float] = None) -> Tuple[float, float]:
+    """(connect, read) timeout for requests calls, capped by the seconds left in the request budget"""
+    if remaining is None:
+        return CONNECT_TIMEOUT, READ_TIMEOUT
+    remaining = max(remaining, 0.001)
+    return min(CONNECT_TIMEOUT, remaining), min(READ_TIMEOUT, remaining)
+
+
+def warm_up() -> bool:
+    """Open a pooled connection ahead of the first query so it skips the handshake.
+
+    Never raises: a failed warm-up only means the first call pays for the handshake.
+    """
+    session = get_session()
+    started = time.perf_counter()
+    try:
+        session.head(f"{OPENROUTER_API_BASE}/models", timeout=request_timeout())
+    except requests.exceptions.RequestException as e:
+        logger.warning(f"OpenRouter connection warm-up failed: {e}")
+        return False
+    logger.info(f"Warmed OpenRouter connection pool in {(time.perf_counter() - started) * 1000:.0f} ms")
+    return True
@@ -0,0 +1,166 @@
+"""
+Offline precompute of LLM explanations for every stock, year and metric.
+
+Runs the same report functions the chat server calls (trend, forecast and
+cash timeline tables, annual summaries, scoring verdicts), so every prompt
+is byte-identical to a live one and its completion lands in the shared LLM
+cache under the current data version. The server then answers those
+questions from the cache without an OpenRouter round-trip.
+
+    python precompute.py [stock_data_dir] [--concurrency 4] [--only verdict,summary]
+
+Finished tasks are recorded in a checkpoint file; rerunning the job skips
+them as long as the data version is unchanged. Tasks whose LLM call failed
+are not checkpointed and are retried on the next run; tasks whose report
+code raises are logged and not retried. Precomputed entries
+are subject to the cache's usual TTL and size limit (LLM_CACHE_TTL,
+LLM_CACHE_MAX_BYTES).
+"""
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, Iterable, List, NamedTuple, Set
+
+from query_router import METRICS
+from request_context import RequestContext, request_scope
+
+import process_chat
+
+logger = logging.getLogger(__name__)
+
+KINDS = ("trend", "forecast", "cash_timeline", "summary", "verdict")
+
+
+class Task(NamedTuple):
+    key: str
+    run: Callable[[], object]
+
+
+def build_tasks(store, kinds: Iterable[str] = KINDS) -> List[Task]:
+    """Every report the router can produce, with the arguments process_query passes"""
+    kinds = set(kinds)
+    fundamentals = store.fundamentals
+    # Routed metrics that are actually tabulated (not e.g. 'Verdict')
+    metrics = [metric for metric in dict.fromkeys(metric for _, metric in METRICS)
+               if metric in fundamentals.metrics]
+    tasks = []
+    for stock in store:
+        name = stock['Stock']
+        for metric in metrics:
+            if 'trend' in kinds:
+                tasks.append(Task(f"trend:{name}:{metric}",
+                                  lambda s=stock, m=metric: process_chat.historical_trend_analysis(
+                                      s, m, fundamentals=fundamentals)))
+            if 'forecast' in kinds:
+                tasks.append(Task(f"forecast:{name}:{metric}",
+                                  lambda s=stock, m=metric: process_chat.performance_forecasting(
+                                      s, m, years=3, fundamentals=fundamentals)))
+        if 'cash_timeline' in kinds:
+            tasks.append(Task(f"cash_timeline:{name}",
+                              lambda s=stock: process_chat.financial_health_timeline(
+                                  s, metric_filter='CashReserve', fundamentals=fundamentals)))
+        for year in stock['years']:
+            if 'summary' in kinds:
+                tasks.append(Task(f"summary:{name}:{year}",
+                                  lambda s=stock, y=year: process_chat.annual_report_summarizer(s, y)))
+            if 'verdict' in kinds:
+                tasks.append(Task(f"verdict:{name}:{year}",
+                                  lambda s=stock, y=year: process_chat.generate_scoring_verdict(s, fundamentals, y)))
+    return tasks
+
+
+class Checkpoint:
+    """Keys of finished tasks for one data version, rewritten atomically after each task"""
+
+    def __init__(self, path: str, data_version: str):
+        self.path = path
+        self.data_version = data_version
+        self.done: Set[str] = set()
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as file:
+                saved = json.load(file)
+            if saved.get("data_version") == data_version:
+                self.done = set(saved.get("done", ()))
+            else:
+                logger.info("Checkpoint is for another data version; starting over")
+
+    def mark(self, key: str):
+        with self._lock:
+            self.done.add(key)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as file:
+                json.dump({"data_version": self.data_version, "done": sorted(self.done)}, file)
+            os.replace(tmp_path, self.path)
+
+
+def _run_task(task: Task) -> bool:
+    """True when every LLM call behind the task succeeded (and was therefore cached)"""
+    context = RequestContext(f"precompute:{task.key}")
+    with request_scope(context):
+        task.run()
+    return not context.degraded
+
+
+def run(store, checkpoint: Checkpoint, kinds: Iterable[str] = KINDS, concurrency: int = 4) -> Dict[str, int]:
+    tasks = build_tasks(store, kinds)
+    pending = [task for task in tasks if task.key not in checkpoint.done]
+    counts = {"skipped": len(tasks) - len(pending), "done": 0, "failed": 0, "errors": 0}
+    logger.info(f"{len(pending)} tasks to run, {counts['skipped']} already done")
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        futures = {pool.submit(_run_task, task): task for task in pending}
+        for future in as_completed(futures):
+            task = futures[future]
+            try:
+                ok = future.result()
+            except Exception as e:
+                # LLM failures never raise, so this is the report code failing on
+                # this stock's data; a rerun would fail the same way
+                logger.warning(f"{task.key} raised {e!r}")
+                checkpoint.mark(task.key)
+                counts["errors"] += 1
+            else:
+                if ok:
+                    checkpoint.mark(task.key)
+                    counts["done"] += 1
+                else:
+                    counts["failed"] += 1
+            finished = counts["done"] + counts["failed"] + counts["errors"]
+            if finished % 25 == 0 or finished == len(pending):
+                logger.info(f"{finished}/{len(pending)} tasks finished in {time.perf_counter() - started:.1f}s")
+    return counts
+
+
+def main():
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Precompute LLM explanations into the shared LLM cache")
+    parser.add_argument("directory", nargs="?", default=os.path.join(base_dir, "stock_data"))
+    parser.add_argument("--snapshot", default=os.getenv("STOCK_SNAPSHOT_PATH"),
+                        help="binary snapshot to load instead of parsing JSON when it is fresh")
+    parser.add_argument("--concurrency", type=int, default=4, help="LLM requests in flight at once")
+    parser.add_argument("--checkpoint", default=os.path.join(base_dir, "precompute.checkpoint.json"))
+    parser.add_argument("--only", default=",".join(KINDS),
+                        help=f"comma-separated subset of: {', '.join(KINDS)}")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    kinds = [kind.strip() for kind in args.only.split(",") if kind.strip()]
+    unknown = set(kinds) - set(KINDS)
+    if unknown:
+        parser.error(f"unknown task kinds: {', '.join(sorted(unknown))}")
+
+    store = process_chat.load_stock_data(args.directory, snapshot_path=args.snapshot)
+    checkpoint = Checkpoint(args.checkpoint, store.version)
+    counts = run(store, checkpoint, kinds, concurrency=args.concurrency)
+    print(f"Data version {store.version}: {counts['done']} precomputed, "
+          f"{counts['skipped']} already done, {counts['failed']} failed, {counts['errors']} errors "
+          f"(cache: {process_chat.llm_cache.path})")
+
+
+if __name__ == "__main__":
+    main()
@@ -22,9 +22,11 @@ import json
 import requests
 import os
 import time
+import threading
 import re
 import traceback
 import pytz
+import numpy as np
 import paramiko
 import neo_api_client
 from neo_api_client import NeoAPI
@@ -32,40 +34,61 @@ from datetime import datetime, timedelta, timezone
 from neo_api_client import NeoAPI
 from py5paisa import FivePaisaClient
 from collections import defaultdict
-from functools import lru_cache  # Added for caching
 from dotenv import load_dotenv  # NEW
+from ingest import ingest_directory
+from snapshot import load_snapshot
+from fiscal_year import latest_year
+from query_router import Intent, parse_query
+from llm_cache import LLMCache, cache_key
+from singleflight import SingleFlight
+from model_router import ModelRouter
+from rate_limiter import LLMLimiter, Saturated
+from quote_service import QuoteService
+from tick_store import TickStore
+from template_explanations import (DEGRADED_NOTE, describe_comparison, describe_forecast,
+                                   describe_scorecard, describe_timeline, describe_trend)
+from fanout import fan_out
+from request_context import current_request, remaining_budget
+from retry_policy import DeadlineExceeded, RetryPolicy
+from openrouter_client import OPENROUTER_CHAT_URL, get_session, request_timeout
 
 # Load variables from .env if present
 load_dotenv()
 
-def safe_float(value, default=0.0):
-    """Robust type-agnostic number conversion"""
-    if isinstance(value, (int, float)):
-        return float(value)
-    try:
-        cleaned = str(value).replace('%', '').replace(',', '').strip()
-        return float(cleaned) if cleaned else default
-    except (TypeError, ValueError):
-        return default
-
-def load_stock_data(directory='stock_data'):
-    data = []
-    json_files = glob.glob(os.path.join(directory, "*.json"))
-    if not json_files:
-        raise FileNotFoundError(f"No JSON files found in directory: {directory}")
-    for file_path in json_files:
-        try:
-            with open(file_path, "r") as file:
-                file_data = json.load(file)
-                if isinstance(file_data, list):
-                    data.extend(file_data)
-                elif isinstance(file_data, dict):
-                    data.append(file_data)
-                else:
-                    print(f"Warning: {file_path} contains unexpected data format.")
-        except Exception as e:
-            print(f"Error loading {file_path}: {e}")
-    return data
+# LLM completions persist across restarts and are shared by workers on the same host;
+# the database is opened on first use, not at import
+llm_cache = LLMCache.from_env(os.path.join(os.path.dirname(os.path.abspath(__file__)), "llm_cache.sqlite3"))
+# Identical prompts in flight at the same time share one OpenRouter request
+llm_requests = SingleFlight()
+# Picks the model for each prompt class from its fallback list
+model_router = ModelRouter()
+# Caps OpenRouter request rate and per-model concurrency for the whole process
+llm_limiter = LLMLimiter()
+# Retries never outlive the request deadline set in main.handle_process_message
+LLM_RETRY_POLICY = RetryPolicy(max_attempts=3, base_delay=0.5, max_delay=8.0, min_attempt_seconds=2.0)
+# With less time than this left, explanations use template_explanations instead of an LLM call
+LLM_MIN_BUDGET_SECONDS = float(os.getenv("LLM_MIN_BUDGET_SECONDS", "5"))
+# Used for all but the last model in a fallback list: failing over beats waiting
+SINGLE_ATTEMPT = RetryPolicy(max_attempts=1)
+# Quote lookups are cheap reads; order placement is never retried (not idempotent)
+BROKER_RETRY_POLICY = RetryPolicy(max_attempts=2, base_delay=0.2, max_delay=1.0, min_attempt_seconds=0.5)
+# Concurrent price lookups share one market feed call and a ~1 s cache
+quote_service = QuoteService(policy=BROKER_RETRY_POLICY)
+# Filled by the streaming market feed when TICK_FEED is on (see market_feed.py)
+tick_store = TickStore()
+
+def load_stock_data(directory='stock_data', snapshot_path=None, workers=1):
+    """Load the stock universe, preferring a fresh binary snapshot over the JSON files.
+
+    JSON loads attach their IngestResult (per-file timing and errors) as
+    `store.load_report`; `workers > 1` parses files in a process pool.
+    Cached LLM answers from other data versions stop being served.
+    """
+    store = load_snapshot(snapshot_path, directory) if snapshot_path else None
+    if store is None:
+        store = ingest_directory(directory, workers=workers).to_store()
+    llm_cache.data_version = store.version
+    return store
 
 def clean_ai_response(text):
     return re.sub(r'[\{\}\"]', '', text).replace("\\n", "\n")
@@ -73,11 +96,6 @@ def clean_ai_response(text):
 def bold(text):
     return f"\033[1;36m{text}\033[0m"
 
-def text_chart(value, max_value=None, width=20):
-    if not max_value:
-        max_value = max(value)
-    return '▇' * max(1, int((value / max_value) * width))
-
 def trend_icon(value):
     if value > 0:
         return "↑"
@@ -85,13 +103,6 @@ def trend_icon(value):
         return "↓"
     return "→"
 
-def get_prev_year(fy):
-    try:
-        start = int(fy.split('-')[0])
-        return f"{start-1}-{start%1000}"
-    except:
-        return str(int(fy) - 1)
-
 def format_table(headers, rows):
     col_widths = [
         max(len(str(row[i])) for row in rows + [headers])
@@ -107,22 +118,44 @@ def format_table(headers, rows):
         data_rows.append(data_row)
     return "\n".join([top_border, header_row, separator] + data_rows + [bottom_border])
 
-def generate_explanation_for_table(table_text, context):
+def generate_explanation_for_table(table_text, context, fallback=None):
+    """LLM explanation of a report table; `fallback` builds the rule-based one (see cached_openrouter_request)"""
     prompt = (context + "\nHere is the table:\n" + table_text +
               "\nPlease provide a detailed explanation in at least 5 lines, including key insights and reasoning on how the conclusion was reached.")
-    return cached_openrouter_request("mistralai/mistral-7b-instruct:free",
+    return cached_openrouter_request("explanation",
                                       "You are a senior financial analyst providing detailed insights.",
-                                      prompt)
+                                      prompt, fallback=fallback)
 
 def get_current_price(five_paisa_client, scrip_data):
-    """Fetches the current market price using FivePaisaClient."""
-    req_data = [{"Exch": "N", "ExchType": "C", "ScripData": scrip_data}]
-    try:
-        response = five_paisa_client.fetch_market_feed_scrip(req_data)
-        return response['Data'][0]['LastRate']
-    except Exception as e:
-        print(f"Error fetching price: {e}")
-        return None
+    """Current market price: the streamed tick when the feed is live, else a (cached) 5paisa REST quote."""
+    price = tick_store.price(scrip_data)
+    if price is not None:
+        return price
+    return quote_service.get(five_paisa_client, scrip_data)
+
+def get_current_prices(five_paisa_client, scrips):
+    """Prices for several scrips: streamed ticks where live, the rest in one batched 5paisa call."""
+    prices = {scrip: tick_store.price(scrip) for scrip in scrips}
+    missing = [scrip for scrip, price in prices.items() if price is None]
+    if missing:
+        prices.update(quote_service.get_many(five_paisa_client, missing))
+    return prices
+
+def _scrip(stock):
+    ticker = stock.get('Ticker', '')
+    return f"{ticker}_EQ" if ticker else None
+
+def multi_stock_prices(stocks, five_paisa_client):
+    prices = get_current_prices(five_paisa_client, [s for s in map(_scrip, stocks) if s])
+    ist = pytz.timezone('Asia/Kolkata')
+    current_time = datetime.now(ist).strftime("%Y-%m-%d %H:%M:%S %Z")
+    rows = []
+    for stock in stocks:
+        scrip = _scrip(stock)
+        price = prices.get(scrip) if scrip else None
+        rows.append([stock['Stock'], stock.get('Ticker') or "N/A",
+                     f"₹{price}" if price is not None else "Unavailable"])
+    return f"{bold('💹 CURRENT PRICES')} (as of {current_time})\n" + format_table(["Company", "Ticker", "Price"], rows)
 
 def deploy_remote_script():
     # AWS EC2 Instance Details
@@ -160,13 +193,9 @@ def deploy_remote_script():
         ssh.close()
     return result
 
-def historical_trend_analysis(stock, metric, start_year=None, years=5):
-    all_years = sorted(stock['years'].keys(), reverse=True)
-    if start_year:
-        filtered_years = [yr for yr in all_years if int(yr.split('-')[0]) >= start_year]
-    else:
-        filtered_years = all_years
-    valid_data = [(yr, stock['years'][yr].get(metric)) for yr in filtered_years[:years] if stock['years'][yr].get(metric) is not None]
+def historical_trend_analysis(stock, metric, fundamentals, start_year=None, years=5):
+    year_labels, year_values = fundamentals.series(stock['Stock'], metric, start_year=start_year, limit=years)
+    valid_data = list(zip(year_labels, year_values.tolist()))
     if not valid_data:
         return f"{bold('⚠️ No Data')}: {metric} not available for analysis"
     years_list = [yr for yr, _ in valid_data]
@@ -179,8 +208,10 @@ def historical_trend_analysis(stock, metric, start_year=None, years=5):
         ""
     ]
     table_data = []
-    for yr, val in valid_data:
-        prev_val = next((v for y, v in valid_data if y == get_prev_year(yr)), 0)
+    for i, (yr, val) in enumerate(valid_data):
+        # valid_data is latest first, so the previous fiscal year can only be the next entry
+        has_prev = i + 1 < len(valid_data) and valid_data[i + 1][0].ordinal == yr.ordinal - 1
+        prev_val = valid_data[i + 1][1] if has_prev else 0
         # Calculate percentage change for D/E, absolute for others
         if metric == 'DebtToEquity' and prev_val != 0:
             change = ((val - prev_val) / prev_val) * 100
@@ -214,62 +245,196 @@ def historical_trend_analysis(stock, metric, start_year=None, years=5):
         overall_trend = "stable"
     response.append(f"\nOverall, the performance shows an {overall_trend}.")
     explanation = generate_explanation_for_table(table_text,
-                    "Analyze the historical trend table above. Describe how the year-over-year changes and average values contribute to the overall trend, and explain key insights from the data.")
+                    "Analyze the historical trend table above. Describe how the year-over-year changes and average values contribute to the overall trend, and explain key insights from the data.",
+                    fallback=lambda: describe_trend(metric, years_list, values))
     response.append("\n" + explanation)
     return "\n".join(response)
 
-# Add cache clearing to ensure fresh responses
-@lru_cache(maxsize=100)
-def cached_openrouter_request(model, system_content, user_content):
-    # Add this at the start
-    if os.getenv('CLEAR_CACHE'):
-        cached_openrouter_request.cache_clear()
-    payload = {
-        "model": model,
-        "messages": [
-            {"role": "system", "content": system_content},
-            {"role": "user", "content": user_content}
-        ],
-        "temperature": 0.3,
-        "max_tokens": 1000  # Increased from 250 to 1000
-    }
-    response = send_to_openrouter(payload)
+def cached_openrouter_request(prompt_class, system_content, user_content, temperature=0.3, fallback=None):
+    """Completion for a prompt class ("explanation", "verdict", ...), from the persistent LLM cache when possible.
+
+    The model is picked per call by `model_router` from the class's fallback
+    list. Cache entries are keyed by the class, so an answer from any of its
+    models is reused. Concurrent misses for the same prompt are coalesced:
+    one request goes out and every caller receives its result (or its exception).
+
+    `fallback`, if given, returns a rule-based answer. It is used instead of
+    the LLM when llm_skip_reason() says a call cannot succeed in time, and
+    instead of placeholder text when the call fails; either way the request
+    is marked degraded. Every caller that shares a failed call is marked, not
+    just the one that made it. Streaming callers are not coalesced, since
+    only the caller making the request would see its chunks.
+    """
+    cached = llm_cache.get(prompt_class, system_content, user_content, temperature)
+    if cached is not None:
+        return cached
+    if fallback is not None:
+        reason = llm_skip_reason(prompt_class)
+        if reason is not None:
+            if reason == "budget":
+                # Fill the cache off the request path so asking again gets the AI answer
+                _complete_in_background(prompt_class, system_content, user_content, temperature)
+            return _degraded(fallback())
+    context = current_request()
+    if context is not None and context.on_chunk is not None:
+        text, degraded = _fetch_completion(prompt_class, system_content, user_content, temperature, fallback)
+    else:
+        key = cache_key(prompt_class, system_content, user_content, temperature)
+        text, degraded = llm_requests.do(key, _fetch_completion, prompt_class, system_content, user_content,
+                                         temperature, fallback)
+    if degraded:
+        _mark_degraded()
+    return text
+
+def llm_skip_reason(prompt_class):
+    """"circuit_open" when no model of the class would take a call, "budget" when the
+    request's remaining time is below LLM_MIN_BUDGET_SECONDS or the fastest model's p95; else None"""
+    expected = model_router.expected_latency(prompt_class)
+    if expected is None:
+        return "circuit_open"
+    remaining = remaining_budget()
+    if remaining is not None and remaining < max(LLM_MIN_BUDGET_SECONDS, expected):
+        return "budget"
+    return None
+
+def _mark_degraded():
+    context = current_request()
+    if context is not None:
+        context.degraded = True
+
+def _degraded(text):
+    _mark_degraded()
+    return f"{DEGRADED_NOTE}\n{text}"
+
+def _complete_in_background(prompt_class, system_content, user_content, temperature):
+    # A fresh thread starts with an empty context: no deadline and no streaming
+    key = cache_key(prompt_class, system_content, user_content, temperature)
+    threading.Thread(target=llm_requests.do,
+                     args=(key, _fetch_completion, prompt_class, system_content, user_content, temperature),
+                     name=f"llm-refresh:{prompt_class}", daemon=True).start()
+
+def _fetch_completion(prompt_class, system_content, user_content, temperature, fallback=None):
+    """(text, degraded) for one prompt; callers mark their own request degraded, since
+    coalesced callers share this result but not the leader's request context"""
+    # A leader that finished just before we joined has already filled the cache
+    cached = llm_cache.peek(prompt_class, system_content, user_content, temperature)
+    if cached is not None:
+        return cached, False
+    response = _routed_completion(prompt_class, [
+        {"role": "system", "content": system_content},
+        {"role": "user", "content": user_content}
+    ], temperature)
+
+    # API failures come back as placeholder text; never persist those
+    if 'error' in response and fallback is not None:
+        return f"{DEGRADED_NOTE}\n{fallback()}", True
 
     # Handle incomplete responses
     content = response.get('choices', [{}])[0].get('message', {}).get('content', '')
     if not content.endswith(('.','!','?')):
         content += " [Analysis truncated due to length constraints]"
 
-    return content
+    if 'error' in response:
+        return content, True
+    llm_cache.put(prompt_class, system_content, user_content, temperature, content)
+    return content, False
+
+def _routed_completion(prompt_class, messages, temperature):
+    """Try the class's healthy models fastest first, recording each attempt with the router.
+
+    Only the last candidate gets the full retry policy; earlier ones fail
+    over to the next model instead of retrying. Once text has been streamed
+    to the client there is no failover, since it would start a second answer.
+    Every attempt, retries included, is admitted by `llm_limiter`; when it is
+    saturated the caller gets a "busy" placeholder rather than adding to the load.
+    """
+    context = current_request()
+    on_chunk = context.on_chunk if context is not None else None
+    streamed = []
+
+    def forward(text):
+        streamed.append(text)
+        on_chunk(text)
+
+    response = {
+        "error": f"No model available for {prompt_class}",
+        "choices": [{"message": {"content": "Unable to complete analysis: no language model is available right now."}}]
+    }
+    models = model_router.candidates(prompt_class)
+    for i, model in enumerate(models):
+        remaining = remaining_budget()
+        if remaining is not None and remaining <= 0:
+            model_router.release(models[i:])
+            break
+        payload = {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": 1000  # Increased from 250 to 1000
+        }
+        policy = LLM_RETRY_POLICY if i == len(models) - 1 else SINGLE_ATTEMPT
+        started = time.monotonic()
+        try:
+            if on_chunk is not None:
+                response = stream_openrouter(payload, forward, policy)
+            else:
+                response = send_to_openrouter(payload, policy)
+        except Saturated as e:
+            # Counted in llm_limiter.stats()["rejected"]
+            response = {
+                "error": str(e),
+                "choices": [{"message": {"content": "The analysis service is busy right now. Please try again in a moment."}}]
+            }
+            # Only a full bulkhead is specific to this model; the queue and the rate limit are shared
+            if e.reason != "concurrency":
+                model_router.release(models[i:])
+                break
+            model_router.release([model])
+            continue
+        except BaseException:
+            # Missing API key, an unmapped transport error, the request Timeout...:
+            # count it against this model and hand back the untried half-open probes,
+            # or their breakers would wait forever for a probe that never reports
+            model_router.record(prompt_class, model, time.monotonic() - started, False)
+            model_router.release(models[i + 1:])
+            raise
+        ok = 'error' not in response
+        model_router.record(prompt_class, model, time.monotonic() - started, ok)
+        if ok or streamed:
+            model_router.release(models[i + 1:])
+            break
+    return response
 
 def annual_report_summarizer(stock, year=None):
     if not year:
-        year = max(stock['years'].keys())
+        year = latest_year(stock)
     if year not in stock['years']:
         return f"No data available for {year}"
     data = stock['years'][year]
     prompt = f"Create a concise 5-point summary for {stock['Stock']}'s {year} annual report with these metrics: "
     prompt += ", ".join([f"{k}: {v}" for k, v in data.items()])
     system_content = "You are a financial analyst creating concise report summaries."
-    return cached_openrouter_request("mistralai/mistral-7b-instruct:free", system_content, prompt)
+    return cached_openrouter_request("summary", system_content, prompt)
 
-def financial_health_timeline(stock, metric_filter=None):
+def financial_health_timeline(stock, fundamentals, metric_filter=None):
     # Enhanced validation
     if metric_filter == 'CashReserve':
-        if not any(stock['years'][y].get('CashReserve') is not None for y in stock['years']):
+        if not fundamentals.has_metric(stock['Stock'], 'CashReserve'):
             return "Cash reserve data not available for this stock"
 
     metrics = ['CashReserve'] if metric_filter == 'CashReserve' else ['DebtToEquity', 'InterestCoverage', 'PromoterHolding']
 
     timeline_data = []
-    for year in sorted(stock['years'].keys(), reverse=True)[:3]:  # Last 3 years
+    series = {metric: [] for metric in metrics}
+    for year in fundamentals.stock_years(stock['Stock'])[:3]:  # Last 3 years
         year_metrics = []
         for metric in metrics:
-            if value := stock['years'][year].get(metric):
+            if value := fundamentals.value(stock['Stock'], year, metric):
+                series[metric].append((year, value))
                 if metric == 'CashReserve':
-                    year_metrics.append(f"Cash Reserve: ₹{safe_float(value):,.0f} Cr")
+                    year_metrics.append(f"Cash Reserve: ₹{value:,.0f} Cr")
                 else:
-                    year_metrics.append(f"{metric}: {value}")
+                    year_metrics.append(f"{metric}: {value:g}")
         if year_metrics:
             timeline_data.append([year, "\n".join(year_metrics)])
 
@@ -277,12 +442,52 @@ def financial_health_timeline(stock, metric_filter=None):
                  format_table(["Year", "Metrics"], timeline_data))
     explanation = generate_explanation_for_table(table_text,
                     "Analyze the cash reserve changes" if metric_filter else
-                    "Analyze the financial health timeline")
+                    "Analyze the financial health timeline",
+                    fallback=lambda: describe_timeline(series))
     return table_text + "\n" + explanation
 
-def performance_forecasting(stock, metric, years=3):
-    sorted_years = sorted(stock['years'].keys(), reverse=True)[:years]
-    values = [stock['years'][y].get(metric, 0) for y in sorted_years]
+# Side-by-side metrics when a comparison names no specific metric
+COMPARE_METRICS = ('RevenueGrowth', 'EBITDAGrowth', 'NetProfitMargin', 'DebtToEquity',
+                   'InterestCoverage', 'ROCE', 'PromoterHolding')
+# Metrics where the smallest value is the best
+LOWER_IS_BETTER = frozenset({'DebtToEquity', 'AccountsReceivableDays'})
+
+def compare_stocks(stocks, fundamentals, metric=None, five_paisa_client=None):
+    """Latest-year fundamentals of several stocks in one table, with prices from one batched quote call"""
+    if metric in fundamentals.metric_index:
+        metrics = [metric]
+    else:
+        metrics = [m for m in COMPARE_METRICS if m in fundamentals.metric_index]
+    names = [stock['Stock'] for stock in stocks]
+    years, values = fundamentals.latest_values(names, metrics)
+
+    # Leader per metric in one pass over the stocks x metrics block
+    signed = np.where([m in LOWER_IS_BETTER for m in metrics], -values, values)
+    has_data = ~np.isnan(signed).all(axis=0)
+    best = np.argmax(np.where(np.isnan(signed), -np.inf, signed), axis=0)
+    leaders = {metrics[m]: names[best[m]] for m in np.flatnonzero(has_data)}
+
+    prices = get_current_prices(five_paisa_client, [s for s in map(_scrip, stocks) if s]) if five_paisa_client else {}
+    rows = []
+    for s, stock in enumerate(stocks):
+        cells = ["N/A" if np.isnan(v) else f"{v:.2f}" if metrics[m] == 'DebtToEquity' else f"{v:g}"
+                 for m, v in enumerate(values[s].tolist())]
+        price = prices.get(_scrip(stock))
+        rows.append([stock['Stock'], str(years[s] or "N/A"), *cells, f"₹{price}" if price is not None else "N/A"])
+    table_text = (f"{bold('⚖️ COMPANY COMPARISON')}\n" +
+                  format_table(["Company", "Year", *metrics, "Price"], rows))
+    response = [table_text, "\n" + bold("🏆 LEADERS:")]
+    response.extend(f"- {m}: {leader}" for m, leader in leaders.items())
+    explanation = generate_explanation_for_table(table_text,
+                    "Compare these companies on the metrics above (latest reported year for each). "
+                    "Explain who leads on growth, profitability and balance-sheet strength, and why.",
+                    fallback=lambda: describe_comparison(names, metrics, values.tolist(), leaders))
+    response.append("\n" + explanation)
+    return "\n".join(response)
+
+def performance_forecasting(stock, metric, fundamentals, years=3):
+    sorted_years, year_values = fundamentals.series(stock['Stock'], metric, limit=years, dropna=False)
+    values = np.nan_to_num(year_values, nan=0.0).tolist()
 
     if len(values) < 2:
         return format_table(["Warning"], [["Insufficient data for forecasting"]])
@@ -290,9 +495,7 @@ def performance_forecasting(stock, metric, years=3):
     # Calculate YoY changes using actual previous fiscal years
     growth_rates = []
     for i in range(len(sorted_years)):
-        current_year = sorted_years[i]
-        prev_year = get_prev_year(current_year)
-        prev_value = stock['years'].get(prev_year, {}).get(metric, None)
+        prev_value = fundamentals.previous_value(stock['Stock'], sorted_years[i], metric)
 
         if prev_value is not None and prev_value != 0:
             growth = ((values[i] - prev_value) / prev_value) * 100
@@ -327,80 +530,20 @@ def performance_forecasting(stock, metric, years=3):
     ])
 
     explanation = generate_explanation_for_table(table_text,
-                    "Analyze the performance forecast table above. Explain the year-over-year growth rates and how they contribute to the CAGR.")
+                    "Analyze the performance forecast table above. Explain the year-over-year growth rates and how they contribute to the CAGR.",
+                    fallback=lambda: describe_forecast(metric, sorted_years, values, growth_rates, cagr, forecast))
     return table_text + "\n" + explanation
 
-def generate_ai_summary(prompt):
-    system_content = "You are a financial analyst creating concise report summaries."
-    return cached_openrouter_request("mistralai/mistral-7b-instruct:free", system_content, prompt)
-
 def extract_metric(query):
-    metrics = {
-        'revenue': 'RevenueGrowth',
-        'ebitda': 'EBITDAGrowth',
-        'debt': 'DebtToEquity',
-        'debt ratio': 'DebtToEquity',
-        'profit': 'NetProfitMargin',
-        'recommendation': 'Verdict',
-        'advice': 'Verdict',
-        'cash reserve':'CashReserve',  # Add mapping
-        'cash':'CashReserve'
-    }
-    for key, metric in metrics.items():
-        if key in query.lower():
-            return metric
-    return None
+    return parse_query(query).metric
 
 def find_stock_from_query(query, stock_data):
-    query_lower = query.lower()
-    for stock in stock_data:
-        name = stock.get('Stock', '')
-        if query_lower == name.lower():
-            return name
-    for stock in stock_data:
-        name = stock.get('Stock', '').lower()
-        query_words = set(query_lower.split())
-        name_words = set(name.split())
-        if query_words & name_words:
-            return stock.get('Stock')
-    abbrev_mapping = {
-        'asian': 'Asian Paints Limited',
-        'itc': 'ITC Limited',
-        'coal': 'Coal India Limited',
-        'bharti': 'Bharti Airtel Limited',
-        'bajaj': 'Bajaj Auto Limited',
-        'axis': 'Axis Bank Limited'
-    }
-    for abbrev, full_name in abbrev_mapping.items():
-        if abbrev in query_lower:
-            if any(s.get('Stock', '').lower() == full_name.lower() for s in stock_data):
-                return full_name
-    return None
-
-def clean_numerical_fields(stock_item):
-    if 'years' not in stock_item:
-        return
-    numerical_fields = [
-        'RevenueGrowth', 'EBITDAGrowth', 'NetProfitMargin',
-        'DebtToEquity', 'InterestCoverage', 'PromoterHolding',
-        'IndustryRanking', 'EPSGrowth'
-    ]
-    for year, data in stock_item['years'].items():
-        for field in numerical_fields:
-            if field in data:
-                data[field] = safe_float(data[field])
+    """Exact name/ticker/alias first, then the token index (IDF-weighted, typo tolerant)"""
+    stock = stock_data.resolve(query)
+    return stock['Stock'] if stock else None
 
 def extract_year(query):
-    year_match = re.search(r'(20\d{2}-\d{2})|(FY\s?\d{4})|(20\d{2})', query, re.IGNORECASE)
-    if year_match:
-        year = year_match.group()
-        if '-' in year and len(year) == 7:
-            return year
-        elif year.lower().startswith('fy'):
-            return f"20{year[-2:]}-{str(int(year[-2:])) + 1}"
-        else:
-            return f"{year}-{str(int(year) + 1)[-2:]}"
-    return None
+    return parse_query(query).year
 
 def validate_data_presence(stock, metric):
     required_fields = {
@@ -409,8 +552,8 @@ def validate_data_presence(stock, metric):
         'debt': ['DebtToEquity'],
         'cash': ['CashReserve']
     }
-    latest_year = max(stock['years'])
-    missing = [f for f in required_fields.get(metric, []) if f not in stock['years'][latest_year]]
+    latest = latest_year(stock)
+    missing = [f for f in required_fields.get(metric, []) if f not in stock['years'][latest]]
     return missing
 
 # New scoring functions based on the provided rules
@@ -443,11 +586,13 @@ def score_holding(value):
     if value > 60: return {'points': 3, 'display': '+3 (>60%)'}
     return {'points': -1, 'display': '-1 (<40%)'}
 
-def calculate_risks(stock, year):
+def calculate_risks(stock, year, fundamentals):
+    debt_to_equity = fundamentals.value(stock['Stock'], year, 'DebtToEquity') or 0.0
+    revenue_growth = fundamentals.value(stock['Stock'], year, 'RevenueGrowth') or 0.0
     risks = {
         'geo_political': -5 if 'paints' in stock['Stock'].lower() else 0,
-        'debt_risk': -3 if safe_float(stock['years'][year].get('DebtToEquity', 0)) > 4 else 0,
-        'growth_risk': -2 if safe_float(stock['years'][year].get('RevenueGrowth', 0)) < 5 else 0
+        'debt_risk': -3 if debt_to_equity > 4 else 0,
+        'growth_risk': -2 if revenue_growth < 5 else 0
     }
     return {
         'total': sum(risks.values()),
@@ -485,12 +630,12 @@ def get_recommendation(score):
 # Add these NEW functions to handle general stock analysis
 def analyze_stock(stock_name, stock_data, year=None):
     """Comprehensive stock analysis combining multiple metrics"""
-    stock = next((s for s in stock_data if s['Stock'].lower() == stock_name.lower()), None)
+    stock = stock_data.get(stock_name)
     if not stock:
         return {"error": f"Stock '{stock_name}' not found in database"}
 
     if not year:
-        year = max(stock['years'].keys(), default=None)
+        year = latest_year(stock)
         if not year:
             return {"error": "No annual data available for this stock"}
 
@@ -506,24 +651,26 @@ def analyze_stock(stock_name, stock_data, year=None):
     # Basic metrics
     current_data = stock['years'].get(year, {})
     analysis["Basic Metrics"] = {
-        "Revenue Growth": safe_float(current_data.get('RevenueGrowth')),
-        "EBITDA Margin": safe_float(current_data.get('EBITDAGrowth')),
-        "Net Profit Margin": safe_float(current_data.get('NetProfitMargin')),
-        "ROCE": safe_float(current_data.get('ROCE')),
-        "EPS Growth": safe_float(current_data.get('EPSGrowth'))
+        "Revenue Growth": current_data.get('RevenueGrowth') or 0.0,
+        "EBITDA Margin": current_data.get('EBITDAGrowth') or 0.0,
+        "Net Profit Margin": current_data.get('NetProfitMargin') or 0.0,
+        "ROCE": current_data.get('ROCE') or 0.0,
+        "EPS Growth": current_data.get('EPSGrowth') or 0.0
     }
 
-    # Trend analysis
-    analysis["Trend Analysis"] = {
-        "3Y Revenue Trend": historical_trend_analysis(stock, 'RevenueGrowth', years=3),
-        "5Y Profit Trend": historical_trend_analysis(stock, 'NetProfitMargin', years=5)
-    }
+    # Trend analysis; each section waits on its own LLM explanation, so run them side by side
+    analysis["Trend Analysis"] = fan_out({
+        "3Y Revenue Trend": lambda: historical_trend_analysis(stock, 'RevenueGrowth', years=3,
+                                                              fundamentals=stock_data.fundamentals),
+        "5Y Profit Trend": lambda: historical_trend_analysis(stock, 'NetProfitMargin', years=5,
+                                                             fundamentals=stock_data.fundamentals)
+    })
 
     # Financial health
     analysis["Financial Health"] = {
-        "Debt Ratio": safe_float(current_data.get('DebtToEquity')),
-        "Interest Coverage": safe_float(current_data.get('InterestCoverage')),
-        "Promoter Holding": safe_float(current_data.get('PromoterHolding'))
+        "Debt Ratio": current_data.get('DebtToEquity') or 0.0,
+        "Interest Coverage": current_data.get('InterestCoverage') or 0.0,
+        "Promoter Holding": current_data.get('PromoterHolding') or 0.0
     }
 
     return analysis
@@ -579,9 +726,9 @@ def check_benfords_law(stock):
     """Apply Benford's Law to detect accounting anomalies"""
     amounts = []
     for year, data in stock['years'].items():
-        if 'Revenue' in data:
-            amount = str(int(safe_float(data['Revenue'])))
-            if amount:
+        if data.get('Revenue') is not None:
+            amount = str(int(abs(data['Revenue'])))
+            if amount != '0':
                 amounts.append(amount[0])
 
     if not amounts:
@@ -610,8 +757,8 @@ def detect_insider_trading(stock):
     if not trading_data:
         return ["No insider trading data available"]
 
-    last_year = max(stock['years'].keys(), default="")
-    recent_trades = [t for t in trading_data if t.get('date', '').startswith(last_year.split('-')[0])]
+    last_year = latest_year(stock)
+    recent_trades = [t for t in trading_data if last_year and t.get('date', '').startswith(str(last_year.ordinal))]
 
     if not recent_trades:
         return ["No recent insider trades"]
@@ -629,8 +776,8 @@ def analyze_revenue_quality(stock):
     """Check for revenue recognition issues"""
     anomalies = []
     for year, data in stock['years'].items():
-        rev_growth = safe_float(data.get('RevenueGrowth', 0))
-        ar_days = safe_float(data.get('AccountsReceivableDays', 0))
+        rev_growth = data.get('RevenueGrowth') or 0.0
+        ar_days = data.get('AccountsReceivableDays') or 0.0
 
         if rev_growth > 20 and ar_days > 90:
             anomalies.append(f"{year}: High revenue growth ({rev_growth}%) with long AR days ({ar_days})")
@@ -645,7 +792,7 @@ def analyze_revenue_quality(stock):
 def forensic_analysis(stock, year=None):
     """Perform forensic financial analysis on a stock"""
     if not year:
-        year = max(stock['years'].keys(), default=None)
+        year = latest_year(stock)
 
     current_data = stock['years'].get(year, {})
     analysis = {
@@ -691,7 +838,7 @@ def check_expense_anomalies(stock):
     """Detect unusual expense patterns"""
     anomalies = []
     for year, data in stock['years'].items():
-        if safe_float(data.get('EBITDAGrowth', 0)) < -50 and safe_float(data.get('RevenueGrowth', 0)) > 5:
+        if (data.get('EBITDAGrowth') or 0.0) < -50 and (data.get('RevenueGrowth') or 0.0) > 5:
             anomalies.append(f"{year}: Severe EBITDA decline ({data['EBITDAGrowth']}%) despite revenue growth")
     return anomalies if anomalies else ["No significant expense anomalies"]
 
@@ -723,7 +870,7 @@ Focus on:
 2. Investor implications
 3. Recommended next steps
 """
-    explanation = cached_openrouter_request("anthropic/claude-3-haiku",
+    explanation = cached_openrouter_request("forensic",
                                            "You're a forensic accountant explaining findings",
                                            prompt)
     report.extend(["\n" + bold("📝 Expert Interpretation:"), clean_ai_response(explanation)])
@@ -731,167 +878,105 @@ Focus on:
     return "\n".join(report)
 
 # Updated process_query function
+def place_market_order(neo_client, stock, quantity, side):
+    """Market CNC order on NSE through the Neo API; `side` is 'buy' or 'sell'"""
+    ticker = stock.get('Ticker', '')
+    if not ticker:
+        return f"No ticker available for {stock['Stock']}."
+    trading_symbol = f"{ticker}-EQ"  # e.g., 'ITC-EQ'
+    # Orders are sent at most once: never after the client has given up on the reply
+    remaining = remaining_budget()
+    if remaining is not None and remaining < BROKER_RETRY_POLICY.min_attempt_seconds:
+        return f"{side.capitalize()} order not sent: the request ran out of time. Please try again."
+    try:
+        print(f"Placing {side} order with Neo API: symbol={trading_symbol}, quantity={quantity}")
+        response = neo_client.place_order(
+            exchange_segment='nse_cm',
+            product='CNC',
+            price='0',
+            order_type='MKT',
+            quantity=str(quantity),
+            validity='DAY',
+            trading_symbol=trading_symbol,
+            transaction_type='B' if side == 'buy' else 'S',
+            amo="NO",
+            disclosed_quantity="0",
+            market_protection="0",
+            pf="N",
+            trigger_price="0",
+            tag=None
+        )
+        print(f"Neo API response: {response}")
+        if response and ('stat' in response and response['stat'] == 'Ok'):
+            order_id = response.get('nOrdNo', 'Not provided')
+            return f"{side.capitalize()} order placed successfully for {quantity} shares of {stock['Stock']}. Order ID: {order_id}"
+        elif response and 'code' in response and response['code'] == '900901':
+            return "Authentication failed: Invalid JWT token. Please restart the chatbot and provide a valid OTP."
+        else:
+            return f"Failed to place {side} order. Response: {response}"
+    except Exception as e:
+        return f"Failed to place {side} order with Neo API: {str(e)}"
+
 def process_query(query, stock_data, five_paisa_client, neo_client):
-    lower_query = query.lower()
+    parsed = parse_query(query, stock_data)
+    intent = parsed.intent
+    stock = parsed.stock
 
-    # Greeting check (unchanged)
-    greeting_pattern = r'\b(hi|hello|hey|howdy|hola)\b'
-    if re.search(greeting_pattern, lower_query) and len(query.split()) <= 3:
+    if intent == Intent.GREETING:
         return "Hello! I'm your Stock Analysis Chatbot. I can help you analyze financial data or place buy/sell orders for stocks in our database. To place an order, use 'place buy order for [quantity] shares of [stock]' or 'place sell order for [quantity] shares of [stock]'."
 
-    if lower_query.startswith("deploy"):
+    if intent == Intent.DEPLOY:
       return deploy_remote_script()
 
-    # Forensic triggers (unchanged)
-    forensic_triggers = [
-        'forensic', 'fraud check', 'accounting anomaly', 'auditor remark',
-        'insider trading', 'benford', 'revenue quality', 'cash flow',
-        'related party', 'expense anomaly'
-    ]
-    if any(trigger in lower_query for trigger in forensic_triggers):
-        matched_stock = find_stock_from_query(query, stock_data)
-        if matched_stock:
-            stock = next((s for s in stock_data if s['Stock'].lower() == matched_stock.lower()), None)
+    if intent == Intent.FORENSIC:
+        if stock:
             return forensic_analysis(stock)
         return "Please specify a valid stock for forensic analysis"
 
-    # Buy order check with Neo API
-    buy_match = re.search(r'place buy order for (\d+) shares of (.+)', lower_query)
-    if buy_match:
-        quantity = int(buy_match.group(1))
-        stock_name = buy_match.group(2).strip()
-        matched_stock = find_stock_from_query(stock_name, stock_data)
-        if matched_stock:
-            stock = next((s for s in stock_data if s['Stock'] == matched_stock), None)
-            if stock:
-                ticker = stock.get('Ticker', '')
-                if not ticker:
-                    return f"No ticker available for {stock['Stock']}."
-                trading_symbol = f"{ticker}-EQ"  # e.g., 'ITC-EQ'
-                try:
-                    print(f"Placing buy order with Neo API: symbol={trading_symbol}, quantity={quantity}")
-                    response = neo_client.place_order(
-                        exchange_segment='nse_cm',
-                        product='CNC',
-                        price='0',
-                        order_type='MKT',
-                        quantity=str(quantity),
-                        validity='DAY',
-                        trading_symbol=trading_symbol,
-                        transaction_type='B',  # Buy
-                        amo="NO",
-                        disclosed_quantity="0",
-                        market_protection="0",
-                        pf="N",
-                        trigger_price="0",
-                        tag=None
-                    )
-                    print(f"Neo API response: {response}")
-                    if response and ('stat' in response and response['stat'] == 'Ok'):
-                        order_id = response.get('nOrdNo', 'Not provided')
-                        return f"Buy order placed successfully for {quantity} shares of {stock['Stock']}. Order ID: {order_id}"
-                    elif response and 'code' in response and response['code'] == '900901':
-                        return "Authentication failed: Invalid JWT token. Please restart the chatbot and provide a valid OTP."
-                    else:
-                        return f"Failed to place buy order. Response: {response}"
-                except Exception as e:
-                    return f"Failed to place buy order with Neo API: {str(e)}"
-            else:
-                return "Stock not found in database after matching."
-        else:
-            return f"Stock '{stock_name}' not found in database. Try the full name or check available stocks."
-
-    # Sell order check with Neo API
-    sell_match = re.search(r'place sell order for (\d+) shares of (.+)', lower_query)
-    if sell_match:
-        quantity = int(sell_match.group(1))
-        stock_name = sell_match.group(2).strip()
-        matched_stock = find_stock_from_query(stock_name, stock_data)
-        if matched_stock:
-            stock = next((s for s in stock_data if s['Stock'] == matched_stock), None)
-            if stock:
-                ticker = stock.get('Ticker', '')
-                if not ticker:
-                    return f"No ticker available for {stock['Stock']}."
-                trading_symbol = f"{ticker}-EQ"  # e.g., 'ITC-EQ'
-                try:
-                    print(f"Placing sell order with Neo API: symbol={trading_symbol}, quantity={quantity}")
-                    response = neo_client.place_order(
-                        exchange_segment='nse_cm',
-                        product='CNC',
-                        price='0',
-                        order_type='MKT',
-                        quantity=str(quantity),
-                        validity='DAY',
-                        trading_symbol=trading_symbol,
-                        transaction_type='S',  # Sell
-                        amo="NO",
-                        disclosed_quantity="0",
-                        market_protection="0",
-                        pf="N",
-                        trigger_price="0",
-                        tag=None
-                    )
-                    print(f"Neo API response: {response}")
-                    if response and ('stat' in response and response['stat'] == 'Ok'):
-                        order_id = response.get('nOrdNo', 'Not provided')
-                        return f"Sell order placed successfully for {quantity} shares of {stock['Stock']}. Order ID: {order_id}"
-                    elif response and 'code' in response and response['code'] == '900901':
-                        return "Authentication failed: Invalid JWT token. Please restart the chatbot and provide a valid OTP."
-                    else:
-                        return f"Failed to place sell order. Response: {response}"
-                except Exception as e:
-                    return f"Failed to place sell order with Neo API: {str(e)}"
-            else:
-                return "Stock not found in database after matching."
+    if intent == Intent.ORDER:
+        if not stock:
+            return f"Stock '{parsed.target}' not found in database. Try the full name or check available stocks."
+        return place_market_order(neo_client, stock, parsed.quantity, parsed.side)
+
+    fundamentals = stock_data.fundamentals
+    if intent == Intent.FORECAST:
+        return performance_forecasting(stock, parsed.metric, years=3, fundamentals=fundamentals)
+    if intent == Intent.SUMMARY:
+        return annual_report_summarizer(stock, parsed.year)
+    if intent == Intent.CASH_TIMELINE:
+        return financial_health_timeline(stock, metric_filter='CashReserve', fundamentals=fundamentals)
+    if intent == Intent.TREND:
+        return historical_trend_analysis(stock, parsed.metric, start_year=parsed.start_year, fundamentals=fundamentals)
+    if intent == Intent.COMPARE:
+        return compare_stocks(parsed.stocks, fundamentals, metric=parsed.metric,
+                              five_paisa_client=five_paisa_client)
+    if intent == Intent.PRICE and parsed.stocks:
+        return multi_stock_prices(parsed.stocks, five_paisa_client)
+    if intent == Intent.PRICE:
+        ticker = stock.get('Ticker', '')
+        if not ticker:
+            return f"No ticker available for {stock['Stock']} in the database."
+        scrip_data = f"{ticker}_EQ"
+        current_price = get_current_price(five_paisa_client, scrip_data)
+        if current_price is not None:
+            ist = pytz.timezone('Asia/Kolkata')
+            current_time = datetime.now(ist).strftime("%Y-%m-%d %H:%M:%S %Z")
+            return f"The current price of {stock['Stock']} ({ticker}) is ₹{current_price} as of {current_time}."
         else:
-            return f"Stock '{stock_name}' not found in database. Try the full name or check available stocks."
-
-    # Rest of the function remains unchanged (omitted for brevity)
-    start_year_match = re.search(r'since\s*(\d{4})', query, re.IGNORECASE)
-    start_year = int(start_year_match.group(1)) if start_year_match else None
-    extracted_year = extract_year(query)
-    clean_query = re.sub(r'(20\d{2}-\d{2})|(FY\s?\d{4})|(20\d{2})', '', query, flags=re.IGNORECASE).strip()
-
-    matched_stock = find_stock_from_query(clean_query, stock_data)
-    if matched_stock:
-        stock = next((s for s in stock_data if s['Stock'].lower() == matched_stock.lower()), None)
-        metric = extract_metric(clean_query)
-        lower_query = query.lower()
-
-        if "predict" in lower_query and metric:
-            return performance_forecasting(stock, metric, years=3)
-        elif "summarize" in lower_query or "annual report" in lower_query:
-            return annual_report_summarizer(stock, extracted_year)
-        elif ("display" in lower_query or "show" in lower_query) and "cash reserve" in lower_query:
-            return financial_health_timeline(stock, metric_filter='CashReserve')
-        elif "trend" in lower_query and metric:
-            return historical_trend_analysis(stock, metric, start_year=start_year)
-
-        price_keywords = ["current price", "live price", "stock price", "market price", "share price"]
-        if any(keyword in lower_query for keyword in price_keywords):
-            ticker = stock.get('Ticker', '')
-            if not ticker:
-                return f"No ticker available for {stock['Stock']} in the database."
-            scrip_data = f"{ticker}_EQ"
-            current_price = get_current_price(five_paisa_client, scrip_data)
-            if current_price is not None:
-                ist = pytz.timezone('Asia/Kolkata')
-                current_time = datetime.now(ist).strftime("%Y-%m-%d %H:%M:%S %Z")
-                return f"The current price of {stock['Stock']} ({ticker}) is ₹{current_price} as of {current_time}."
-            else:
-                return f"Unable to fetch the current price for {stock['Stock']} at this time."
+            return f"Unable to fetch the current price for {stock['Stock']} at this time."
+    if intent == Intent.VERDICT:
+        return generate_scoring_verdict(stock, fundamentals, parsed.year)
+    if intent == Intent.ANALYSIS:
+        return format_analysis_response(analyze_stock(stock['Stock'], stock_data, parsed.year))
 
-        return generate_scoring_verdict(stock, extracted_year)
-
-    if any(term in lower_query for term in ['stock', 'share', 'market', 'invest', 'finance', 'analysis']):
+    if intent == Intent.UNKNOWN_STOCK:
         return "I don't have information about this specific stock or query in my database. I can help you analyze stocks in my database. Could you ask about one of those instead?"
     else:
         return "I'm specialized in stock analysis based on my financial database. I don’t have information to answer this query. Could I help you with analyzing stocks in my database instead?"
 
-def generate_scoring_verdict(stock, year=None):
+def generate_scoring_verdict(stock, fundamentals, year=None):
     if not year:
-        year = max(stock['years'].keys(), default=None)
+        year = latest_year(stock)
         if not year:
             return f"{bold('❌ Error')}: No annual data available for {stock['Stock']}"
 
@@ -922,59 +1007,145 @@ Your response should:
 **Ensure that your response includes at least 200 words** and starts with "Score: <value>/100" on a new line.
 """
     # Call OpenRouter API using your cached function.
-    # Replace "your-model-name" with the actual model identifier you wish to use.
     response_text = cached_openrouter_request(
-        "meta-llama/llama-3.3-70b-instruct:free",
+        "verdict",
         "You are a senior financial analyst evaluating stock performance based solely on provided metrics.",
-        prompt
+        prompt,
+        fallback=lambda: rule_based_verdict(stock, year, fundamentals)
     )
     return response_text
 
+# Best case of the score_* rules: 10 + 15 + 10 + 5 + 5 points
+MAX_RULE_POINTS = 45
+
+def rule_based_verdict(stock, year, fundamentals):
+    """Verdict from the score_* bands and calculate_risks, scaled to 0-100 for get_recommendation"""
+    rules = [
+        ("Revenue Growth", 'RevenueGrowth', score_revenue_growth),
+        ("EBITDA Growth", 'EBITDAGrowth', score_ebitda),
+        ("Net Profit Margin", 'NetProfitMargin', score_profit),
+        ("Debt-to-Equity", 'DebtToEquity', score_debt),
+        ("Promoter Holding", 'PromoterHolding', score_holding),
+    ]
+    rows = []
+    points = 0
+    for label, metric, rule in rules:
+        value = fundamentals.value(stock['Stock'], year, metric)
+        if value is None:
+            continue
+        band = rule(value)
+        rows.append((label, value, band['display']))
+        points += band['points']
+    risks = calculate_risks(stock, year, fundamentals)
+    score = max(0, min(100, round((points + risks['total']) / MAX_RULE_POINTS * 100)))
+    recommendation = get_recommendation(score)['text']
+    return describe_scorecard(stock['Stock'], year, rows, risks['total'], score, recommendation)
+
 
 # Helper function for bold text
 def bold(text):
     return f"**{text}**"  # Replace with actual formatting as needed
 
 
-def send_to_openrouter(payload, max_retries=3, retry_delay=5):
+def send_to_openrouter(payload, policy=None):
+    """POST a chat completion, retrying transient failures within the request's deadline.
+
+    Each attempt takes its own `llm_limiter` slot, so retries spend rate
+    tokens too; `Saturated` propagates to the caller.
+    """
     api_key = os.getenv("OPENROUTER_API_KEY")  # removed insecure fallback
     if not api_key:
         raise RuntimeError(
             "OPENROUTER_API_KEY not set. Export it in your shell or put it in a .env file."
         )
-    url = "https://openrouter.ai/api/v1/chat/completions"
+    url = OPENROUTER_CHAT_URL
     headers = {
         "Authorization": f"Bearer {api_key}",
         "Content-Type": "application/json"
     }
-    for attempt in range(max_retries):
-        try:
-            response = requests.post(url, headers=headers, data=json.dumps(payload))
+
+    def attempt(remaining):
+        with llm_limiter.slot(payload["model"]):
+            # Waiting for the slot ate into the budget the policy measured
+            response = get_session().post(url, headers=headers, data=json.dumps(payload),
+                                          timeout=request_timeout(remaining_budget()))
             response.raise_for_status()
             return response.json()
-        except requests.exceptions.RequestException as e:
-            if attempt < max_retries - 1:
-                if "quota" in str(e).lower():
-                    print(f"API quota limit reached. Retrying in {retry_delay} seconds...")
-                    time.sleep(retry_delay)
-                else:
-                    print(f"API error: {str(e)}. Retrying in {retry_delay} seconds...")
-                    time.sleep(retry_delay)
-            else:
-                return {
-                    "choices": [{
-                        "message": {
-                            "content": f"Unable to complete analysis due to API error: {str(e)}"
-                        }
-                    }]
+
+    try:
+        return (policy or LLM_RETRY_POLICY).run(attempt, name="OpenRouter request")
+    except (requests.exceptions.RequestException, ValueError, DeadlineExceeded) as e:
+        print(f"API error: {str(e)}")
+        return {
+            "error": str(e),
+            "choices": [{
+                "message": {
+                    "content": f"Unable to complete analysis due to API error: {str(e)}"
                 }
-    return {"error": "Exceeded maximum retries."}
+            }]
+        }
+
+def stream_openrouter(payload, on_chunk, policy=None):
+    """send_to_openrouter over OpenRouter's SSE stream, passing each content delta to `on_chunk`.
+
+    Returns the same response shape as send_to_openrouter. Failures before the
+    first token fall back to the non-streaming call and its retries; after
+    that the partial text is returned, marked with "error". The stream holds
+    one `llm_limiter` slot until it ends; the fallback takes its own per attempt.
+    """
+    api_key = os.getenv("OPENROUTER_API_KEY")
+    if not api_key:
+        raise RuntimeError(
+            "OPENROUTER_API_KEY not set. Export it in your shell or put it in a .env file."
+        )
+    headers = {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json",
+        "Accept": "text/event-stream"
+    }
+    parts = []
+    try:
+        with llm_limiter.slot(payload["model"]):
+            remaining = remaining_budget()
+            if remaining is not None and remaining <= 0:
+                raise DeadlineExceeded("No time left for OpenRouter stream")
+            with get_session().post(OPENROUTER_CHAT_URL, headers=headers, data=json.dumps({**payload, "stream": True}),
+                                    timeout=request_timeout(remaining), stream=True) as response:
+                response.raise_for_status()
+                response.encoding = "utf-8"
+                for line in response.iter_lines(decode_unicode=True):
+                    # Blank lines separate events; ":" lines are keep-alive comments
+                    if not line or not line.startswith("data:"):
+                        continue
+                    data = line[5:].strip()
+                    if data == "[DONE]":
+                        break
+                    event = json.loads(data)
+                    if event.get("error"):
+                        raise RuntimeError(event["error"].get("message", "stream error"))
+                    delta = event.get("choices", [{}])[0].get("delta", {}).get("content")
+                    if delta:
+                        parts.append(delta)
+                        on_chunk(delta)
+    except DeadlineExceeded as e:
+        content = "".join(parts) or f"Unable to complete analysis due to API error: {str(e)}"
+        return {"error": str(e), "choices": [{"message": {"content": content}}]}
+    except (requests.exceptions.RequestException, ValueError, RuntimeError) as e:
+        if not parts:
+            print(f"Streaming failed before the first token ({e}), retrying without streaming")
+            return send_to_openrouter(payload, policy)
+        return {"error": str(e), "choices": [{"message": {"content": "".join(parts)}}]}
+    return {"choices": [{"message": {"content": "".join(parts)}}]}
 
 def openrouter_chat(query, stock_data, general_chat=False):
+    # Only the records relevant to the query go into the prompt; a misspelt
+    # company name still pulls in that company's records via the resolver
+    stock = stock_data.resolve(query)
+    search_text = f"{query} {stock['Stock']}" if stock else query
     system_message = f"""You are a financial data parser that ONLY uses provided JSON data.
 NEVER use prior knowledge. If data isn't available, say so explicitly. Use your thought process and give a ChatGPT-like response.
 Available Stock Data:
-{json.dumps(stock_data, indent=2)}
+{stock_data.record_index.context(search_text)}
 
 Response Rules:
 1. Base all answers strictly on the provided JSON.
@@ -983,7 +1154,7 @@ Response Rules:
 4. For missing data: "Data not available in provided records"
 """
      # Updated model for the chat functionality
-    return cached_openrouter_request("nousresearch/deephermes-3-llama-3-8b-preview:free", system_message, f"Query: {query}\n\nAnswer using ONLY the provided JSON:")
+    return cached_openrouter_request("chat", system_message, f"Query: {query}\n\nAnswer using ONLY the provided JSON:")
 
 def stream_response(text):
     import sys
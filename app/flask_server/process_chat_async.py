@@ -10,6 +10,7 @@ import glob
 import json
 import time
 import re
+import threading
 import traceback
 import pytz
 from datetime import datetime, timedelta, timezone
@@ -20,6 +21,13 @@ import logging
 
 # Import credentials manager
 from config.credentials import CredentialsManager
+from ingest import ingest_directory
+from openrouter_client import OPENROUTER_CHAT_URL
+from query_router import Intent, ParsedQuery, parse_query
+from market_feed import feed_from_env, scrips_for
+from quote_service import QuoteService
+from tick_store import TickStore
+from stock_store import StockStore
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -61,19 +69,28 @@ class AsyncTradingBot:
     """Async trading bot with improved architecture"""
     
     def __init__(self):
-        self.stock_data = []
+        self.stock_data = StockStore()
         self.five_paisa_client = None
         self.neo_client = None
         self.session = None
+        self.quote_service = QuoteService()
+        self.tick_store = TickStore()
+        self.market_feed = None
         self._initialize_clients()
     
     async def __aenter__(self):
         """Async context manager entry"""
         self.session = aiohttp.ClientSession()
+        self.market_feed = feed_from_env(self.tick_store, lambda: self.five_paisa_client,
+                                         lambda: scrips_for(self.stock_data))
+        if self.market_feed is not None:
+            threading.Thread(target=self.market_feed.run, name="market-feed", daemon=True).start()
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         """Async context manager exit"""
+        if self.market_feed is not None:
+            self.market_feed.stop()
         if self.session:
             await self.session.close()
     
@@ -127,45 +144,30 @@ class AsyncTradingBot:
     
     async def load_stock_data(self, directory='stock_data'):
         """Async stock data loading"""
-        data = []
-        json_files = glob.glob(os.path.join(directory, "*.json"))
-        
-        if not json_files:
-            raise FileNotFoundError(f"No JSON files found in directory: {directory}")
-        
-        for file_path in json_files:
-            try:
-                # Use async file reading in production
-                with open(file_path, "r") as file:
-                    file_data = json.load(file)
-                    if isinstance(file_data, list):
-                        data.extend(file_data)
-                    elif isinstance(file_data, dict):
-                        data.append(file_data)
-                    else:
-                        logger.warning(f"Unexpected data format in {file_path}")
-            except Exception as e:
-                logger.error(f"Error loading {file_path}: {e}")
-        
-        self.stock_data = data
-        logger.info(f"✅ Loaded {len(data)} stock records")
-        return data
+        # Same normalizing load path as the sync bot, so years arrive sorted latest first
+        result = ingest_directory(directory)
+        for report in result.errors:
+            logger.error(f"Error loading {report.path}: {report.error}")
+        self.stock_data = result.to_store()
+        logger.info(f"✅ Loaded {len(self.stock_data)} stock records")
+        return self.stock_data
     
     async def get_current_price_async(self, scrip_data: str) -> Optional[float]:
         """Async current price fetching"""
+        price = self.tick_store.price(scrip_data)
+        if price is not None:
+            return price
         if not self.five_paisa_client:
             return None
-            
-        req_data = [{"Exch": "N", "ExchType": "C", "ScripData": scrip_data}]
         
         try:
             loop = asyncio.get_event_loop()
-            response = await loop.run_in_executor(
+            return await loop.run_in_executor(
                 None,
-                self.five_paisa_client.fetch_market_feed_scrip,
-                req_data
+                self.quote_service.get,
+                self.five_paisa_client,
+                scrip_data
             )
-            return response['Data'][0]['LastRate']
         except Exception as e:
             logger.error(f"Error fetching price for {scrip_data}: {e}")
             return None
@@ -210,7 +212,7 @@ class AsyncTradingBot:
         except ValueError as e:
             return {"error": str(e)}
         
-        url = "https://openrouter.ai/api/v1/chat/completions"
+        url = OPENROUTER_CHAT_URL
         headers = {
             "Authorization": f"Bearer {api_key}",
             "Content-Type": "application/json"
@@ -244,35 +246,30 @@ class AsyncTradingBot:
     async def process_query_async(self, query: str) -> str:
         """Main async query processing"""
         try:
-            lower_query = query.lower()
-            
-            # Greeting check
-            greeting_pattern = r'\b(hi|hello|hey|howdy|hola)\b'
-            if re.search(greeting_pattern, lower_query) and len(query.split()) <= 3:
+            parsed = parse_query(query, self.stock_data)
+            intent = parsed.intent
+
+            if intent == Intent.GREETING:
                 return "Hello! I'm your async Stock Analysis Chatbot. I can help you analyze financial data or place buy/sell orders for stocks in our database."
-            
-            # Buy order processing
-            buy_match = re.search(r'place buy order for (\d+) shares of (.+)', lower_query)
-            if buy_match:
-                return await self._process_buy_order(buy_match)
-            
-            # Sell order processing
-            sell_match = re.search(r'place sell order for (\d+) shares of (.+)', lower_query)
-            if sell_match:
-                return await self._process_sell_order(sell_match)
-            
-            # Stock analysis
-            matched_stock = self._find_stock_from_query(query)
-            if matched_stock:
-                return await self._analyze_stock_async(matched_stock, query)
-            
+
+            # Order processing
+            if intent == Intent.ORDER:
+                if parsed.side == 'buy':
+                    return await self._process_buy_order(parsed)
+                return await self._process_sell_order(parsed)
+
             # Price queries
-            price_keywords = ["current price", "live price", "stock price", "market price", "share price"]
-            if any(keyword in lower_query for keyword in price_keywords):
+            if intent == Intent.PRICE and parsed.stocks:
+                return await self._get_stock_prices_async(parsed.stocks)
+            if 'price' in parsed.keywords:
                 return await self._get_stock_price_async(query)
-            
+
+            # Stock analysis
+            if parsed.stock:
+                return await self._analyze_stock_async(parsed.stock['Stock'], query)
+
             # Default response for unmatched queries
-            if any(term in lower_query for term in ['stock', 'share', 'market', 'invest', 'finance', 'analysis']):
+            if intent == Intent.UNKNOWN_STOCK:
                 return "I don't have information about this specific stock or query in my database. I can help you analyze stocks in my database. Could you ask about one of those instead?"
             else:
                 return "I'm specialized in stock analysis based on my financial database. I don't have information to answer this query. Could I help you with analyzing stocks in my database instead?"
@@ -281,18 +278,12 @@ class AsyncTradingBot:
             logger.error(f"Query processing error: {e}")
             return f"An error occurred while processing your query: {str(e)}"
     
-    async def _process_buy_order(self, match) -> str:
+    async def _process_buy_order(self, parsed: ParsedQuery) -> str:
         """Process buy order asynchronously"""
-        quantity = int(match.group(1))
-        stock_name = match.group(2).strip()
-        
-        matched_stock = self._find_stock_from_query(stock_name)
-        if not matched_stock:
-            return f"Stock '{stock_name}' not found in database. Try the full name or check available stocks."
-        
-        stock = next((s for s in self.stock_data if s['Stock'] == matched_stock), None)
+        quantity = parsed.quantity
+        stock = parsed.stock
         if not stock:
-            return "Stock not found in database after matching."
+            return f"Stock '{parsed.target}' not found in database. Try the full name or check available stocks."
         
         ticker = stock.get('Ticker', '')
         if not ticker:
@@ -322,18 +313,12 @@ class AsyncTradingBot:
         else:
             return f"Failed to place buy order: {result['message']}"
     
-    async def _process_sell_order(self, match) -> str:
+    async def _process_sell_order(self, parsed: ParsedQuery) -> str:
         """Process sell order asynchronously"""
-        quantity = int(match.group(1))
-        stock_name = match.group(2).strip()
-        
-        matched_stock = self._find_stock_from_query(stock_name)
-        if not matched_stock:
-            return f"Stock '{stock_name}' not found in database. Try the full name or check available stocks."
-        
-        stock = next((s for s in self.stock_data if s['Stock'] == matched_stock), None)
+        quantity = parsed.quantity
+        stock = parsed.stock
         if not stock:
-            return "Stock not found in database after matching."
+            return f"Stock '{parsed.target}' not found in database. Try the full name or check available stocks."
         
         ticker = stock.get('Ticker', '')
         if not ticker:
@@ -369,7 +354,7 @@ class AsyncTradingBot:
         if not matched_stock:
             return "Please specify a valid stock name for price lookup."
         
-        stock = next((s for s in self.stock_data if s['Stock'] == matched_stock), None)
+        stock = self.stock_data.get(matched_stock)
         if not stock:
             return "Stock not found in database."
         
@@ -387,14 +372,37 @@ class AsyncTradingBot:
         else:
             return f"Unable to fetch the current price for {stock['Stock']} at this time."
     
+    async def _get_stock_prices_async(self, stocks) -> str:
+        """Prices of several stocks: streamed ticks where live, the rest in one batched quote call"""
+        scrips = {stock['Stock']: f"{stock['Ticker']}_EQ" for stock in stocks if stock.get('Ticker')}
+        prices = {scrip: self.tick_store.price(scrip) for scrip in scrips.values()}
+        missing = [scrip for scrip, price in prices.items() if price is None]
+        if missing and self.five_paisa_client:
+            loop = asyncio.get_event_loop()
+            prices.update(await loop.run_in_executor(
+                None,
+                self.quote_service.get_many,
+                self.five_paisa_client,
+                missing
+            ))
+        
+        ist = pytz.timezone('Asia/Kolkata')
+        current_time = datetime.now(ist).strftime("%Y-%m-%d %H:%M:%S %Z")
+        lines = [f"Current prices as of {current_time}:"]
+        for stock in stocks:
+            price = prices.get(scrips.get(stock['Stock']))
+            lines.append(f"- {stock['Stock']} ({stock.get('Ticker') or 'no ticker'}): "
+                         + (f"₹{price}" if price is not None else "unavailable"))
+        return "\n".join(lines)
+    
     async def _analyze_stock_async(self, stock_name: str, query: str) -> str:
         """Analyze stock asynchronously with AI"""
-        stock = next((s for s in self.stock_data if s['Stock'].lower() == stock_name.lower()), None)
+        stock = self.stock_data.get(stock_name)
         if not stock:
             return f"Stock '{stock_name}' not found in database"
         
         # Get latest year data
-        latest_year = max(stock['years'].keys(), default=None)
+        latest_year = next(iter(stock['years']), None)  # years are sorted latest first at load
         if not latest_year:
             return f"No annual data available for {stock['Stock']}"
         
@@ -435,38 +443,8 @@ class AsyncTradingBot:
     
     def _find_stock_from_query(self, query: str) -> Optional[str]:
         """Find stock from query (synchronous helper)"""
-        query_lower = query.lower()
-        
-        # Exact match first
-        for stock in self.stock_data:
-            name = stock.get('Stock', '')
-            if query_lower == name.lower():
-                return name
-        
-        # Partial match
-        for stock in self.stock_data:
-            name = stock.get('Stock', '').lower()
-            query_words = set(query_lower.split())
-            name_words = set(name.split())
-            if query_words & name_words:
-                return stock.get('Stock')
-        
-        # Abbreviation mapping
-        abbrev_mapping = {
-            'asian': 'Asian Paints Limited',
-            'itc': 'ITC Limited',
-            'coal': 'Coal India Limited',
-            'bharti': 'Bharti Airtel Limited',
-            'bajaj': 'Bajaj Auto Limited',
-            'axis': 'Axis Bank Limited'
-        }
-        
-        for abbrev, full_name in abbrev_mapping.items():
-            if abbrev in query_lower:
-                if any(s.get('Stock', '').lower() == full_name.lower() for s in self.stock_data):
-                    return full_name
-        
-        return None
+        stock = self.stock_data.resolve(query)
+        return stock['Stock'] if stock else None
 
 # Global bot instance
 trading_bot = None
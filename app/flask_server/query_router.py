@@ -0,0 +1,225 @@
+"""
+Single-pass query parser: one compiled pattern finds every trigger phrase, year and order in a query
+"""
+import re
+from dataclasses import dataclass
+from enum import Enum
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+from fiscal_year import FiscalYear
+from records import Company
+
+
+class Intent(str, Enum):
+    GREETING = "greeting"
+    DEPLOY = "deploy"
+    FORENSIC = "forensic"
+    ORDER = "order"
+    FORECAST = "forecast"
+    SUMMARY = "summary"
+    CASH_TIMELINE = "cash_timeline"
+    TREND = "trend"
+    PRICE = "price"
+    VERDICT = "verdict"
+    # Full report on one stock (metrics, health and trend sections)
+    ANALYSIS = "analysis"
+    # Two or more stocks side by side
+    COMPARE = "compare"
+    # No stock matched; the query still talks about stocks or markets
+    UNKNOWN_STOCK = "unknown_stock"
+    OUT_OF_SCOPE = "out_of_scope"
+
+    def __str__(self):
+        return self.value
+
+
+@dataclass(frozen=True)
+class ParsedQuery:
+    """Everything process_query needs to route a message, extracted in one scan"""
+    text: str
+    intent: Intent
+    stock: Optional[Company] = None
+    # Every stock mentioned, in order, when there is more than one (price and compare queries)
+    stocks: Tuple[Company, ...] = ()
+    metric: Optional[str] = None
+    year: Optional[FiscalYear] = None
+    start_year: Optional[int] = None
+    quantity: Optional[int] = None
+    side: Optional[str] = None  # "buy" or "sell"
+    target: Optional[str] = None  # stock as typed in an order ("... shares of <target>")
+    keywords: FrozenSet[str] = frozenset()
+
+
+# Trigger vocabulary: keyword group -> phrases. Phrases match at a word start, so
+# "trend" also catches "trends"; greetings and short phrases must match whole
+# words ("hi" vs "history", "vs" vs "vsnl").
+VOCABULARY: Dict[str, Tuple[str, ...]] = {
+    'greeting': ('hi', 'hello', 'hey', 'howdy', 'hola'),
+    'deploy': ('deploy',),
+    'forensic': ('forensic', 'fraud check', 'accounting anomaly', 'auditor remark',
+                 'insider trading', 'benford', 'revenue quality', 'cash flow',
+                 'related party', 'expense anomaly'),
+    'predict': ('predict',),
+    'summary': ('summarize', 'annual report'),
+    'display': ('display', 'show'),
+    'cash_reserve': ('cash reserve',),
+    'trend': ('trend',),
+    'price': ('current price', 'live price', 'stock price', 'market price', 'share price',
+              'prices', 'quotes'),
+    'compare': ('compare', 'comparison', 'versus', 'vs'),
+    'analyze': ('analyze', 'analyse', 'comprehensive', 'overview', 'full report'),
+    'finance': ('stock', 'share', 'market', 'invest', 'finance', 'analysis'),
+}
+_WHOLE_WORD_GROUPS = {'greeting'}
+# Phrases this short are abbreviations, too likely to start an unrelated word
+_WHOLE_WORD_MAX_LENGTH = 3
+# Metric phrases in priority order: the first listed phrase present in the query wins
+METRICS: Tuple[Tuple[str, str], ...] = (
+    ('revenue', 'RevenueGrowth'),
+    ('ebitda', 'EBITDAGrowth'),
+    ('debt', 'DebtToEquity'),
+    ('debt ratio', 'DebtToEquity'),
+    ('profit', 'NetProfitMargin'),
+    ('recommendation', 'Verdict'),
+    ('advice', 'Verdict'),
+    ('cash reserve', 'CashReserve'),
+    ('cash', 'CashReserve'),
+)
+# Groups whose phrases also count as talking about the market ("stock price")
+_FINANCE_GROUPS = {'finance', 'price'}
+# Compare phrases that only compare stocks when a stock is named in the clause after them
+# ("TCS vs Infosys", but not "Coal India vs sector")
+_VERSUS = {'vs', 'versus'}
+_CLAUSE_END = re.compile(r"[,;:.?!]")
+
+
+def _build_pattern():
+    groups: Dict[str, List[str]] = {}
+    for group, phrases in VOCABULARY.items():
+        for phrase in phrases:
+            groups.setdefault(phrase, []).append(group)
+    metrics = {}
+    for rank, (phrase, metric) in enumerate(METRICS):
+        groups.setdefault(phrase, [])
+        metrics.setdefault(phrase, (rank, metric))
+    # Longest phrase first so "cash reserve" wins over "cash" at the same position
+    alternatives = []
+    for phrase in sorted(groups, key=len, reverse=True):
+        whole_word = (len(phrase) <= _WHOLE_WORD_MAX_LENGTH
+                      or any(group in _WHOLE_WORD_GROUPS for group in groups[phrase]))
+        alternatives.append(re.escape(phrase).replace(r"\ ", r"\s+") + (r"\b" if whole_word else ""))
+    pattern = re.compile(
+        r"(?P<order>place\s+(?P<side>buy|sell)\s+order\s+for\s+(?P<quantity>\d+)\s+shares\s+of\s+(?P<target>.+))"
+        r"|(?P<since>since\s*(?P<since_year>\d{4}))"
+        r"|(?P<year>20\d{2}-\d{2}|fy\s?\d{4}|20\d{2})"
+        r"|\b(?P<phrase>" + "|".join(alternatives) + ")",
+        re.IGNORECASE)
+    return pattern, {p: tuple(g) for p, g in groups.items()}, metrics
+
+
+_PATTERN, _PHRASE_GROUPS, _PHRASE_METRICS = _build_pattern()
+_SPACES = re.compile(r"\s+")
+
+
+def parse_year(label: str) -> Optional[FiscalYear]:
+    """Fiscal year from "2023-24", "FY2023" or "2023"; the bare forms name the starting year"""
+    label = label.strip().lower()
+    try:
+        if label.startswith('fy'):
+            return FiscalYear.of(int(label[2:].strip()))
+        if label.isdigit():
+            return FiscalYear.of(int(label))
+        return FiscalYear.parse(label)
+    except ValueError:
+        return None
+
+
+def parse_query(query: str, stock_data=None) -> ParsedQuery:
+    """Tokenize `query` once and decide its intent.
+
+    With `stock_data` (a StockStore) the mentioned stock is resolved as well;
+    intent precedence matches the original process_query if/elif chain. A
+    query naming several stocks becomes a multi-stock PRICE or COMPARE query
+    only when it asks for prices or a comparison (forecasts and report
+    summaries stay single-stock); otherwise the other names are incidental
+    and the first stock mentioned gets the single-stock intent.
+    """
+    keywords = set()
+    compare_hits = []
+    metric_rank, metric = len(METRICS), None
+    year = start_year = quantity = side = target = None
+    year_spans = []
+    for match in _PATTERN.finditer(query):
+        kind = match.lastgroup
+        if kind == 'phrase':
+            phrase = _SPACES.sub(" ", match.group('phrase').lower())
+            for group in _PHRASE_GROUPS[phrase]:
+                if group != 'deploy' or match.start() == 0:
+                    keywords.add(group)
+            if 'compare' in _PHRASE_GROUPS[phrase]:
+                compare_hits.append((phrase, match.end()))
+            rank, phrase_metric = _PHRASE_METRICS.get(phrase, (metric_rank, metric))
+            if rank < metric_rank:
+                metric_rank, metric = rank, phrase_metric
+        elif kind == 'year':
+            year = year or parse_year(match.group('year'))
+            year_spans.append(match.span())
+        elif match.group('since'):
+            start_year = start_year or int(match.group('since_year'))
+            year_spans.append(match.span('since_year'))
+        elif match.group('order') and side is None:
+            side = match.group('side').lower()
+            quantity = int(match.group('quantity'))
+            target = match.group('target').strip()
+    if year is None and start_year is not None:
+        year = FiscalYear.of(start_year)
+
+    # Stock lookup ignores year mentions, which would only add noise tokens
+    clean, last = [], 0
+    for start, end in year_spans:
+        clean.append(query[last:start])
+        last = end
+    clean.append(query[last:])
+    clean_text = "".join(clean).strip()
+
+    def resolve(text):
+        return stock_data.resolve(text) if stock_data is not None else None
+
+    fields = dict(text=query, metric=metric, year=year, start_year=start_year,
+                  quantity=quantity, side=side, target=target, keywords=frozenset(keywords))
+    if 'greeting' in keywords and len(query.split()) <= 3:
+        return ParsedQuery(intent=Intent.GREETING, **fields)
+    if 'deploy' in keywords:
+        return ParsedQuery(intent=Intent.DEPLOY, **fields)
+    if 'forensic' in keywords:
+        return ParsedQuery(intent=Intent.FORENSIC, stock=resolve(query), **fields)
+    if side is not None:
+        return ParsedQuery(intent=Intent.ORDER, stock=resolve(target), **fields)
+
+    stock = resolve(clean_text)
+    mentioned = tuple(stock_data.mentions(clean_text)) if stock_data is not None else ()
+    if len(mentioned) > 1:
+        compares = any(phrase not in _VERSUS or stock_data.mentions(_CLAUSE_END.split(query[end:], 1)[0])
+                       for phrase, end in compare_hits)
+        if (compares or 'price' in keywords) and 'predict' not in keywords and 'summary' not in keywords:
+            # Several companies: quote them together or lay their fundamentals side by side
+            intent = Intent.PRICE if 'price' in keywords and not compares else Intent.COMPARE
+            return ParsedQuery(intent=intent, stock=mentioned[0], stocks=mentioned, **fields)
+        stock = mentioned[0]
+    if stock is None:
+        intent = Intent.UNKNOWN_STOCK if keywords & _FINANCE_GROUPS else Intent.OUT_OF_SCOPE
+    elif 'predict' in keywords and metric:
+        intent = Intent.FORECAST
+    elif 'summary' in keywords:
+        intent = Intent.SUMMARY
+    elif 'display' in keywords and 'cash_reserve' in keywords:
+        intent = Intent.CASH_TIMELINE
+    elif 'trend' in keywords and metric:
+        intent = Intent.TREND
+    elif 'price' in keywords:
+        intent = Intent.PRICE
+    elif 'analyze' in keywords:
+        intent = Intent.ANALYSIS
+    else:
+        intent = Intent.VERDICT
+    return ParsedQuery(intent=intent, stock=stock, **fields)
@@ -0,0 +1,166 @@
+"""
+Short-TTL quote cache in front of the 5paisa market feed, merging concurrent lookups into one multi-scrip call
+"""
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from request_context import remaining_budget
+from retry_policy import RetryPolicy, retry_any_error
+
+logger = logging.getLogger(__name__)
+
+# A price younger than this is served without asking the broker
+QUOTE_TTL_SECONDS = float(os.getenv("QUOTE_TTL_SECONDS", "1.0"))
+# How long the first lookup waits for others to join its batch
+QUOTE_BATCH_WINDOW = float(os.getenv("QUOTE_BATCH_WINDOW_MS", "10")) / 1000
+QUOTE_MAX_BATCH = int(os.getenv("QUOTE_MAX_BATCH", "50"))
+
+
+def feed_request(scrip: str) -> dict:
+    """One ReqData entry for an NSE cash-segment scrip such as 'ITC_EQ'"""
+    return {"Exch": "N", "ExchType": "C", "ScripData": scrip}
+
+
+class _Batch:
+    __slots__ = ("futures",)
+
+    def __init__(self):
+        self.futures: Dict[str, Future] = {}
+
+
+class QuoteService:
+    """Last traded prices by scrip, cached for `ttl` seconds and fetched in batches.
+
+    On a miss the first caller opens a batch for its broker client and waits
+    `window` seconds; every scrip requested meanwhile (up to `max_batch`)
+    joins it, and the whole batch goes out as one fetch_market_feed_scrip
+    call whose rows are split back to the waiting callers. Waiters block on
+    futures, which are green under eventlet, for at most their remaining
+    request budget. Failed lookups are not cached.
+    """
+
+    def __init__(self, ttl: float = QUOTE_TTL_SECONDS, window: float = QUOTE_BATCH_WINDOW,
+                 max_batch: int = QUOTE_MAX_BATCH, policy: Optional[RetryPolicy] = None):
+        self.ttl = ttl
+        self.window = window
+        self.max_batch = max_batch
+        self.policy = policy or RetryPolicy(max_attempts=1)
+        self._lock = threading.Lock()
+        self._prices: Dict[str, Tuple[float, float]] = {}
+        self._open: Dict[int, _Batch] = {}
+        self.hits = 0
+        self.misses = 0
+        self.batches = 0
+        self.scrips_fetched = 0
+        # Lookups that returned None: failed batch, timeout or interrupted leader
+        self.errors = 0
+
+    def get(self, client, scrip: str) -> Optional[float]:
+        return self.get_many(client, [scrip]).get(scrip)
+
+    def get_many(self, client, scrips: Iterable[str]) -> Dict[str, Optional[float]]:
+        """Prices for several scrips at once; None for any that could not be fetched"""
+        now = time.monotonic()
+        result: Dict[str, Optional[float]] = {}
+        waiting: Dict[str, Future] = {}
+        lead: List[_Batch] = []
+        with self._lock:
+            for scrip in dict.fromkeys(scrips):
+                cached = self._prices.get(scrip)
+                if cached is not None and now - cached[1] < self.ttl:
+                    self.hits += 1
+                    result[scrip] = cached[0]
+                    continue
+                self.misses += 1
+                batch = self._open.get(id(client))
+                if batch is None:
+                    batch = self._open[id(client)] = _Batch()
+                    lead.append(batch)
+                future = batch.futures.get(scrip)
+                if future is None:
+                    future = batch.futures[scrip] = Future()
+                waiting[scrip] = future
+                # A full batch stops taking scrips; the next miss opens a new one
+                if len(batch.futures) >= self.max_batch:
+                    del self._open[id(client)]
+
+        if lead:
+            try:
+                if self.window > 0:
+                    time.sleep(self.window)
+                self._close(client, lead)
+                for batch in lead:
+                    self._fetch(client, batch)
+            except BaseException:
+                # The leader itself was cancelled (e.g. its eventlet Timeout fired);
+                # callers that joined its batch get an error instead of waiting it out
+                self._close(client, lead)
+                for batch in lead:
+                    for future in batch.futures.values():
+                        if not future.done():
+                            future.set_exception(RuntimeError("Quote batch was interrupted"))
+                raise
+
+        for scrip, future in waiting.items():
+            remaining = remaining_budget()
+            try:
+                result[scrip] = future.result(timeout=None if remaining is None else max(0.0, remaining))
+            except Exception as e:
+                logger.warning(f"Error fetching price for {scrip}: {e}")
+                with self._lock:
+                    self.errors += 1
+                result[scrip] = None
+        return result
+
+    def _close(self, client, batches: List[_Batch]):
+        with self._lock:
+            for batch in batches:
+                if self._open.get(id(client)) is batch:
+                    del self._open[id(client)]
+
+    def _fetch(self, client, batch: _Batch):
+        scrips = list(batch.futures)
+        req_data = [feed_request(scrip) for scrip in scrips]
+
+        def attempt(remaining):
+            return client.fetch_market_feed_scrip(req_data)
+
+        try:
+            response = self.policy.run(attempt, classify=retry_any_error, name="5paisa market feed")
+            rows = (response or {}).get('Data') or []
+            # The feed answers in request order
+            if len(rows) != len(scrips):
+                raise ValueError(f"Market feed returned {len(rows)} rows for {len(scrips)} scrips")
+            prices = {scrip: row.get('LastRate') for scrip, row in zip(scrips, rows)}
+        except Exception as e:
+            for future in batch.futures.values():
+                future.set_exception(e)
+            return
+        now = time.monotonic()
+        with self._lock:
+            self.batches += 1
+            self.scrips_fetched += len(scrips)
+            for scrip, price in prices.items():
+                if price is not None:
+                    self._prices[scrip] = (price, now)
+        for scrip, future in batch.futures.items():
+            future.set_result(prices[scrip])
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "ttl_seconds": self.ttl,
+                "batch_window_ms": self.window * 1000,
+                "cached_scrips": len(self._prices),
+                "hits": self.hits,
+                "misses": self.misses,
+                "errors": self.errors,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+                "batches": self.batches,
+                "average_batch_size": round(self.scrips_fetched / self.batches, 2) if self.batches else None,
+            }
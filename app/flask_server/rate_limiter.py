@@ -0,0 +1,152 @@
+"""
+Process-wide admission control for LLM calls: token bucket, per-model concurrency bulkhead, bounded wait queue
+"""
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+from request_context import remaining_budget
+
+# Requests per second admitted across all models, and how many may go out back to back
+LLM_RATE_PER_SECOND = float(os.getenv("LLM_RATE_PER_SECOND", "2"))
+LLM_RATE_BURST = int(os.getenv("LLM_RATE_BURST", "5"))
+LLM_MAX_CONCURRENT_PER_MODEL = int(os.getenv("LLM_MAX_CONCURRENT_PER_MODEL", "4"))
+# Callers allowed to wait for admission at once, and for how long
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "32"))
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "5"))
+
+
+class Saturated(Exception):
+    """No capacity for an LLM call within the allowed wait; retrying immediately would not help.
+
+    `reason` is "queue_full" or "rate" (the whole process is saturated) or
+    "concurrency" (only this model is; another one may have room).
+    """
+
+    def __init__(self, reason: str, message: str):
+        super().__init__(message)
+        self.reason = reason
+
+
+class TokenBucket:
+    """Tokens refill at `rate` per second up to `burst`.
+
+    Callers reserve a token up front, letting the balance go negative, and
+    then sleep until their token would have arrived, so waiters are served
+    in arrival order without polling.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, max_wait: float) -> Optional[float]:
+        """Seconds to wait before using the reserved token, or None (nothing reserved) if over `max_wait`"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            wait = (1 - self._tokens) / self.rate if self._tokens < 1 else 0.0
+            if wait > max_wait:
+                return None
+            self._tokens -= 1
+            return wait
+
+    def refund(self):
+        """Give back a reserved token that was never used to send a request"""
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + 1)
+
+
+class LLMLimiter:
+    """Admission control in front of every OpenRouter call.
+
+    A call first joins a bounded wait queue (full queue: rejected at once),
+    then takes a token from the shared bucket and a slot in its model's
+    bulkhead, waiting at most `max_wait` seconds, or less when the request
+    deadline is nearer. Anything that cannot be admitted in time raises
+    `Saturated` instead of piling more requests onto rate-limited models;
+    a call turned away by a full bulkhead refunds its token.
+    """
+
+    def __init__(self, rate: float = LLM_RATE_PER_SECOND, burst: int = LLM_RATE_BURST,
+                 max_concurrent: int = LLM_MAX_CONCURRENT_PER_MODEL, max_waiting: int = LLM_MAX_QUEUE,
+                 max_wait: float = LLM_QUEUE_TIMEOUT):
+        self.bucket = TokenBucket(rate, burst)
+        self.max_concurrent = max_concurrent
+        self.max_waiting = max_waiting
+        self.max_wait = max_wait
+        self._lock = threading.Lock()
+        self._bulkheads: Dict[str, threading.BoundedSemaphore] = {}
+        self._waiting = 0
+        self._in_flight: Counter = Counter()
+        self.admitted = 0
+        self.rejected: Counter = Counter()
+
+    def _bulkhead(self, model: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            bulkhead = self._bulkheads.get(model)
+            if bulkhead is None:
+                bulkhead = self._bulkheads[model] = threading.BoundedSemaphore(self.max_concurrent)
+            return bulkhead
+
+    def _reject(self, reason: str, message: str) -> Saturated:
+        with self._lock:
+            self.rejected[reason] += 1
+        return Saturated(reason, message)
+
+    @contextmanager
+    def slot(self, model: str) -> Iterator[None]:
+        timeout = self.max_wait
+        remaining = remaining_budget()
+        if remaining is not None:
+            timeout = max(0.0, min(timeout, remaining))
+        with self._lock:
+            if self._waiting >= self.max_waiting:
+                self.rejected["queue_full"] += 1
+                raise Saturated("queue_full", f"{self._waiting} LLM calls already waiting")
+            self._waiting += 1
+        started = time.monotonic()
+        bulkhead = self._bulkhead(model)
+        try:
+            wait = self.bucket.reserve(timeout)
+            if wait is None:
+                raise self._reject("rate", f"LLM rate limit would need more than {timeout:.1f}s")
+            if wait > 0:
+                time.sleep(wait)
+            if not bulkhead.acquire(timeout=max(0.0, timeout - (time.monotonic() - started))):
+                # Nothing was sent, so the token goes back for the caller's next model
+                self.bucket.refund()
+                raise self._reject("concurrency", f"{self.max_concurrent} calls to {model} already running")
+        finally:
+            with self._lock:
+                self._waiting -= 1
+        with self._lock:
+            self._in_flight[model] += 1
+            self.admitted += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._in_flight[model] -= 1
+            bulkhead.release()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "rate_per_second": self.bucket.rate,
+                "burst": self.bucket.burst,
+                "max_concurrent_per_model": self.max_concurrent,
+                "max_waiting": self.max_waiting,
+                "max_wait_seconds": self.max_wait,
+                "waiting": self._waiting,
+                "in_flight": {model: count for model, count in self._in_flight.items() if count},
+                "admitted": self.admitted,
+                "rejected": dict(self.rejected),
+            }
@@ -0,0 +1,149 @@
+"""
+BM25 retrieval over per-company and per-year records, so LLM prompts carry only the relevant slice of the universe
+"""
+import heapq
+import json
+import math
+import os
+import re
+import time
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from stock_search import tokenize
+
+# Rough prompt budget for retrieved records, in tokens (estimated as characters / 4)
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "3000"))
+# Most records considered for a single prompt, before the token budget applies
+PROMPT_TOP_K = int(os.getenv("PROMPT_TOP_K", "40"))
+
+_CHARS_PER_TOKEN = 4
+_YIELD_EVERY = 64
+_K1 = 1.2
+_B = 0.75
+# "RevenueGrowth" -> "revenue", "growth"; "ROCE" stays whole
+_WORD_PART = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+")
+
+
+def compact_json(value) -> str:
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // _CHARS_PER_TOKEN + 1
+
+
+def _field_tokens(key: str) -> List[str]:
+    parts = [part.lower() for part in _WORD_PART.findall(key)]
+    return parts + [key.lower()] if len(parts) > 1 else parts or [key.lower()]
+
+
+def _value_tokens(value) -> List[str]:
+    # Numbers are what the model reads, not what a query names
+    return tokenize(value) if isinstance(value, str) else []
+
+
+class RecordIndex:
+    """BM25 index with one document per company and one per (company, fiscal year).
+
+    A company document holds its top-level fields (ticker, verdict, insider
+    trades, ...); a year document holds one fiscal year of metrics tagged with
+    the company name. Both are indexed on the company's name, ticker and
+    aliases, field names split at case changes ("NetProfitMargin" also
+    matches "profit margin") and textual values; year documents also match
+    either calendar year of their fiscal year. Every document is serialized
+    as compact JSON once, at build time, so selecting records for a prompt
+    is a posting-list walk plus a join.
+    """
+
+    def __init__(self, records: Iterable, aliases: Optional[Dict[str, List[str]]] = None):
+        aliases = aliases or {}
+        self._texts: List[str] = []
+        self._costs: List[int] = []
+        # Ties go to more recent years; company documents sort first
+        self._recency: List[int] = []
+        self._companies: List[int] = []
+        term_counts: List[Counter] = []
+
+        for count, record in enumerate(records, 1):
+            if count % _YIELD_EVERY == 0:
+                # Let other greenlets run while a background task builds a large index
+                time.sleep(0)
+            name = record['Stock']
+            identity = [*tokenize(name), *tokenize(record.get('Ticker') or ''),
+                        *(t for alias in (record.get('Aliases') or ()) for t in tokenize(alias)),
+                        *(t for alias in aliases.get(name, ()) for t in tokenize(alias))]
+
+            fields = {key: record[key] for key in record if key != 'years'}
+            terms = Counter(identity)
+            for key, value in fields.items():
+                terms.update(_field_tokens(key))
+                terms.update(_value_tokens(value))
+            self._companies.append(len(self._texts))
+            self._add(compact_json(fields), terms, recency=10 ** 6, term_counts=term_counts)
+
+            for year, metrics in record['years'].items():
+                terms = Counter(identity)
+                terms.update(tokenize(year))
+                ordinal = getattr(year, 'ordinal', None)
+                if ordinal is not None:
+                    terms.update((str(ordinal), str(ordinal + 1)))
+                for key, value in metrics.items():
+                    terms.update(_field_tokens(key))
+                    terms.update(_value_tokens(value))
+                row = {'Stock': name, 'Year': str(year), **dict(metrics.items())}
+                self._add(compact_json(row), terms, recency=ordinal or 0, term_counts=term_counts)
+
+        # BM25 weights depend only on the document, so they are folded into the postings up front
+        count = len(self._texts)
+        average = sum(sum(terms.values()) for terms in term_counts) / count if count else 0.0
+        frequencies: Dict[str, int] = defaultdict(int)
+        for terms in term_counts:
+            for token in terms:
+                frequencies[token] += 1
+        self._postings: Dict[str, List[Tuple[int, float]]] = defaultdict(list)
+        for doc, terms in enumerate(term_counts):
+            norm = _K1 * (1 - _B + _B * sum(terms.values()) / average)
+            for token, tf in terms.items():
+                df = frequencies[token]
+                idf = math.log(1 + (count - df + 0.5) / (df + 0.5))
+                self._postings[token].append((doc, idf * tf * (_K1 + 1) / (tf + norm)))
+
+    def _add(self, text: str, terms: Counter, recency: int, term_counts: List[Counter]):
+        self._texts.append(text)
+        self._costs.append(estimate_tokens(text))
+        self._recency.append(recency)
+        term_counts.append(terms)
+
+    def __len__(self) -> int:
+        return len(self._texts)
+
+    def search(self, query: str, limit: int = PROMPT_TOP_K) -> List[Tuple[int, float]]:
+        """(document, score) pairs for the best matches, highest first"""
+        scores: Dict[int, float] = defaultdict(float)
+        for token in set(tokenize(query)):
+            for doc, weight in self._postings.get(token, ()):
+                scores[doc] += weight
+        return heapq.nsmallest(limit, scores.items(),
+                               key=lambda item: (-item[1], -self._recency[item[0]], item[0]))
+
+    def select(self, query: str, token_budget: int = PROMPT_TOKEN_BUDGET,
+               limit: int = PROMPT_TOP_K) -> List[str]:
+        """Compact JSON of the top records that fit in `token_budget`, best first.
+
+        A query that matches nothing gets the company-level records instead,
+        so the model still knows which stocks exist.
+        """
+        ranked = [doc for doc, _ in self.search(query, limit)] or self._companies[:limit]
+        selected = []
+        spent = 0
+        for doc in ranked:
+            if spent + self._costs[doc] > token_budget:
+                continue
+            selected.append(self._texts[doc])
+            spent += self._costs[doc]
+        return selected
+
+    def context(self, query: str, token_budget: int = PROMPT_TOKEN_BUDGET) -> str:
+        """Selected records as one compact JSON array for a prompt"""
+        return "[" + ",".join(self.select(query, token_budget)) + "]"
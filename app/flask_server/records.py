@@ -0,0 +1,166 @@
+"""
+Compact record types for the stock universe: one Company per stock, one YearMetrics per fiscal year
+"""
+import sys
+from collections.abc import Mapping, Sequence
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from fiscal_year import FiscalYear
+
+
+class _Layout:
+    """Interned field names shared by every YearMetrics row with the same keys"""
+    __slots__ = ('keys', 'index')
+
+    def __init__(self, keys: Tuple[str, ...]):
+        self.keys = keys
+        self.index = {key: i for i, key in enumerate(keys)}
+
+
+# Most rows carry the same dozen metrics, so a handful of layouts serve the whole universe
+_LAYOUTS: Dict[Tuple[str, ...], _Layout] = {}
+
+
+def _layout(keys) -> _Layout:
+    keys = tuple(sys.intern(str(key)) for key in keys)
+    layout = _LAYOUTS.get(keys)
+    if layout is None:
+        layout = _LAYOUTS[keys] = _Layout(keys)
+    return layout
+
+
+class YearMetrics(Mapping):
+    """One fiscal year of metrics for one company.
+
+    Values live in a tuple aligned with a shared, interned key layout instead
+    of a per-row dict, which keeps the key strings and hash table out of every
+    row. Read access is dict-style (`row['ROCE']`, `row.get(...)`, `items()`).
+    Rows are immutable once built.
+    """
+    __slots__ = ('_layout', '_values')
+
+    def __init__(self, data: Mapping):
+        self._layout = _layout(data.keys())
+        self._values = tuple(data.values())
+
+    def __getitem__(self, key):
+        return self._values[self._layout.index[key]]
+
+    def get(self, key, default=None):
+        i = self._layout.index.get(key)
+        return default if i is None else self._values[i]
+
+    def __contains__(self, key) -> bool:
+        return key in self._layout.index
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._layout.keys)
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def items(self):
+        return zip(self._layout.keys, self._values)
+
+    def to_dict(self) -> dict:
+        return dict(zip(self._layout.keys, self._values))
+
+    def __reduce__(self):
+        return YearMetrics, (self.to_dict(),)
+
+    def __repr__(self):
+        return f"YearMetrics({self.to_dict()!r})"
+
+
+class Company(Mapping):
+    """One stock: name, ticker, fiscal years (latest first) and any other top-level fields.
+
+    Behaves like the JSON dict it was built from (`stock['Stock']`,
+    `stock['years'][year]['ROCE']`, `stock.get('InsiderTrading')`), so
+    process_chat code keeps its dict-style access. Use `to_dict()` when a
+    plain JSON-serializable dict is needed.
+    """
+    __slots__ = ('name', 'ticker', 'years', '_extras')
+
+    def __init__(self, name: str, ticker: Optional[str] = None,
+                 years: Optional[Dict[FiscalYear, YearMetrics]] = None, extras: Optional[dict] = None):
+        self.name = name
+        self.ticker = ticker
+        self.years = years if years is not None else {}
+        self._extras = extras or None
+
+    @classmethod
+    def from_dict(cls, record: dict) -> "Company":
+        """Build from a normalized JSON record (years already keyed by FiscalYear, latest first)"""
+        extras = {sys.intern(k): v for k, v in record.items() if k not in ('Stock', 'Ticker', 'years')}
+        years = {year: YearMetrics(data) for year, data in (record.get('years') or {}).items()}
+        return cls(record['Stock'], record.get('Ticker'), years, extras)
+
+    def __getitem__(self, key):
+        if key == 'Stock':
+            return self.name
+        if key == 'years':
+            return self.years
+        if key == 'Ticker' and self.ticker is not None:
+            return self.ticker
+        if self._extras and key in self._extras:
+            return self._extras[key]
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        yield 'Stock'
+        if self.ticker is not None:
+            yield 'Ticker'
+        yield 'years'
+        if self._extras:
+            yield from self._extras
+
+    def __len__(self) -> int:
+        return 2 + (self.ticker is not None) + len(self._extras or ())
+
+    def to_dict(self) -> dict:
+        record = {'Stock': self.name}
+        if self.ticker is not None:
+            record['Ticker'] = self.ticker
+        record['years'] = {str(year): data.to_dict() for year, data in self.years.items()}
+        record.update(self._extras or {})
+        return record
+
+    def __reduce__(self):
+        return Company, (self.name, self.ticker, self.years, self._extras)
+
+    def __repr__(self):
+        return f"Company({self.name!r}, years={len(self.years)})"
+
+
+class LazyRecords(Sequence):
+    """Company records built on first access by `build(position)` and kept afterwards.
+
+    Lets a memory-mapped snapshot hand the store thousands of stocks without
+    decoding any of them at boot; a request only pays for the rows it reads.
+    Two threads racing on the same row may both build it, which is harmless
+    because rows are immutable.
+    """
+
+    def __init__(self, count: int, build: Callable[[int], Company]):
+        self._build = build
+        self._items: List[Optional[Company]] = [None] * count
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self[i] for i in range(*position.indices(len(self._items)))]
+        item = self._items[position]
+        if item is None:
+            item = self._items[position] = self._build(position)
+        return item
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __iter__(self) -> Iterator[Company]:
+        for position in range(len(self._items)):
+            yield self[position]
+
+    @property
+    def built(self) -> int:
+        return sum(item is not None for item in self._items)
@@ -0,0 +1,53 @@
+"""
+Per-request state visible to code deep inside process_query without threading it through every call
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Callable, Iterator, Optional
+
+
+@dataclass
+class RequestContext:
+    """One chat message being processed.
+
+    `on_chunk`, when set, receives LLM output text as it streams in.
+    `deadline` is a time.monotonic() value after which the caller has given
+    up on the answer; downstream calls size their timeouts and retries to it.
+    `degraded` is set when part of the answer could not be produced normally
+    (e.g. an LLM call failed and placeholder text was used).
+    """
+    correlation_id: str
+    on_chunk: Optional[Callable[[str], None]] = None
+    deadline: Optional[float] = None
+    degraded: bool = False
+
+    def remaining(self) -> Optional[float]:
+        if self.deadline is None:
+            return None
+        return self.deadline - time.monotonic()
+
+
+# greenlet gives every greenlet its own contextvars context, so concurrent
+# requests on the eventlet hub never see each other's state
+_current: ContextVar[Optional[RequestContext]] = ContextVar("request_context", default=None)
+
+
+def current_request() -> Optional[RequestContext]:
+    return _current.get()
+
+
+@contextmanager
+def request_scope(context: RequestContext) -> Iterator[RequestContext]:
+    token = _current.set(context)
+    try:
+        yield context
+    finally:
+        _current.reset(token)
+
+
+def remaining_budget() -> Optional[float]:
+    """Seconds left before the current request's deadline; None when there is no deadline"""
+    context = _current.get()
+    return context.remaining() if context is not None else None
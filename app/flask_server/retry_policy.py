@@ -0,0 +1,109 @@
+"""
+Deadline-aware retries: exponential backoff with full jitter, Retry-After and 429/5xx classification
+"""
+import logging
+import random
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Callable, Optional, Tuple, TypeVar
+
+import requests
+
+from request_context import remaining_budget
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Rate limited, timed out or failing upstream: worth another attempt
+RETRYABLE_STATUS = frozenset({408, 425, 429, 500, 502, 503, 504})
+
+
+class DeadlineExceeded(Exception):
+    """The request's time budget ran out before a call could be made"""
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After header as seconds to wait; it may be a number or an HTTP date"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+def classify_http_error(error: Exception) -> Tuple[bool, Optional[float]]:
+    """(retryable, server-requested wait) for an exception raised by requests"""
+    if isinstance(error, requests.exceptions.HTTPError) and error.response is not None:
+        response = error.response
+        return response.status_code in RETRYABLE_STATUS, parse_retry_after(response.headers.get("Retry-After"))
+    if isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+        return True, None
+    return False, None
+
+
+def retry_any_error(error: Exception) -> Tuple[bool, Optional[float]]:
+    """For idempotent calls through SDKs whose failures carry no status code"""
+    return True, None
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """How many times to call, how long to wait in between, and when not to bother.
+
+    `min_attempt_seconds` is the least time an attempt plausibly needs: a
+    retry is only started if its backoff plus that much still fits in the
+    current request's remaining budget (see request_context).
+    """
+    max_attempts: int = 3
+    base_delay: float = 0.5
+    max_delay: float = 8.0
+    min_attempt_seconds: float = 2.0
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Full-jitter exponential backoff after the `attempt`-th failure (0-based).
+
+        A server-sent Retry-After is a floor, even above max_delay.
+        """
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        return max(delay, retry_after or 0.0)
+
+    def run(self, call: Callable[[Optional[float]], T],
+            classify: Callable[[Exception], Tuple[bool, Optional[float]]] = classify_http_error,
+            name: str = "call") -> T:
+        """Run `call(remaining_seconds)` until it succeeds or retrying is pointless.
+
+        `call` receives the seconds left in the request budget (None without a
+        deadline) so it can cap its own timeout. The last error is re-raised
+        when it is not retryable, attempts run out, or the next attempt could
+        not finish before the deadline.
+        """
+        attempts = max(1, self.max_attempts)
+        for attempt in range(attempts):
+            remaining = remaining_budget()
+            if remaining is not None and remaining <= 0:
+                raise DeadlineExceeded(f"No time left for {name}")
+            try:
+                return call(remaining)
+            except Exception as e:
+                retryable, retry_after = classify(e)
+                if not retryable or attempt == attempts - 1:
+                    raise
+                delay = self.backoff(attempt, retry_after)
+                remaining = remaining_budget()
+                if remaining is not None and delay + self.min_attempt_seconds > remaining:
+                    logger.warning(f"{name} failed ({e}); {remaining:.1f}s left is too little to retry")
+                    raise
+                logger.info(f"{name} failed ({e}); retry {attempt + 1} in {delay:.2f}s")
+                time.sleep(delay)
@@ -0,0 +1,189 @@
+"""
+Load-time normalization of stock records so request-time code reads typed values
+"""
+import re
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Dict, Iterable, List, Optional
+
+from fiscal_year import FiscalYear
+from records import Company
+
+
+class Trend(str, Enum):
+    """Direction strings such as MarketShareGrowth ("stable", "increasing")"""
+    DECREASING = "decreasing"
+    STABLE = "stable"
+    INCREASING = "increasing"
+
+    def __str__(self):
+        return self.value
+
+
+NUMERIC_FIELDS = frozenset({
+    'RevenueGrowth', 'EBITDAGrowth', 'NetProfitMargin', 'DebtToEquity',
+    'InterestCoverage', 'PromoterHolding', 'IndustryRanking', 'EPSGrowth',
+    'ROCE', 'CashReserve', 'Revenue', 'EBITDA', 'AccountsReceivableDays',
+})
+BOOLEAN_FIELDS = frozenset({'DebtRisk', 'OperationalRisk', 'GeopoliticalRisk'})
+TEXT_FIELDS = frozenset({'AuditorRemarks', 'CashFlowAnomalies', 'RelatedPartyTransactions'})
+ENUM_FIELDS = {'MarketShareGrowth': Trend}
+
+_TREND_SYNONYMS = {
+    'up': Trend.INCREASING, 'rising': Trend.INCREASING, 'growing': Trend.INCREASING,
+    'down': Trend.DECREASING, 'declining': Trend.DECREASING, 'falling': Trend.DECREASING,
+    'flat': Trend.STABLE, 'steady': Trend.STABLE,
+}
+# "9.63%", "1,234.5", "45 days", "₹ 3,200 Cr", "2.1x"
+_NUMBER = re.compile(r"^[₹$]?\s*([-+]?(?:\d[\d,]*)?\.?\d+(?:[eE][-+]?\d+)?)\s*(?:%|days?|cr|crores?|x)?$",
+                     re.IGNORECASE)
+_TRUE = {'true', 'yes', 'y', '1'}
+_FALSE = {'false', 'no', 'n', '0', ''}
+
+
+class _Invalid(Exception):
+    pass
+
+
+@dataclass
+class DataQualityReport:
+    """What the normalization pass changed or could not interpret"""
+    stocks: int = 0
+    year_rows: int = 0
+    coerced: int = 0
+    invalid: List[str] = field(default_factory=list)
+    missing_years: List[str] = field(default_factory=list)
+    field_counts: Dict[str, int] = field(default_factory=dict)
+
+    def summary(self) -> dict:
+        return {
+            "stocks": self.stocks,
+            "year_rows": self.year_rows,
+            "coerced_values": self.coerced,
+            "invalid_values": len(self.invalid),
+            "stocks_without_years": self.missing_years,
+            "examples": self.invalid[:10],
+        }
+
+    def merge(self, other: "DataQualityReport"):
+        """Add another report's tallies to this one"""
+        self.stocks += other.stocks
+        self.year_rows += other.year_rows
+        self.coerced += other.coerced
+        self.invalid.extend(other.invalid)
+        self.missing_years.extend(other.missing_years)
+        for key, count in other.field_counts.items():
+            self.field_counts[key] = self.field_counts.get(key, 0) + count
+
+
+def coerce_number(value) -> Optional[float]:
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        raise _Invalid
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = str(value).strip()
+    if not text:
+        return None
+    match = _NUMBER.match(text)
+    if not match:
+        raise _Invalid
+    return float(match.group(1).replace(',', ''))
+
+
+def coerce_bool(value) -> Optional[bool]:
+    if value is None or isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in _TRUE:
+        return True
+    if text in _FALSE:
+        return False
+    raise _Invalid
+
+
+def coerce_trend(value) -> Optional[Trend]:
+    if value is None or isinstance(value, Trend):
+        return value
+    text = str(value).strip().lower()
+    try:
+        return Trend(text)
+    except ValueError:
+        if text in _TREND_SYNONYMS:
+            return _TREND_SYNONYMS[text]
+        raise _Invalid
+
+
+def coerce_field(key: str, value):
+    """Typed value for one year-level field; raises _Invalid for uninterpretable input"""
+    if key in NUMERIC_FIELDS:
+        return coerce_number(value)
+    if key in BOOLEAN_FIELDS:
+        return coerce_bool(value)
+    if key in ENUM_FIELDS:
+        return coerce_trend(value)
+    if key in TEXT_FIELDS:
+        return '' if value is None else str(value)
+    return value
+
+
+def normalize_record(record: dict, report: DataQualityReport) -> dict:
+    """Coerce every year row of `record` in place and note anything suspicious.
+
+    The `years` dict is rebuilt keyed by FiscalYear and ordered latest first,
+    so callers get "latest" and ordered iteration without sorting per request.
+    """
+    report.stocks += 1
+    years = record.get('years')
+    if not isinstance(years, dict) or not years:
+        report.missing_years.append(record.get('Stock', '<unnamed>'))
+        record['years'] = {}
+        return record
+    typed_years = {}
+    for label, data in years.items():
+        try:
+            typed_years[FiscalYear.parse(label)] = data
+        except ValueError:
+            report.invalid.append(f"{record.get('Stock')} year label {label!r}")
+    record['years'] = years = {year: typed_years[year] for year in
+                               sorted(typed_years, key=lambda y: y.ordinal, reverse=True)}
+    for year, data in years.items():
+        report.year_rows += 1
+        for key, value in data.items():
+            report.field_counts[key] = report.field_counts.get(key, 0) + 1
+            try:
+                typed = coerce_field(key, value)
+            except _Invalid:
+                report.invalid.append(f"{record.get('Stock')} {year} {key}={value!r}")
+                data[key] = None
+                continue
+            if type(typed) is not type(value):
+                report.coerced += 1
+            data[key] = typed
+    return record
+
+
+def _count_company(company: Company, report: DataQualityReport):
+    """Tally a record normalized by an earlier load whose report is gone (e.g. a snapshot).
+
+    Coerced and invalid values cannot be recovered from the typed record, so
+    callers that still have the original report should merge it instead.
+    """
+    report.stocks += 1
+    if not company.years:
+        report.missing_years.append(company.name)
+    for data in company.years.values():
+        report.year_rows += 1
+        for key in data:
+            report.field_counts[key] = report.field_counts.get(key, 0) + 1
+
+
+def normalize_records(records: Iterable[dict]) -> DataQualityReport:
+    report = DataQualityReport()
+    for record in records:
+        if isinstance(record, Company):
+            _count_company(record, report)
+        else:
+            normalize_record(record, report)
+    return report
@@ -0,0 +1,62 @@
+"""
+Request coalescing: concurrent callers asking for the same key share one execution
+"""
+import threading
+from concurrent.futures import Future
+from typing import Callable, Dict, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """Runs at most one call per key at a time.
+
+    The first caller for a key (the leader) executes the function; callers
+    that arrive while it is running block on the leader's future and get the
+    same result, or the same exception. Nothing is remembered once the call
+    finishes, so a failure is never replayed to later callers.
+
+    threading primitives are green under eventlet's monkey patching, so
+    waiting greenlets yield to the hub instead of blocking the worker.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, Future] = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable[..., T], *args, **kwargs) -> T:
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+                self.executed += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            return future.result()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        except BaseException:
+            # The leader itself was cancelled (e.g. its eventlet Timeout fired);
+            # waiters get an ordinary error rather than someone else's timeout
+            future.set_exception(RuntimeError(f"Coalesced call for {key!r} was interrupted"))
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+    def stats(self) -> dict:
+        return {"executed": self.executed, "coalesced": self.coalesced, "in_flight": self.in_flight()}
@@ -0,0 +1,304 @@
+"""
+Binary snapshot of the stock_data/ directory, memory-mapped at server boot.
+
+Layout (little-endian, every section 8-byte aligned):
+
+    header        magic, format version, axis sizes, source stat and content fingerprints,
+                  data version, newest source mtime, quality string id, section offsets
+    strings       uint32 lengths followed by one UTF-8 blob (names, tickers, labels, JSON cells)
+    sources       int32 (files, 2): file name id, content digest id
+    stock_meta    int32 (stocks, 4): name id, ticker id, extras id, source file name id (-1 = absent)
+    axes          int32 string ids for year labels, metric columns and record keys
+    values        float64 (stocks, years, metrics), NaN where missing
+    present       uint8 (stocks, years): fiscal year reported by the stock
+    key_columns   int32 (keys,): metric column backing each record key (-1 = none)
+    cells         int32 (stocks, years, keys): id of the JSON-encoded raw value, -1 when
+                  the key is absent or the value is a float already held in `values`
+
+Loading maps the file and reads only the header, axes and per-stock names:
+the fundamentals matrix is a view onto `values`/`present`, and a stock's
+record is decoded from `cells` the first time it is looked up.
+
+Compile with `python snapshot.py [stock_data_dir] [output_path]`. At boot
+the file names, sizes and mtimes of the source directory are checked first;
+when they differ (a deploy that copies files rewrites mtimes) the file
+contents are hashed and the snapshot is still used if they match. The
+server falls back to parsing JSON only when the contents changed.
+"""
+import argparse
+import dataclasses
+import glob
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from fiscal_year import FiscalYear
+from fundamentals import FundamentalsMatrix
+from ingest import CHUNK_SIZE, ingest_directory
+from records import Company, LazyRecords, YearMetrics
+from schema import DataQualityReport, coerce_field
+from stock_store import SourceFile, StockIdentity, StockStore
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"STKSNAP\0"
+FORMAT_VERSION = 4
+# magic, format version, stocks, years, metrics, keys, strings, files, stat fingerprint,
+# content fingerprint, data version, newest source mtime, quality string id, 8 section offsets
+_HEADER = struct.Struct("<8sIIIIIII32s32s16sdi8Q")
+_SECTIONS = ("strings", "sources", "stock_meta", "axes", "values", "present", "key_columns", "cells")
+
+
+def source_fingerprint(directory: str) -> bytes:
+    """Cheap staleness check: hashes file names, sizes and mtimes without reading contents"""
+    digest = hashlib.sha256()
+    for path in sorted(glob.glob(os.path.join(directory, "*.json"))):
+        stat = os.stat(path)
+        digest.update(f"{os.path.basename(path)}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode())
+    return digest.digest()
+
+
+def content_fingerprint(directory: str) -> bytes:
+    """Hashes file names and contents; checked when source_fingerprint no longer matches"""
+    digest = hashlib.sha256()
+    for path in sorted(glob.glob(os.path.join(directory, "*.json"))):
+        file_digest = hashlib.sha1()
+        with open(path, "rb") as file:
+            for chunk in iter(lambda: file.read(CHUNK_SIZE), b""):
+                file_digest.update(chunk)
+        digest.update(f"{os.path.basename(path)}\0{file_digest.hexdigest()}\n".encode())
+    return digest.digest()
+
+
+class _StringTable:
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.strings: List[str] = []
+
+    def add(self, text: Optional[str]) -> int:
+        if text is None:
+            return -1
+        if text not in self.ids:
+            self.ids[text] = len(self.strings)
+            self.strings.append(text)
+        return self.ids[text]
+
+    def encode(self) -> bytes:
+        blobs = [s.encode("utf-8") for s in self.strings]
+        lengths = np.array([len(b) for b in blobs], dtype="<u4")
+        return lengths.tobytes() + b"".join(blobs)
+
+
+class _MappedStrings:
+    """String table read straight from the mapped file; each string is decoded on first use"""
+
+    def __init__(self, buffer, starts: np.ndarray, ends: np.ndarray):
+        self.buffer = buffer
+        self.starts = starts
+        self.ends = ends
+        self._decoded: Dict[int, str] = {}
+
+    def __getitem__(self, string_id: int) -> str:
+        text = self._decoded.get(string_id)
+        if text is None:
+            text = self._decoded[string_id] = bytes(
+                self.buffer[int(self.starts[string_id]):int(self.ends[string_id])]).decode("utf-8")
+        return text
+
+
+def _pad(buffer: bytearray):
+    buffer.extend(b"\0" * (-len(buffer) % 8))
+
+
+def compile_snapshot(directory: str, output_path: str, workers: int = 1) -> StockStore:
+    """Parse the JSON directory once and write a snapshot next to it (atomically)"""
+    fingerprint = source_fingerprint(directory)
+    contents = content_fingerprint(directory)
+    store = ingest_directory(directory, workers=workers).to_store()
+    matrix = store.fundamentals
+    records = list(store)
+
+    table = _StringTable()
+    keys: Dict[str, None] = {}
+    for record in records:
+        for data in record.get('years', {}).values():
+            keys.update(dict.fromkeys(data))
+    keys = list(keys)
+    key_index = {k: i for i, k in enumerate(keys)}
+
+    sources = np.array([(table.add(file_name), table.add(source.digest))
+                        for file_name, source in store.sources.items()], dtype="<i4").reshape(-1, 2)
+    source_of = {stock: file_name for file_name, source in store.sources.items() for stock in source.stocks}
+    stock_meta = np.full((len(records), 4), -1, dtype="<i4")
+    for s, record in enumerate(records):
+        extras = {k: v for k, v in record.items() if k not in ('Stock', 'Ticker', 'years')}
+        stock_meta[s] = (table.add(record['Stock']),
+                         table.add(record.get('Ticker')),
+                         table.add(json.dumps(extras)) if extras else -1,
+                         table.add(source_of.get(record['Stock'])))
+    axes = np.array([table.add(y) for y in matrix.years]
+                    + [table.add(m) for m in matrix.metrics]
+                    + [table.add(k) for k in keys], dtype="<i4")
+    key_columns = np.array([matrix.metric_index.get(k, -1) for k in keys], dtype="<i4")
+    # Per-file reports, so /system/status and hot reloads see the same quality as a JSON load
+    quality_id = table.add(json.dumps({file_name: dataclasses.asdict(report)
+                                       for file_name, report in store.file_quality.items()}))
+
+    cells = np.full((len(records), len(matrix.years), len(keys)), -1, dtype="<i4")
+    for s, record in enumerate(records):
+        for year, data in record.get('years', {}).items():
+            y = matrix.year_column(year)
+            for key, value in data.items():
+                # Plain floats round-trip through `values`; everything else keeps its exact JSON form
+                if type(value) is float and key_columns[key_index[key]] >= 0:
+                    continue
+                cells[s, y, key_index[key]] = table.add(json.dumps(value))
+
+    sections = {
+        "strings": table.encode(),
+        "sources": sources.tobytes(),
+        "stock_meta": stock_meta.tobytes(),
+        "axes": axes.tobytes(),
+        "values": np.ascontiguousarray(matrix.values, dtype="<f8").tobytes(),
+        "present": matrix.present.astype(np.uint8).tobytes(),
+        "key_columns": key_columns.tobytes(),
+        "cells": cells.tobytes(),
+    }
+    body = bytearray(b"\0" * _HEADER.size)
+    _pad(body)
+    offsets = []
+    for name in _SECTIONS:
+        offsets.append(len(body))
+        body.extend(sections[name])
+        _pad(body)
+    body[:_HEADER.size] = _HEADER.pack(MAGIC, FORMAT_VERSION, len(records), len(matrix.years),
+                                       len(matrix.metrics), len(keys), len(table.strings),
+                                       len(store.sources), fingerprint, contents, store.version.encode("ascii"),
+                                       store.last_modified or 0.0, quality_id, *offsets)
+
+    tmp_path = f"{output_path}.tmp"
+    with open(tmp_path, "wb") as file:
+        file.write(body)
+    os.replace(tmp_path, output_path)
+    return store
+
+
+def load_snapshot(path: str, directory: Optional[str] = None) -> Optional[StockStore]:
+    """Map a snapshot into a StockStore, or None when it is missing, invalid or stale"""
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as file:
+        try:
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # empty file
+            return None
+    if len(buffer) < _HEADER.size:
+        return None
+    (magic, version, n_stocks, n_years, n_metrics, n_keys, n_strings, n_sources,
+     fingerprint, contents, store_version, last_modified, quality_id, *offsets) = _HEADER.unpack_from(buffer, 0)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        logger.warning(f"Ignoring snapshot {path}: unsupported format")
+        return None
+    if directory is not None and fingerprint != source_fingerprint(directory):
+        if contents != content_fingerprint(directory):
+            logger.info(f"Snapshot {path} is stale, falling back to JSON")
+            return None
+        logger.warning(f"Snapshot {path}: source mtimes changed but contents match; "
+                       f"recompile it to skip hashing the sources at every boot")
+    offsets = dict(zip(_SECTIONS, offsets))
+
+    lengths = np.frombuffer(buffer, dtype="<u4", count=n_strings, offset=offsets["strings"])
+    ends = np.cumsum(lengths, dtype=np.int64) + offsets["strings"] + 4 * n_strings
+    strings = _MappedStrings(buffer, ends - lengths, ends)
+
+    def array(name, dtype, shape):
+        count = int(np.prod(shape))
+        return np.frombuffer(buffer, dtype=dtype, count=count, offset=offsets[name]).reshape(shape)
+
+    stock_meta = array("stock_meta", "<i4", (n_stocks, 4))
+    axes = array("axes", "<i4", (n_years + n_metrics + n_keys,)).tolist()
+    years = [FiscalYear.parse(strings[i]) for i in axes[:n_years]]
+    metrics = [strings[i] for i in axes[n_years:n_years + n_metrics]]
+    keys = [strings[i] for i in axes[n_years + n_metrics:]]
+    # Both stay read-only views onto the mapped file
+    values = array("values", "<f8", (n_stocks, n_years, n_metrics))
+    present = array("present", "u1", (n_stocks, n_years)).view(bool)
+    key_columns = array("key_columns", "<i4", (n_keys,)).tolist()
+    cells = array("cells", "<i4", (n_stocks, n_years, n_keys))
+
+    # Cell values repeat heavily ("stable", false...), so each distinct one is decoded once.
+    # Cells were normalized before compiling; coerce_field only restores enum types.
+    decoded: Dict[Tuple[str, int], object] = {}
+
+    def cell(key, string_id):
+        if (key, string_id) not in decoded:
+            decoded[key, string_id] = coerce_field(key, json.loads(strings[string_id]))
+        return decoded[key, string_id]
+
+    meta = stock_meta.tolist()
+    extras = [json.loads(strings[extras_id]) if extras_id >= 0 else None for _, _, extras_id, _ in meta]
+
+    def build(s: int) -> Company:
+        """Decode one stock's cells; called by LazyRecords on first access"""
+        name_id, ticker_id, _, _ = meta[s]
+        record_years = {}
+        for y in np.flatnonzero(present[s])[::-1].tolist():
+            row_cells = cells[s, y].tolist()
+            row_values = values[s, y]
+            data = {}
+            for k, key in enumerate(keys):
+                if row_cells[k] >= 0:
+                    data[key] = cell(key, row_cells[k])
+                elif key_columns[k] >= 0 and not np.isnan(row_values[key_columns[k]]):
+                    data[key] = float(row_values[key_columns[k]])
+            record_years[years[y]] = YearMetrics(data)
+        return Company(strings[name_id], strings[ticker_id] if ticker_id >= 0 else None,
+                       record_years, extras[s])
+
+    identities = [StockIdentity(strings[name_id], strings[ticker_id] if ticker_id >= 0 else None,
+                                tuple((extras[s] or {}).get('Aliases') or ()))
+                  for s, (name_id, ticker_id, _, _) in enumerate(meta)]
+
+    stocks_by_source: Dict[int, List[str]] = {}
+    for s, identity in enumerate(identities):
+        stocks_by_source.setdefault(meta[s][3], []).append(identity.name)
+    sources = {strings[name_id]: SourceFile(strings[digest_id], tuple(stocks_by_source.get(name_id, ())))
+               for name_id, digest_id in array("sources", "<i4", (n_sources, 2)).tolist()}
+
+    file_quality = {file_name: DataQualityReport(**report)
+                    for file_name, report in json.loads(strings[quality_id]).items()}
+    quality = DataQualityReport()
+    for file_name in sorted(file_quality):
+        quality.merge(file_quality[file_name])
+
+    fundamentals = FundamentalsMatrix([i.name for i in identities], years, metrics, values, present)
+    return StockStore(LazyRecords(n_stocks, build), fundamentals=fundamentals, sources=sources,
+                      version=store_version.rstrip(b"\0").decode("ascii"),
+                      last_modified=last_modified or None, quality=quality, file_quality=file_quality,
+                      identities=identities)
+
+
+def main():
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Compile stock_data/*.json into a binary snapshot")
+    parser.add_argument("directory", nargs="?", default=os.path.join(base_dir, "stock_data"))
+    parser.add_argument("output", nargs="?",
+                        default=os.getenv("STOCK_SNAPSHOT_PATH", os.path.join(base_dir, "stock_data.snap")))
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="processes used to parse the JSON files")
+    args = parser.parse_args()
+    store = compile_snapshot(args.directory, args.output, workers=args.workers)
+    for report in store.load_report.errors:
+        print(f"Skipped {report.path}: {report.error}")
+    print(f"Wrote {args.output}: {len(store)} stocks, "
+          f"{len(store.fundamentals.years)} years, {len(store.fundamentals.metrics)} metrics")
+
+
+if __name__ == "__main__":
+    main()
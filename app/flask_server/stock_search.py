@@ -0,0 +1,142 @@
+"""
+Free-text company resolution: token inverted index with IDF weighting and typo tolerance
+"""
+import heapq
+import json
+import math
+import os
+import re
+from collections import defaultdict
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from Levenshtein import distance as edit_distance
+
+ALIAS_TABLE_PATH = os.getenv(
+    "STOCK_ALIASES_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "config", "stock_aliases.json"))
+
+_TOKEN = re.compile(r"\w+")
+# Tokens that say nothing about which company is meant ("limited" is in almost every name)
+_STOPWORDS = frozenset({"limited", "ltd", "inc", "plc", "corporation", "corp", "the", "of", "and"})
+# Typo tolerance: edits allowed per token length; shorter tokens must match exactly
+_MIN_FUZZY_LENGTH = 5
+_LONG_TOKEN_LENGTH = 8
+_FUZZY_CACHE_SIZE = 4096
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN.findall(str(text).lower()) if t not in _STOPWORDS]
+
+
+def _trigrams(token: str) -> List[str]:
+    padded = f"^{token}$"
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+def _max_edits(token: str) -> int:
+    if len(token) < _MIN_FUZZY_LENGTH:
+        return 0
+    return 2 if len(token) >= _LONG_TOKEN_LENGTH else 1
+
+
+@lru_cache(maxsize=8)
+def load_alias_table(path: str = ALIAS_TABLE_PATH) -> Dict[str, List[str]]:
+    """Company name -> extra names users type for it; a missing file means no aliases"""
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as file:
+        table = json.load(file)
+    return {name: list(aliases) for name, aliases in table.items()}
+
+
+class StockSearchIndex:
+    """Inverted index from name/ticker/alias tokens to stocks.
+
+    A query is scored against every stock sharing at least one token with it:
+    the sum of the IDF of the shared tokens, so a rare token ("airtel") counts
+    far more than a common one ("india"). Ties go to the stock whose own tokens
+    are covered best, then to load order. Query tokens that are not in the
+    vocabulary are matched to vocabulary tokens within one or two edits,
+    found through a trigram index so only a few candidates are compared.
+    """
+
+    def __init__(self, records: Iterable[dict], aliases: Optional[Dict[str, List[str]]] = None):
+        aliases = aliases or {}
+        self._names: List[str] = []
+        postings: Dict[str, set] = defaultdict(set)
+        for doc, record in enumerate(records):
+            name = record['Stock']
+            self._names.append(name)
+            texts = [name, record.get('Ticker') or '', *(record.get('Aliases') or ()), *aliases.get(name, ())]
+            for text in texts:
+                for token in tokenize(text):
+                    postings[token].add(doc)
+            # Tickers such as BAJAJ-AUTO are also typed as one word
+            ticker = re.sub(r"\W+", "", str(record.get('Ticker') or '').lower())
+            if ticker:
+                postings[ticker].add(doc)
+
+        count = len(self._names)
+        self._postings: Dict[str, Tuple[int, ...]] = {t: tuple(sorted(docs)) for t, docs in postings.items()}
+        self._idf: Dict[str, float] = {t: math.log(1 + count / len(docs)) for t, docs in postings.items()}
+        self._doc_weight = [0.0] * count
+        for token, docs in self._postings.items():
+            for doc in docs:
+                self._doc_weight[doc] += self._idf[token]
+
+        self._by_trigram: Dict[str, List[str]] = defaultdict(list)
+        for token in self._postings:
+            if len(token) >= _MIN_FUZZY_LENGTH - 1:
+                for gram in set(_trigrams(token)):
+                    self._by_trigram[gram].append(token)
+        self._fuzzy_cache: Dict[str, List[Tuple[str, float]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def _fuzzy(self, token: str) -> List[Tuple[str, float]]:
+        """Vocabulary tokens within the edit budget of `token`, with a 0..1 similarity"""
+        cached = self._fuzzy_cache.get(token)
+        if cached is not None:
+            return cached
+        matches = []
+        edits = _max_edits(token)
+        if edits:
+            grams = _trigrams(token)
+            # Each edit destroys at most three trigrams
+            needed = len(grams) - 3 * edits
+            shared: Dict[str, int] = defaultdict(int)
+            for gram in set(grams):
+                for candidate in self._by_trigram.get(gram, ()):
+                    shared[candidate] += 1
+            for candidate, hits in shared.items():
+                if hits < needed or abs(len(candidate) - len(token)) > edits:
+                    continue
+                distance = edit_distance(token, candidate, score_cutoff=edits)
+                if distance <= edits:
+                    matches.append((candidate, 1 - distance / max(len(token), len(candidate))))
+        if len(self._fuzzy_cache) >= _FUZZY_CACHE_SIZE:
+            self._fuzzy_cache.clear()
+        self._fuzzy_cache[token] = matches
+        return matches
+
+    def search(self, query: str, limit: int = 5) -> List[Tuple[str, float]]:
+        """Best matching stock names with their scores, highest first"""
+        scores: Dict[int, float] = defaultdict(float)
+        for token in set(tokenize(query)):
+            if token in self._postings:
+                matches = [(token, 1.0)]
+            else:
+                matches = self._fuzzy(token)
+            for vocab_token, similarity in matches:
+                weight = self._idf[vocab_token] * similarity
+                for doc in self._postings[vocab_token]:
+                    scores[doc] += weight
+        ranked = heapq.nsmallest(limit, scores.items(),
+                                 key=lambda item: (-item[1], -item[1] / self._doc_weight[item[0]], item[0]))
+        return [(self._names[doc], score) for doc, score in ranked]
+
+    def best(self, query: str) -> Optional[str]:
+        results = self.search(query, limit=1)
+        return results[0][0] if results else None
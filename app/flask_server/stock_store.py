@@ -0,0 +1,285 @@
+"""
+Indexed in-memory store for the stock universe loaded from stock_data/
+"""
+import hashlib
+import json
+import re
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from fundamentals import FundamentalsMatrix
+from record_index import RecordIndex
+from records import Company
+from schema import DataQualityReport, normalize_records
+from stock_search import StockSearchIndex, load_alias_table
+
+# Corporate suffixes that users routinely leave out ("Axis Bank" vs "Axis Bank Limited")
+_NAME_SUFFIXES = ("limited", "ltd", "inc", "plc", "corporation", "corp")
+_PUNCTUATION = re.compile(r"[^\w\s&]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_name(name: str) -> str:
+    """Lower-case, strip punctuation and collapse whitespace so lookups are hash-stable"""
+    cleaned = _PUNCTUATION.sub(" ", str(name).lower())
+    return _WHITESPACE.sub(" ", cleaned).strip()
+
+
+def strip_name_suffix(normalized: str) -> str:
+    """Drop a trailing corporate suffix from an already normalized name"""
+    words = normalized.split()
+    while len(words) > 1 and words[-1] in _NAME_SUFFIXES:
+        words.pop()
+    return " ".join(words)
+
+
+class SourceFile(NamedTuple):
+    """Content digest of one stock_data file and the stocks it defines"""
+    digest: str
+    stocks: Tuple[str, ...]
+
+
+def parse_stock_file(raw: bytes, file_path: str = "") -> List[dict]:
+    """Decode one stock_data file; files may hold one record or a list of records.
+
+    Raises ValueError for anything else, so loaders report the file as failed.
+    """
+    file_data = json.loads(raw)
+    if isinstance(file_data, dict):
+        return [file_data]
+    if isinstance(file_data, list) and all(isinstance(record, dict) for record in file_data):
+        return file_data
+    raise ValueError(f"{file_path or 'stock file'}: expected a JSON object or an array of objects")
+
+
+def read_stock_file(file_path: str) -> Tuple[List[dict], str]:
+    """Records and SHA-1 content digest of one stock_data file"""
+    with open(file_path, "rb") as file:
+        raw = file.read()
+    return parse_stock_file(raw, file_path), hashlib.sha1(raw).hexdigest()
+
+
+def data_version(digests: Dict[str, str]) -> str:
+    """Short content hash over every source file; identical data gives the same version everywhere"""
+    combined = hashlib.sha1()
+    for file_name in sorted(digests):
+        combined.update(f"{file_name}\0{digests[file_name]}\n".encode())
+    return combined.hexdigest()[:12]
+
+
+class StockIdentity(NamedTuple):
+    """What the lookup and search indexes need from a stock, without its year data"""
+    name: str
+    ticker: Optional[str]
+    aliases: Tuple[str, ...]
+
+
+class StockStore:
+    """Stock records plus hash indexes by normalized name, ticker and alias.
+
+    Aliases come from a record's own 'Aliases' list and from the alias table
+    (config/stock_aliases.json by default). `search_index` resolves free-text
+    mentions that are not an exact name, ticker or alias; `record_index`
+    picks the company and year records relevant to a free-form question.
+
+    Records are held as compact `Company` objects, which still read like the
+    JSON dicts. Iterating the store yields them in load order, so code that
+    still walks the universe keeps working; point lookups should use `get`.
+    `fundamentals` is the columnar metric cube built from the same records.
+
+    Given `identities`, `records` must be a sequence aligned with them (e.g.
+    snapshot-backed `LazyRecords`) and is not read at construction; the
+    lookup tables map keys to positions, so a record is only built when a
+    caller asks for it. `search_index` and `record_index` are likewise built
+    on first use, so loads and hot-reload swaps never wait for them.
+
+    A store is never mutated after construction: reloads build a new store and
+    swap the reference, so readers can hold one without locking.
+    """
+
+    def __init__(self, records: Iterable[dict] = (), fundamentals: Optional[FundamentalsMatrix] = None,
+                 version: Optional[str] = None, sources: Optional[Dict[str, SourceFile]] = None,
+                 last_modified: Optional[float] = None, quality: Optional[DataQualityReport] = None,
+                 file_quality: Optional[Dict[str, DataQualityReport]] = None,
+                 aliases: Optional[Dict[str, List[str]]] = None,
+                 identities: Optional[Sequence[StockIdentity]] = None):
+        self._aliases = load_alias_table() if aliases is None else aliases
+        self._by_name: Dict[str, int] = {}
+        self._by_ticker: Dict[str, int] = {}
+        self._by_alias: Dict[str, int] = {}
+        # Longest name, ticker or alias in words, bounding the phrase scan in mentions()
+        self._max_words = 0
+        if identities is None:
+            companies: List[Company] = []
+            identities = []
+            for record in records:
+                name = record.get('Stock')
+                # First record wins, matching the old next(...) scan over the list
+                if not name or normalize_name(name) in self._by_name:
+                    continue
+                company = record if isinstance(record, Company) else Company.from_dict(record)
+                identity = StockIdentity(company.name, company.ticker, tuple(company.get('Aliases') or ()))
+                self._add(len(companies), identity)
+                companies.append(company)
+                identities.append(identity)
+            self._records: Sequence[Company] = companies
+        else:
+            for position, identity in enumerate(identities):
+                self._add(position, identity)
+            self._records = records
+        self._identities = list(identities)
+        # A prebuilt matrix (e.g. mapped from a snapshot) must cover the same records
+        self.fundamentals = fundamentals or FundamentalsMatrix.from_records(self._records)
+        self._search_index: Optional[StockSearchIndex] = None
+        self._record_index: Optional[RecordIndex] = None
+        self._search_lock = threading.Lock()
+        self._record_lock = threading.Lock()
+        self.sources: Dict[str, SourceFile] = dict(sources or {})
+        self.version = version or data_version({name: src.digest for name, src in self.sources.items()})
+        self.last_modified = last_modified
+        self.quality = quality
+        # Per source file, so a reload can carry the reports of files it reuses
+        self.file_quality: Dict[str, DataQualityReport] = dict(file_quality or {})
+        # IngestResult of the JSON load that produced this store, if any
+        self.load_report = None
+
+    @property
+    def search_index(self) -> StockSearchIndex:
+        if self._search_index is None:
+            with self._search_lock:
+                if self._search_index is None:
+                    self._search_index = StockSearchIndex(
+                        [{'Stock': i.name, 'Ticker': i.ticker, 'Aliases': i.aliases} for i in self._identities],
+                        self._aliases)
+        return self._search_index
+
+    @property
+    def record_index(self) -> RecordIndex:
+        """BM25 index for free-form chat, built on first use (see warm_indexes)"""
+        if self._record_index is None:
+            with self._record_lock:
+                if self._record_index is None:
+                    self._record_index = RecordIndex(self._records, self._aliases)
+        return self._record_index
+
+    def warm_indexes(self):
+        """Build the lazy indexes now, e.g. from a background task right after a load or swap"""
+        self.search_index
+        self.record_index
+
+    @classmethod
+    def from_files(cls, files: Dict[str, Tuple[List[dict], str]], last_modified: Optional[float] = None,
+                   file_quality: Optional[Dict[str, DataQualityReport]] = None) -> "StockStore":
+        """Build a store from per-file (records, digest) pairs keyed by file name.
+
+        This is the single normalization point for parsed JSON: every year row is
+        coerced to typed values here, so request-time code never converts.
+        `file_quality` holds the reports of files whose records were already
+        normalized by an earlier store (reused on hot reload); those files are
+        not normalized again and their reports are merged as they were.
+        """
+        records = []
+        sources = {}
+        reports = {}
+        quality = DataQualityReport()
+        for file_name in sorted(files):
+            file_records, digest = files[file_name]
+            records.extend(file_records)
+            sources[file_name] = SourceFile(digest, tuple(r.get('Stock', '') for r in file_records))
+            report = (file_quality or {}).get(file_name)
+            reports[file_name] = report if report is not None else normalize_records(file_records)
+            quality.merge(reports[file_name])
+        return cls(records, sources=sources, last_modified=last_modified, quality=quality,
+                   file_quality=reports)
+
+    @property
+    def last_updated(self) -> Optional[str]:
+        """Modification time of the newest source file (UTC, ISO 8601)"""
+        if not self.last_modified:
+            return None
+        return datetime.fromtimestamp(self.last_modified, timezone.utc).isoformat(timespec='seconds')
+
+    def _add(self, position: int, identity: StockIdentity):
+        key = normalize_name(identity.name)
+        self._by_name.setdefault(key, position)
+        self._max_words = max(self._max_words, len(key.split()))
+
+        ticker = normalize_name(identity.ticker or '')
+        if ticker:
+            self._by_ticker[ticker] = position
+            self._max_words = max(self._max_words, len(ticker.split()))
+
+        aliases = [strip_name_suffix(key), *identity.aliases, *self._aliases.get(identity.name, [])]
+        for alias in aliases:
+            alias_key = normalize_name(alias)
+            if alias_key and alias_key != key:
+                self._by_alias.setdefault(alias_key, position)
+                self._max_words = max(self._max_words, len(alias_key.split()))
+
+    def _at(self, position: Optional[int]) -> Optional[Company]:
+        return self._records[position] if position is not None else None
+
+    def get(self, name: Optional[str]) -> Optional[Company]:
+        """Resolve a company name, ticker or alias to its stock record in O(1)"""
+        if not name:
+            return None
+        key = normalize_name(name)
+        position = self._by_name.get(key)
+        if position is None:
+            position = self._by_ticker.get(key)
+        if position is None:
+            position = self._by_alias.get(key)
+        return self._at(position)
+
+    def resolve(self, text: Optional[str]) -> Optional[Company]:
+        """Stock mentioned in free text: exact name, ticker or alias first, then the search index"""
+        stock = self.get(text)
+        if stock is None and text:
+            name = self.search_index.best(text)
+            stock = self._at(self._by_name.get(normalize_name(name))) if name else None
+        return stock
+
+    def mentions(self, text: Optional[str]) -> List[Company]:
+        """Every stock named in free text, in order of first mention.
+
+        Scans the words once, taking the longest exact name, ticker or alias
+        at each position, so "ITC, Axis Bank and Coal India" yields three
+        stocks. Misspelt names are left to `resolve`.
+        """
+        words = normalize_name(text or "").split()
+        found: Dict[str, Company] = {}
+        i = 0
+        while i < len(words):
+            for n in range(min(self._max_words, len(words) - i), 0, -1):
+                stock = self.get(" ".join(words[i:i + n]))
+                if stock is not None:
+                    found.setdefault(stock['Stock'], stock)
+                    i += n
+                    break
+            else:
+                i += 1
+        return list(found.values())
+
+    def get_by_ticker(self, ticker: str) -> Optional[Company]:
+        return self._at(self._by_ticker.get(normalize_name(ticker)))
+
+    @property
+    def names(self) -> List[str]:
+        return [identity.name for identity in self._identities]
+
+    def to_list(self) -> List[dict]:
+        """Records as plain dicts, e.g. for JSON serialization"""
+        return [record.to_dict() for record in self._records]
+
+    def __contains__(self, name) -> bool:
+        return self.get(name) is not None
+
+    def __iter__(self) -> Iterator[Company]:
+        return iter(self._records)
+
+    def __len__(self) -> int:
+        return len(self._identities)
+
+    def __bool__(self) -> bool:
+        return bool(self._identities)
@@ -0,0 +1,124 @@
+"""
+Rule-based explanations for report tables, used instead of the LLM when it is too slow or unavailable
+"""
+from typing import Dict, List, Optional, Sequence, Tuple
+
+DEGRADED_NOTE = "⚡ Quick summary (the AI explanation is not available right now; ask again later for the full analysis):"
+
+
+def _pct(value: float) -> str:
+    return f"{value:.1f}%"
+
+
+def cagr(latest: float, earliest: float, periods: int) -> Optional[float]:
+    """Compound annual growth rate, or None when it is undefined (non-positive endpoints)"""
+    if periods < 1 or latest <= 0 or earliest <= 0:
+        return None
+    return (latest / earliest) ** (1 / periods) - 1
+
+
+def describe_trend(metric: str, years: Sequence[str], values: Sequence[float]) -> str:
+    """Direction, average, peak/low and largest year-over-year moves; `years`/`values` are latest first"""
+    if not values:
+        return f"No {metric} data is available to explain."
+    latest, earliest = values[0], values[-1]
+    first_year, last_year = years[-1], years[0]
+    if len(values) == 1:
+        return f"{metric} was {latest:g} in {last_year}; one year of data is not enough to judge a trend."
+    change = latest - earliest
+    direction = "improved" if change > 0 else "declined" if change < 0 else "held steady"
+    sentences = [f"{metric} {direction} from {earliest:g} in {first_year} to {latest:g} in {last_year} "
+                 f"({'+' if change >= 0 else ''}{change:.1f} points)."]
+
+    average = sum(values) / len(values)
+    recent = values[:3]
+    recent_average = sum(recent) / len(recent)
+    sentences.append(f"It averaged {average:.1f} over {len(values)} years and {recent_average:.1f} "
+                     f"over the latest {len(recent)}, so recent performance is "
+                     f"{'above' if recent_average > average else 'below' if recent_average < average else 'in line with'} "
+                     f"the longer-run level.")
+
+    peak = max(range(len(values)), key=values.__getitem__)
+    low = min(range(len(values)), key=values.__getitem__)
+    sentences.append(f"The peak was {values[peak]:g} in {years[peak]} and the low {values[low]:g} in {years[low]}.")
+
+    # values run latest first, so the move into years[i] is values[i] - values[i + 1]
+    moves = [(values[i] - values[i + 1], years[i]) for i in range(len(values) - 1)]
+    rise = max(moves)
+    fall = min(moves)
+    if rise[0] > 0:
+        sentences.append(f"The biggest year-over-year gain was {rise[0]:+.1f} in {rise[1]}")
+        sentences[-1] += f", and the biggest drop {fall[0]:+.1f} in {fall[1]}." if fall[0] < 0 else "."
+    elif fall[0] < 0:
+        sentences.append(f"Every year was flat or lower; the biggest drop was {fall[0]:+.1f} in {fall[1]}.")
+
+    rate = cagr(latest, earliest, len(values) - 1)
+    if rate is not None:
+        sentences.append(f"That is a compound annual change of {_pct(rate * 100)} across the period.")
+    return " ".join(sentences)
+
+
+def describe_forecast(metric: str, years: Sequence[str], values: Sequence[float],
+                      growth_rates: Sequence[Optional[float]], rate: float, forecast: float) -> str:
+    known = [(g, y) for g, y in zip(growth_rates, years) if g is not None]
+    sentences = [f"Over {len(values)} years {metric} moved from {values[-1]:g} ({years[-1]}) "
+                 f"to {values[0]:g} ({years[0]}), a compound rate of {_pct(rate * 100)} a year."]
+    if known:
+        best = max(known)
+        worst = min(known)
+        sentences.append(f"Year-over-year changes ranged from {_pct(worst[0])} in {worst[1]} "
+                         f"to {_pct(best[0])} in {best[1]}.")
+    sentences.append(f"Extending that rate gives about {forecast:.1f} next year; "
+                     f"{'the trend is positive' if rate > 0 else 'the trend is not positive'}, "
+                     f"and a simple extrapolation like this ignores business and market changes.")
+    return " ".join(sentences)
+
+
+def describe_timeline(series: Dict[str, List[Tuple[str, float]]]) -> str:
+    """One sentence per metric; each series is (year, value) pairs, latest first"""
+    sentences = []
+    for metric, points in series.items():
+        if not points:
+            continue
+        (last_year, latest), (first_year, earliest) = points[0], points[-1]
+        if len(points) == 1 or latest == earliest:
+            sentences.append(f"{metric} stood at {latest:g} in {last_year}.")
+            continue
+        direction = "rose" if latest > earliest else "fell"
+        sentences.append(f"{metric} {direction} from {earliest:g} in {first_year} to {latest:g} in {last_year}.")
+    return " ".join(sentences) or "No timeline data is available to explain."
+
+
+def describe_scorecard(stock: str, year: str, rows: Sequence[Tuple[str, float, str]],
+                       risk_points: int, score: int, recommendation: str) -> str:
+    """`rows` are (metric label, value, band display) from the score_* rules"""
+    bands = "; ".join(f"{label} {value:g} scores {band}" for label, value, band in rows)
+    lines = [
+        f"Score: {score}/100",
+        f"Recommendation: {recommendation}",
+        f"Analysis: Rule-based scoring for {stock} in {year}: {bands}."
+    ]
+    if risk_points:
+        lines[-1] += f" Risk adjustments subtract {abs(risk_points)} points."
+    return "\n".join(lines)
+
+
+def describe_comparison(stocks: Sequence[str], metrics: Sequence[str], values: Sequence[Sequence[float]],
+                        leaders: Dict[str, str]) -> str:
+    """`values` is stocks x metrics (NaN where missing); `leaders` maps metric -> best stock"""
+    sentences = []
+    for m, metric in enumerate(metrics):
+        column = [(row[m], stock) for row, stock in zip(values, stocks) if row[m] == row[m]]
+        if len(column) < 2:
+            continue
+        low, high = min(column), max(column)
+        sentences.append(f"{metric} ranges from {low[0]:g} ({low[1]}) to {high[0]:g} ({high[1]}); "
+                         f"{leaders[metric]} leads.")
+    if not sentences:
+        return "Not enough overlapping data to compare these companies."
+    counts: Dict[str, int] = {}
+    for stock in leaders.values():
+        counts[stock] = counts.get(stock, 0) + 1
+    best = max(counts, key=counts.get)
+    sentences.append(f"Overall {best} leads on {counts[best]} of {len(leaders)} metrics compared.")
+    return " ".join(sentences)
@@ -0,0 +1,38 @@
+import json
+import os
+import sys
+
+import pytest
+
+# The server modules import each other as top-level modules (python main.py from app/flask_server)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Two files in the shapes stock_data uses: a single record and a list of records
+STOCKS = [
+    {"Stock": "Asian Paints Ltd", "Ticker": "ASIANPAINT", "Verdict": "Hold",
+     "years": {"2023-24": {"RevenueGrowth": "9.63%", "ROCE": 28.5, "DebtToEquity": 0.1,
+                           "DebtRisk": "no", "MarketShareGrowth": "stable", "AuditorRemarks": "None"},
+               "2022-23": {"RevenueGrowth": 18.2, "ROCE": 31, "CashReserve": "1,234.5"}}},
+    [{"Stock": "Tata Consultancy Services", "Ticker": "TCS", "Aliases": ["Tata Consultancy"],
+      "InsiderTrading": [{"Date": "2024-01-02", "Shares": 100}],
+      "years": {"2023-24": {"RevenueGrowth": 6.8, "NetProfitMargin": 19.1},
+                "2021-22": {"RevenueGrowth": 16.8, "NetProfitMargin": 18.7}}},
+     {"Stock": "Infosys Limited", "Ticker": "INFY",
+      "years": {"2023-24": {"RevenueGrowth": 4.7, "DebtToEquity": "n/a"}}}],
+]
+
+
+@pytest.fixture
+def stock_dir(tmp_path):
+    """A stock_data directory with one single-record file and one list file"""
+    directory = tmp_path / "stock_data"
+    directory.mkdir()
+    for i, content in enumerate(STOCKS):
+        (directory / f"stock_{i}.json").write_text(json.dumps(content), encoding="utf-8")
+    return str(directory)
+
+
+@pytest.fixture
+def store(stock_dir):
+    from ingest import ingest_directory
+    return ingest_directory(stock_dir).to_store()
@@ -0,0 +1,102 @@
+import json
+import os
+
+from data_watcher import StockDataWatcher
+
+
+def write(stock_dir, name, content):
+    path = os.path.join(stock_dir, name)
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(content, file)
+    # Make sure the (mtime, size) check sees the edit even on coarse clocks
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+
+def test_unchanged_directory_is_not_reloaded(store, stock_dir):
+    watcher = StockDataWatcher(stock_dir, store)
+    assert watcher.poll() is False
+    assert watcher.current is store
+
+
+def test_changed_file_is_swapped_in_and_others_reused(store, stock_dir):
+    swapped = []
+    watcher = StockDataWatcher(stock_dir, store, on_swap=swapped.append)
+    write(stock_dir, "stock_0.json", {"Stock": "Asian Paints Ltd", "Ticker": "ASIANPAINT",
+                                      "years": {"2023-24": {"RevenueGrowth": 5.0}}})
+    assert watcher.poll() is True
+    new_store = watcher.current
+    assert swapped == [new_store]
+    assert new_store.version != store.version
+    assert new_store.get("ASIANPAINT")['years'] != store.get("ASIANPAINT")['years']
+    # Records of untouched files are the same objects
+    assert new_store.get("TCS") is store.get("TCS")
+
+
+def test_quality_report_survives_reuse(store, stock_dir):
+    watcher = StockDataWatcher(stock_dir, store)
+    write(stock_dir, "stock_0.json", {"Stock": "Asian Paints Ltd", "Ticker": "ASIANPAINT",
+                                      "years": {"2023-24": {"RevenueGrowth": "5%"}}})
+    assert watcher.poll() is True
+    # The invalid "n/a" in the reused list file is still reported
+    summary = watcher.current.quality.summary()
+    assert summary["invalid_values"] == 1
+    assert summary["stocks"] == 3
+    assert summary["coerced_values"] == store.file_quality["stock_1.json"].coerced + 1
+
+
+def test_malformed_file_keeps_the_previous_version(store, stock_dir):
+    watcher = StockDataWatcher(stock_dir, store)
+    with open(os.path.join(stock_dir, "stock_0.json"), "w", encoding="utf-8") as file:
+        file.write('{"Stock": "Asian Paints Ltd", "years": {')
+    write(stock_dir, "stock_2.json", {"Stock": "Wipro Ltd", "Ticker": "WIPRO", "years": {}})
+    assert watcher.poll() is True
+    assert watcher.current.get("ASIANPAINT") is store.get("ASIANPAINT")
+    assert watcher.current.get("WIPRO") is not None
+
+
+def test_removed_file_drops_its_stocks(store, stock_dir):
+    watcher = StockDataWatcher(stock_dir, store)
+    os.remove(os.path.join(stock_dir, "stock_1.json"))
+    assert watcher.poll() is True
+    assert watcher.current.names == ["Asian Paints Ltd"]
+
+
+def test_bad_file_is_parsed_once_until_it_changes(store, stock_dir, monkeypatch):
+    import data_watcher
+
+    parses, builds = [], []
+    parse = data_watcher.parse_stock_file
+    from_files = data_watcher.StockStore.from_files
+    monkeypatch.setattr(data_watcher, "parse_stock_file", lambda *a: parses.append(a[1]) or parse(*a))
+    monkeypatch.setattr(data_watcher.StockStore, "from_files",
+                        classmethod(lambda cls, *a, **k: builds.append(1) or from_files(*a, **k)))
+    watcher = StockDataWatcher(stock_dir, store)
+    with open(os.path.join(stock_dir, "broken.json"), "w", encoding="utf-8") as file:
+        file.write("{not json")
+    for _ in range(3):
+        assert watcher.poll() is False
+    assert parses == ["broken.json"]
+    assert builds == []
+    assert watcher.current is store
+
+    write(stock_dir, "broken.json", {"Stock": "Wipro Ltd", "Ticker": "WIPRO", "years": {}})
+    assert watcher.poll() is True
+    assert watcher.current.get("WIPRO") is not None
+    assert len(builds) == 1
+
+
+def test_failed_edit_of_a_loaded_file_does_not_rebuild(store, stock_dir, monkeypatch):
+    import data_watcher
+
+    builds = []
+    from_files = data_watcher.StockStore.from_files
+    monkeypatch.setattr(data_watcher.StockStore, "from_files",
+                        classmethod(lambda cls, *a, **k: builds.append(1) or from_files(*a, **k)))
+    watcher = StockDataWatcher(stock_dir, store)
+    with open(os.path.join(stock_dir, "stock_0.json"), "w", encoding="utf-8") as file:
+        file.write('{"Stock": ')
+    assert watcher.poll() is False
+    assert watcher.poll() is False
+    assert builds == []
+    assert watcher.current.get("ASIANPAINT") is store.get("ASIANPAINT")
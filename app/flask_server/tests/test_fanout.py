@@ -0,0 +1,76 @@
+import threading
+import time
+
+import pytest
+
+from fanout import fan_out
+from request_context import RequestContext, current_request, request_scope
+
+
+def test_sections_run_concurrently():
+    barrier = threading.Barrier(3, timeout=2)
+
+    def section(name):
+        # Only returns once all three sections are running at the same time
+        barrier.wait()
+        return name
+
+    started = time.perf_counter()
+    results = fan_out({name: (lambda name=name: section(name)) for name in ("a", "b", "c")})
+    assert results == {"a": "a", "b": "b", "c": "c"}
+    assert time.perf_counter() - started < 1
+
+
+def test_results_keep_the_given_order():
+    def slow(delay, value):
+        time.sleep(delay)
+        return value
+
+    results = fan_out({"first": lambda: slow(0.05, 1), "second": lambda: slow(0, 2), "third": lambda: slow(0.02, 3)})
+    assert list(results) == ["first", "second", "third"]
+    assert list(results.values()) == [1, 2, 3]
+
+
+def test_first_failure_in_order_is_raised_after_every_section_finished():
+    finished = []
+
+    def fail(message, delay=0.0):
+        time.sleep(delay)
+        finished.append(message)
+        raise ValueError(message)
+
+    def ok():
+        time.sleep(0.05)
+        finished.append("ok")
+        return 1
+
+    with pytest.raises(ValueError, match="early"):
+        fan_out({"ok": ok, "early": lambda: fail("early", 0.02), "late": lambda: fail("late")})
+    assert sorted(finished) == ["early", "late", "ok"]
+
+
+def test_degraded_sections_mark_the_request_and_streaming_is_off():
+    chunks = []
+    seen = {}
+
+    def section(degrade):
+        context = current_request()
+        seen[degrade] = (context.correlation_id, context.on_chunk, context.deadline)
+        context.degraded = degrade
+        return degrade
+
+    parent = RequestContext("req-1", on_chunk=chunks.append, deadline=time.monotonic() + 30)
+    with request_scope(parent):
+        fan_out({"clean": lambda: section(False), "degraded": lambda: section(True)})
+    assert parent.degraded is True
+    assert seen[True] == seen[False] == ("req-1", None, parent.deadline)
+
+    parent = RequestContext("req-2")
+    with request_scope(parent):
+        fan_out({"a": lambda: section(False), "b": lambda: section(False)})
+    assert parent.degraded is False
+
+
+def test_single_section_runs_inline():
+    assert fan_out({"only": threading.current_thread}) == {"only": threading.current_thread()}
+    assert fan_out({}) == {}
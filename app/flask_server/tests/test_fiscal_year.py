@@ -0,0 +1,33 @@
+import pickle
+
+import pytest
+
+from fiscal_year import FiscalYear, latest_year
+
+
+def test_parse_and_intern():
+    year = FiscalYear.parse("2023-24")
+    assert year == "2023-24" and year.ordinal == 2023
+    assert FiscalYear.parse("2023-24") is year
+    assert FiscalYear.parse("2019/2020").ordinal == 2019
+    assert FiscalYear.parse("2021").ordinal == 2021
+    with pytest.raises(ValueError):
+        FiscalYear.parse("FY23")
+
+
+def test_order_and_neighbours():
+    assert FiscalYear.parse("2022-23") < "2023-24"
+    assert sorted(map(FiscalYear.parse, ["2023-24", "2019-20", "2021-22"])) == ["2019-20", "2021-22", "2023-24"]
+    assert FiscalYear.of(2023).previous() == "2022-23"
+    assert FiscalYear.of(1999).next() == "2000-01"
+
+
+def test_works_as_plain_dict_key_and_pickles():
+    years = {"2023-24": 1}
+    assert years[FiscalYear.of(2023)] == 1
+    assert pickle.loads(pickle.dumps(FiscalYear.of(2023))) is FiscalYear.of(2023)
+
+
+def test_latest_year():
+    assert latest_year({"years": {FiscalYear.of(2023): {}, FiscalYear.of(2022): {}}}) == "2023-24"
+    assert latest_year({"years": {}}) is None
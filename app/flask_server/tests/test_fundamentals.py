@@ -0,0 +1,64 @@
+import math
+
+import numpy as np
+
+from fiscal_year import FiscalYear
+from fundamentals import FundamentalsMatrix, _to_float
+
+RECORDS = [
+    {"Stock": "A", "years": {"2023-24": {"ROCE": 20.0, "Debt": "1,200", "Note": "text"},
+                             "2021-22": {"ROCE": "18%"}}},
+    {"Stock": "B", "years": {"2022-23": {"ROCE": 9.5, "Debt": None}}},
+    {"years": {"2023-24": {"ROCE": 1.0}}},
+]
+
+
+def test_to_float():
+    assert _to_float(3) == 3.0
+    assert _to_float("9.63%") == 9.63
+    assert _to_float("1,234.5") == 1234.5
+    assert all(math.isnan(_to_float(v)) for v in (None, True, "", "n/a"))
+
+
+def test_from_records_axes_and_cells():
+    matrix = FundamentalsMatrix.from_records(RECORDS)
+    assert matrix.stocks == ("A", "B")
+    # Contiguous year axis, gaps simply not present
+    assert matrix.years == tuple(FiscalYear.of(y) for y in (2021, 2022, 2023))
+    assert matrix.metrics == ("ROCE", "Debt")
+    assert matrix.value("A", "2023-24", "Debt") == 1200.0
+    assert matrix.value("A", "2021-22", "ROCE") == 18.0
+    assert matrix.value("B", "2022-23", "Debt") is None
+    assert matrix.value("C", "2022-23", "ROCE") is None
+    assert matrix.mask.sum() == 4
+
+
+def test_years_series_and_previous_value():
+    matrix = FundamentalsMatrix.from_records(RECORDS)
+    assert matrix.stock_years("A") == [FiscalYear.of(2023), FiscalYear.of(2021)]
+    years, values = matrix.series("A", "ROCE")
+    assert years == [FiscalYear.of(2023), FiscalYear.of(2021)]
+    assert values.tolist() == [20.0, 18.0]
+    assert matrix.series("A", "ROCE", start_year=2022)[1].tolist() == [20.0]
+    assert matrix.series("A", "Debt", dropna=False)[1].tolist()[0] == 1200.0
+    assert matrix.previous_value("A", "2022-23", "ROCE") == 18.0
+    assert matrix.previous_value("A", "2023-24", "ROCE") is None
+    assert matrix.has_metric("B", "ROCE") and not matrix.has_metric("B", "Debt")
+
+
+def test_latest_values():
+    matrix = FundamentalsMatrix.from_records(RECORDS)
+    years, values = matrix.latest_values(["B", "A", "missing"], ["ROCE", "Debt", "Nope"])
+    assert years == [FiscalYear.of(2022), FiscalYear.of(2023), None]
+    np.testing.assert_array_equal(values, [[9.5, np.nan, np.nan],
+                                           [20.0, 1200.0, np.nan],
+                                           [np.nan, np.nan, np.nan]])
+
+
+def test_cross_section_and_empty_matrix():
+    matrix = FundamentalsMatrix.from_records(RECORDS)
+    np.testing.assert_array_equal(matrix.cross_section("ROCE", "2023-24"), [20.0, np.nan])
+    empty = FundamentalsMatrix.from_records([])
+    assert empty.stocks == () and empty.stock_years("A") == []
+    years, values = empty.latest_values(["A"], ["ROCE"])
+    assert years == [None] and np.isnan(values).all()
@@ -0,0 +1,96 @@
+import hashlib
+import io
+import json
+import os
+
+import pytest
+
+import ingest
+from ingest import _batches, ingest_directory, ingest_file, iter_json_array
+
+RECORDS = [{"Stock": f"Company {i}", "Note": "naïve ₹ " * i, "Values": [i, i / 3, None, True]}
+           for i in range(50)]
+
+
+def stream(text, **kwargs):
+    return list(iter_json_array(io.BytesIO(text.encode("utf-8")), **kwargs))
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 7, 64, 1 << 20])
+def test_iter_json_array_across_chunk_boundaries(chunk_size):
+    assert stream(json.dumps(RECORDS), chunk_size=chunk_size) == RECORDS
+
+
+def test_iter_json_array_scalars_and_whitespace():
+    # A number cut at a chunk boundary must not be yielded early
+    assert stream(" [ 12345 , -6.5e3,\n\"x\" , null ,[1,[2]] ] ", chunk_size=2) == [12345, -6500.0, "x", None, [1, [2]]]
+    assert stream("[]") == []
+    assert stream("   ") == []
+
+
+def test_iter_json_array_non_array_top_level():
+    assert stream('{"Stock": "Solo"}', chunk_size=3) == [{"Stock": "Solo"}]
+
+
+def test_iter_json_array_errors():
+    with pytest.raises(ValueError):
+        stream('[{"Stock": "A"}, {"Stock": ', chunk_size=4)
+    with pytest.raises(ValueError):
+        stream(json.dumps(RECORDS), chunk_size=16, max_buffer=64)
+
+
+def test_iter_json_array_digest_covers_every_byte():
+    raw = json.dumps(RECORDS).encode("utf-8")
+    digest = hashlib.sha1()
+    list(iter_json_array(io.BytesIO(raw), digest, chunk_size=100))
+    assert digest.hexdigest() == hashlib.sha1(raw).hexdigest()
+
+
+def test_streamed_and_whole_file_parse_agree(tmp_path):
+    path = str(tmp_path / "big.json")
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(RECORDS, file)
+    whole = ingest_file(path, stream_threshold=1 << 30)
+    streamed = ingest_file(path, stream_threshold=0)
+    assert streamed[3].streamed and not whole[3].streamed
+    assert streamed[:3] == whole[:3]
+
+
+def test_bad_file_is_reported_not_raised(stock_dir):
+    with open(os.path.join(stock_dir, "broken.json"), "w", encoding="utf-8") as file:
+        file.write("{not json")
+    result = ingest_directory(stock_dir)
+    assert [os.path.basename(report.path) for report in result.errors] == ["broken.json"]
+    assert sorted(result.files) == ["stock_0.json", "stock_1.json"]
+    assert result.record_count == 3
+
+
+def test_empty_directory(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        ingest_directory(str(tmp_path))
+
+
+def test_batches_group_small_files():
+    sizes = {"a": 3, "b": 3, "c": 5, "d": 1}
+    assert _batches(list(sizes), sizes, batch_bytes=6) == [["a", "b"], ["c", "d"]]
+    assert _batches(["a"], sizes, batch_bytes=1) == [["a"]]
+
+
+def test_process_pool_matches_serial(stock_dir, monkeypatch):
+    monkeypatch.setattr(ingest.os, "cpu_count", lambda: 2)
+    serial = ingest_directory(stock_dir)
+    pooled = ingest_directory(stock_dir, workers=2, parallel_min_bytes=0)
+    assert pooled.files == serial.files
+    assert [r.path for r in pooled.reports] == [r.path for r in serial.reports]
+
+
+@pytest.mark.parametrize("stream_threshold", [0, 1 << 30])
+@pytest.mark.parametrize("content", ['"just a string"', "42", "[1, 2]"])
+def test_unexpected_top_level_is_an_error(stock_dir, content, stream_threshold):
+    with open(os.path.join(stock_dir, "odd.json"), "w", encoding="utf-8") as file:
+        file.write(content)
+    result = ingest_directory(stock_dir, stream_threshold=stream_threshold)
+    errors = {os.path.basename(report.path): report.error for report in result.errors}
+    assert list(errors) == ["odd.json"]
+    assert "ValueError" in errors["odd.json"]
+    assert "odd.json" not in result.files
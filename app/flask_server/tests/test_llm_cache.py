@@ -0,0 +1,141 @@
+import sqlite3
+
+import pytest
+
+import llm_cache
+from llm_cache import LLMCache, cache_key
+
+PROMPT = ("explanation", "system", "user", 0.3)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return LLMCache(str(tmp_path / "cache.sqlite3"), data_version="v1")
+
+
+def test_cache_key_is_stable_and_field_sensitive():
+    assert cache_key(*PROMPT) == cache_key(*PROMPT)
+    assert cache_key(*PROMPT) != cache_key("explanation", "system", "user", 0.4)
+    assert len(cache_key(*PROMPT)) == 64
+
+
+def test_put_then_get(cache):
+    assert cache.get(*PROMPT) is None
+    cache.put(*PROMPT, "answer")
+    assert cache.get(*PROMPT) == "answer"
+    assert cache.peek(*PROMPT) == "answer"
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+
+
+def test_entries_persist_across_instances(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    LLMCache(path, data_version="v1").put(*PROMPT, "answer")
+    assert LLMCache(path, data_version="v1").get(*PROMPT) == "answer"
+
+
+def test_data_versions_are_kept_apart(cache):
+    cache.put(*PROMPT, "old data")
+    cache.data_version = "v2"
+    assert cache.get(*PROMPT) is None
+    cache.put(*PROMPT, "new data")
+    assert cache.get(*PROMPT) == "new data"
+    cache.data_version = "v1"
+    assert cache.get(*PROMPT) == "old data"
+    assert cache.stats()["entries"] == 2
+
+
+def test_expired_entries_miss(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(llm_cache.time, "time", lambda: now[0])
+    cache = LLMCache(str(tmp_path / "cache.sqlite3"), ttl=60)
+    cache.put(*PROMPT, "answer")
+    now[0] += 61
+    assert cache.get(*PROMPT) is None
+
+
+def test_hits_do_not_write_until_a_batch_is_due(cache, monkeypatch):
+    cache.put(*PROMPT, "answer")
+    statements = []
+    cache._db.set_trace_callback(statements.append)
+    for _ in range(10):
+        assert cache.get(*PROMPT) == "answer"
+    assert not [s for s in statements if not s.lstrip().upper().startswith("SELECT")]
+
+    monkeypatch.setattr(llm_cache, "TOUCH_BATCH_SIZE", 1)
+    cache.get(*PROMPT)
+    assert any(s.lstrip().upper().startswith("UPDATE") for s in statements)
+
+
+def test_eviction_prefers_other_versions_then_least_recent(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(llm_cache.time, "time", lambda: now[0])
+    cache = LLMCache(str(tmp_path / "cache.sqlite3"), max_bytes=30, data_version="v1")
+    cache.put("summary", "s", "old version", 0.3, "x" * 10)
+    cache.data_version = "v2"
+    for name in ("a", "b"):
+        now[0] += 1
+        cache.put("summary", "s", name, 0.3, "x" * 10)
+    now[0] += 1
+    cache.get("summary", "s", "a", 0.3)
+    now[0] += 1
+    cache.put("summary", "s", "c", 0.3, "x" * 10)
+
+    # Full: the other version's entry goes first
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["entries"] == 3
+
+    now[0] += 1
+    cache.put("summary", "s", "d", 0.3, "x" * 10)
+    # Then the least recently used one: "a" was read after "b" was written
+    assert [cache.peek("summary", "s", name, 0.3) is not None for name in "abcd"] == [True, False, True, True]
+    cache.data_version = "v1"
+    assert cache.peek("summary", "s", "old version", 0.3) is None
+
+
+def test_oversized_content_is_not_stored(tmp_path):
+    cache = LLMCache(str(tmp_path / "cache.sqlite3"), max_bytes=4)
+    cache.put(*PROMPT, "too long")
+    assert cache.get(*PROMPT) is None
+
+
+def test_old_schema_is_rebuilt(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    db = sqlite3.connect(path)
+    db.execute("CREATE TABLE completions (key TEXT PRIMARY KEY, model TEXT)")
+    db.commit()
+    db.close()
+    cache = LLMCache(path)
+    cache.put(*PROMPT, "answer")
+    assert cache.get(*PROMPT) == "answer"
+
+
+def test_clear(cache):
+    cache.put(*PROMPT, "answer")
+    cache.get(*PROMPT)
+    cache.clear()
+    assert cache.get(*PROMPT) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_database_is_opened_on_first_use(tmp_path):
+    path = tmp_path / "lazy.sqlite3"
+    cache = LLMCache(str(path))
+    assert not path.exists()
+    assert cache.get(*PROMPT) is None
+    assert path.exists()
+
+
+def test_from_env_resolves_relative_paths_and_clears_on_open(tmp_path, monkeypatch):
+    default = str(tmp_path / "default.sqlite3")
+    monkeypatch.setenv("LLM_CACHE_PATH", "custom.sqlite3")
+    monkeypatch.delenv("CLEAR_CACHE", raising=False)
+    cache = LLMCache.from_env(default)
+    assert cache.path == str(tmp_path / "custom.sqlite3")
+    cache.put(*PROMPT, "answer")
+
+    monkeypatch.setenv("CLEAR_CACHE", "true")
+    cleared = LLMCache.from_env(default)
+    assert cache.get(*PROMPT) == "answer"  # nothing happens until the new cache is used
+    assert cleared.get(*PROMPT) is None
+    assert cache.get(*PROMPT) is None
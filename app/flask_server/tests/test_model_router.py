@@ -0,0 +1,100 @@
+import pytest
+
+import model_router
+from model_router import CLOSED, HALF_OPEN, OPEN, ModelRouter
+
+ROUTES = {"chat": ["a", "b", "c"]}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(model_router.time, "monotonic", lambda: now[0])
+    monkeypatch.setattr(model_router, "FAILURE_THRESHOLD", 2)
+    monkeypatch.setattr(model_router, "COOLDOWN_SECONDS", 30.0)
+    return now
+
+
+def state(router, model):
+    return router.stats()["models"][model]["state"]
+
+
+def test_unmeasured_models_first_then_fastest():
+    router = ModelRouter(dict(ROUTES))
+    assert router.candidates("chat") == ["a", "b", "c"]
+    router.record("chat", "a", 2.0, True)
+    router.record("chat", "b", 0.5, True)
+    assert router.candidates("chat") == ["c", "b", "a"]
+
+
+def test_unknown_prompt_class():
+    with pytest.raises(KeyError):
+        ModelRouter(dict(ROUTES)).candidates("poetry")
+
+
+def test_circuit_opens_after_consecutive_failures(clock):
+    router = ModelRouter(dict(ROUTES))
+    router.record("chat", "a", 1.0, False)
+    assert state(router, "a") == CLOSED
+    router.record("chat", "a", 1.0, False)
+    assert state(router, "a") == OPEN
+    assert router.candidates("chat") == ["b", "c"]
+
+
+def test_half_open_admits_one_probe_and_closes_on_success(clock):
+    router = ModelRouter({"chat": ["a"]})
+    router.record("chat", "a", 1.0, False)
+    router.record("chat", "a", 1.0, False)
+    assert router.candidates("chat") == []
+    assert router.expected_latency("chat") is None
+
+    clock[0] += 31
+    assert router.candidates("chat") == ["a"]
+    assert state(router, "a") == HALF_OPEN
+    # The probe is taken until it reports
+    assert router.candidates("chat") == []
+    router.record("chat", "a", 0.2, True)
+    assert state(router, "a") == CLOSED
+    assert router.candidates("chat") == ["a"]
+
+
+def test_failed_probe_reopens(clock):
+    router = ModelRouter({"chat": ["a"]})
+    router.record("chat", "a", 1.0, False)
+    router.record("chat", "a", 1.0, False)
+    clock[0] += 31
+    assert router.candidates("chat") == ["a"]
+    router.record("chat", "a", 1.0, False)
+    assert state(router, "a") == OPEN
+    assert router.stats()["models"]["a"]["times_opened"] == 2
+    assert router.candidates("chat") == []
+
+
+def test_release_returns_untried_probes(clock):
+    router = ModelRouter(dict(ROUTES))
+    for model in ("a", "b"):
+        router.record("chat", model, 1.0, False)
+        router.record("chat", model, 1.0, False)
+    clock[0] += 31
+    candidates = router.candidates("chat")
+    assert set(candidates) == {"a", "b", "c"}
+    router.release(["a", "b"])
+    assert set(router.candidates("chat")) == {"a", "b", "c"}
+
+
+def test_error_rate_opens_circuit(clock, monkeypatch):
+    monkeypatch.setattr(model_router, "FAILURE_THRESHOLD", 100)
+    router = ModelRouter({"chat": ["a"]})
+    for i in range(model_router.MIN_SAMPLES):
+        router.record("chat", "a", 1.0, i % 2 == 0)
+    assert state(router, "a") == OPEN
+
+
+def test_stats_count_fallbacks():
+    router = ModelRouter(dict(ROUTES))
+    router.record("chat", "a", 1.0, False)
+    router.record("chat", "b", 1.0, True)
+    route = router.stats()["routes"]["chat"]
+    assert route["served"] == {"b": 1}
+    assert route["failed"] == {"a": 1}
+    assert route["fallbacks"] == 1
@@ -0,0 +1,21 @@
+import openrouter_client
+from model_router import DEFAULT_ROUTES
+from rate_limiter import LLMLimiter
+
+
+def test_pool_holds_every_call_the_limiter_admits():
+    models = {model for route in DEFAULT_ROUTES.values() for model in route}
+    assert openrouter_client.POOL_SIZE >= LLMLimiter().max_concurrent * len(models)
+
+
+def test_session_pool_uses_pool_size(monkeypatch):
+    monkeypatch.setattr(openrouter_client, "_session", None)
+    adapter = openrouter_client.get_session().get_adapter(openrouter_client.OPENROUTER_CHAT_URL)
+    assert adapter._pool_maxsize == openrouter_client.POOL_SIZE
+    assert adapter._pool_block is True
+
+
+def test_request_timeout_is_capped_by_the_budget():
+    connect, read = openrouter_client.request_timeout(2.0)
+    assert connect <= 2.0 and read == 2.0
+    assert openrouter_client.request_timeout(-1)[1] > 0
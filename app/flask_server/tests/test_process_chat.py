@@ -0,0 +1,189 @@
+import pytest
+import requests
+
+# process_chat imports the broker SDKs at module level
+for module in ("paramiko", "neo_api_client", "py5paisa"):
+    pytest.importorskip(module)
+
+import process_chat  # noqa: E402
+from request_context import RequestContext, request_scope  # noqa: E402
+from stock_store import StockStore  # noqa: E402
+
+BEST = {'RevenueGrowth': 20.0, 'EBITDAGrowth': 25.0, 'NetProfitMargin': 25.0,
+        'DebtToEquity': 2.0, 'PromoterHolding': 50.0}
+WORST = {'RevenueGrowth': 1.0, 'EBITDAGrowth': 1.0, 'NetProfitMargin': 1.0,
+         'DebtToEquity': 5.0, 'PromoterHolding': 10.0}
+
+
+def verdict(name, metrics):
+    store = StockStore([{"Stock": name, "years": {"2023-24": dict(metrics)}}], aliases={})
+    return process_chat.rule_based_verdict(store.get(name), "2023-24", store.fundamentals)
+
+
+def test_rule_based_verdict_extremes():
+    best = verdict("Best Co", BEST).splitlines()
+    assert best[:2] == ["Score: 100/100", "Recommendation: ✅ Strong Buy"]
+    assert "Risk adjustments" not in best[2]
+
+    # 4 points, then -3 for debt above 4 and -2 for growth under 5: clamped at 0
+    worst = verdict("Worst Co", WORST).splitlines()
+    assert worst[:2] == ["Score: 0/100", "Recommendation: 🔴 Risky - Consider Exit"]
+    assert "Risk adjustments subtract 5 points." in worst[2]
+
+
+def test_rule_based_verdict_skips_missing_metrics_and_applies_name_risk():
+    text = verdict("Only Revenue Co", {'RevenueGrowth': 20.0})
+    assert text.startswith("Score: 22/100\n")
+    assert "Revenue Growth 20 scores" in text and "EBITDA" not in text
+
+    # The same numbers lose 5 points for a paints company: 45 - 5 of 45
+    assert verdict("Some Paints Co", BEST).startswith("Score: 89/100\nRecommendation: ✅ Strong Buy")
+
+
+@pytest.mark.parametrize("score, text", [
+    (100, "✅ Strong Buy"), (80, "✅ Strong Buy"), (79, "🟢 Buy"), (60, "🟢 Buy"),
+    (59, "🟡 Hold"), (40, "🟡 Hold"), (39, "🔴 Risky - Consider Exit"), (0, "🔴 Risky - Consider Exit"),
+])
+def test_recommendation_thresholds(score, text):
+    assert process_chat.get_recommendation(score)['text'] == text
+
+
+@pytest.mark.parametrize("rule, value, points", [
+    (process_chat.score_revenue_growth, 15.01, 10), (process_chat.score_revenue_growth, 15, 8),
+    (process_chat.score_revenue_growth, 5, 2),
+    (process_chat.score_ebitda, 20, 12), (process_chat.score_ebitda, 10, 2),
+    (process_chat.score_profit, 20, 7), (process_chat.score_profit, 10, 3),
+    (process_chat.score_debt, 1.5, 5), (process_chat.score_debt, 3, 5), (process_chat.score_debt, 1.49, 3),
+    (process_chat.score_debt, 3.01, -2),
+    (process_chat.score_holding, 40, 5), (process_chat.score_holding, 60, 5), (process_chat.score_holding, 61, 3),
+    (process_chat.score_holding, 39, -1),
+])
+def test_score_band_edges(rule, value, points):
+    assert rule(value)['points'] == points
+
+
+class FakeResponse:
+    """Just enough of requests.Response for send_to_openrouter and stream_openrouter"""
+
+    def __init__(self, lines=(), body=None, error=None):
+        self.lines = lines
+        self.body = body
+        self.error = error
+        self.encoding = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.body
+
+    def iter_lines(self, decode_unicode=False):
+        yield from self.lines
+        if self.error is not None:
+            raise self.error
+
+
+class FakeSession:
+    def __init__(self, stream, full_answer="The full answer."):
+        self.stream = stream
+        self.full_answer = full_answer
+        self.calls = []
+
+    def post(self, url, headers=None, data=None, timeout=None, stream=False):
+        self.calls.append("stream" if stream else "full")
+        if stream:
+            return self.stream
+        return FakeResponse(body={"choices": [{"message": {"content": self.full_answer}}]})
+
+
+def delta(text):
+    return 'data: {"choices": [{"delta": {"content": "%s"}}]}' % text
+
+
+@pytest.fixture
+def session(monkeypatch, tmp_path):
+    from llm_cache import LLMCache
+    from model_router import ModelRouter
+    from rate_limiter import LLMLimiter
+
+    monkeypatch.setenv("OPENROUTER_API_KEY", "test-key")
+    monkeypatch.setattr(process_chat, "llm_limiter", LLMLimiter(rate=1000, burst=1000))
+    monkeypatch.setattr(process_chat, "model_router", ModelRouter())
+    monkeypatch.setattr(process_chat, "llm_cache", LLMCache(str(tmp_path / "cache.sqlite3")))
+    holder = {}
+
+    def use(stream, **kwargs):
+        holder["session"] = FakeSession(stream, **kwargs)
+        return holder["session"]
+
+    monkeypatch.setattr(process_chat, "get_session", lambda: holder["session"])
+    return use
+
+
+PAYLOAD = {"model": "test/model", "messages": []}
+
+
+def test_stream_skips_keep_alives_and_stops_at_done(session):
+    session(FakeResponse([": OPENROUTER PROCESSING", "", delta("Hello"), "", ": keep-alive",
+                          delta(" world."), "data: [DONE]", delta(" ignored")]))
+    chunks = []
+    response = process_chat.stream_openrouter(PAYLOAD, chunks.append)
+    assert chunks == ["Hello", " world."]
+    assert response == {"choices": [{"message": {"content": "Hello world."}}]}
+
+
+def test_stream_failing_before_the_first_token_falls_back_to_the_full_answer(session):
+    fake = session(FakeResponse([": keep-alive"], error=requests.exceptions.ChunkedEncodingError("reset")))
+    chunks = []
+    response = process_chat.stream_openrouter(PAYLOAD, chunks.append, process_chat.SINGLE_ATTEMPT)
+    assert chunks == []
+    assert response["choices"][0]["message"]["content"] == "The full answer."
+    assert fake.calls == ["stream", "full"]
+
+
+def test_malformed_chunk_before_any_token_falls_back(session):
+    fake = session(FakeResponse(["data: {not json"]))
+    response = process_chat.stream_openrouter(PAYLOAD, lambda text: None, process_chat.SINGLE_ATTEMPT)
+    assert response["choices"][0]["message"]["content"] == "The full answer."
+    assert fake.calls == ["stream", "full"]
+
+
+@pytest.mark.parametrize("stream", [
+    FakeResponse([delta("Partial"), "data: {not json", delta(" never")]),
+    FakeResponse([delta("Partial")], error=requests.exceptions.ChunkedEncodingError("reset")),
+])
+def test_stream_breaking_midway_returns_the_partial_text_as_an_error(session, stream):
+    fake = session(stream)
+    chunks = []
+    response = process_chat.stream_openrouter(PAYLOAD, chunks.append)
+    assert chunks == ["Partial"]
+    assert response["choices"][0]["message"]["content"] == "Partial"
+    assert "error" in response
+    # Text already reached the client, so no second answer is requested
+    assert fake.calls == ["stream"]
+
+
+def test_streamed_answer_is_cached_joined(session):
+    session(FakeResponse([delta("Margins "), delta("improved."), "data: [DONE]"]))
+    chunks = []
+    with request_scope(RequestContext("req", on_chunk=chunks.append)):
+        text = process_chat.cached_openrouter_request("chat", "system", "user")
+    assert text == "Margins improved."
+    assert chunks == ["Margins ", "improved."]
+    assert process_chat.llm_cache.peek("chat", "system", "user", 0.3) == "Margins improved."
+
+
+def test_broken_stream_uses_the_fallback_and_is_not_cached(session):
+    session(FakeResponse([delta("Half an")], error=requests.exceptions.ChunkedEncodingError("reset")))
+    with request_scope(RequestContext("req", on_chunk=lambda text: None)) as context:
+        text = process_chat.cached_openrouter_request("chat", "system", "user",
+                                                      fallback=lambda: "Rule-based answer.")
+    assert text.endswith("Rule-based answer.")
+    assert context.degraded
+    assert process_chat.llm_cache.peek("chat", "system", "user", 0.3) is None
@@ -0,0 +1,108 @@
+import pytest
+
+from fiscal_year import FiscalYear
+from query_router import Intent, parse_query, parse_year
+
+
+@pytest.mark.parametrize("label, expected", [
+    ("2023-24", FiscalYear.of(2023)),
+    ("FY2023", FiscalYear.of(2023)),
+    ("fy 2021", FiscalYear.of(2021)),
+    ("2022", FiscalYear.of(2022)),
+    ("someday", None),
+])
+def test_parse_year(label, expected):
+    assert parse_year(label) == expected
+
+
+@pytest.mark.parametrize("query, intent", [
+    ("hi", Intent.GREETING),
+    ("hello there", Intent.GREETING),
+    ("deploy the algo", Intent.DEPLOY),
+    ("predict revenue of TCS", Intent.FORECAST),
+    ("summarize the annual report of Infosys", Intent.SUMMARY),
+    ("display cash reserve of Asian Paints", Intent.CASH_TIMELINE),
+    ("revenue trend of TCS since 2019", Intent.TREND),
+    ("current price of INFY", Intent.PRICE),
+    ("should I buy Asian Paints", Intent.VERDICT),
+    ("comprehensive analysis of TCS", Intent.ANALYSIS),
+    ("analyze Infosys Limited for FY2022", Intent.ANALYSIS),
+    ("stock tips for zomato", Intent.UNKNOWN_STOCK),
+    ("what is the weather", Intent.OUT_OF_SCOPE),
+])
+def test_intents(store, query, intent):
+    assert parse_query(query, store).intent == intent
+
+
+def test_greeting_is_whole_word_only(store):
+    parsed = parse_query("history of TCS", store)
+    assert 'greeting' not in parsed.keywords
+    assert parsed.intent != Intent.GREETING
+
+
+def test_short_phrases_match_whole_words():
+    assert 'compare' in parse_query("TCS vs INFY").keywords
+    assert 'compare' in parse_query("TCS vs. INFY").keywords
+    assert 'compare' not in parse_query("vsnl results").keywords
+
+
+def test_phrases_match_at_word_start():
+    assert 'trend' in parse_query("revenue trends").keywords
+    assert 'trend' not in parse_query("uptrend").keywords
+
+
+def test_metric_priority_and_longest_phrase():
+    assert parse_query("cash reserve and debt").metric == 'DebtToEquity'
+    assert parse_query("display cash reserve").metric == 'CashReserve'
+    assert parse_query("profit and revenue").metric == 'RevenueGrowth'
+
+
+def test_years_and_since(store):
+    parsed = parse_query("ROCE trend of TCS since 2019", store)
+    assert parsed.start_year == 2019
+    assert parsed.year == FiscalYear.of(2019)
+    assert parsed.stock['Stock'] == "Tata Consultancy Services"
+    assert parse_query("summary of TCS for FY2022", store).year == FiscalYear.of(2022)
+
+
+def test_order(store):
+    parsed = parse_query("place buy order for 10 shares of Infosys Limited", store)
+    assert parsed.intent == Intent.ORDER
+    assert (parsed.side, parsed.quantity, parsed.target) == ("buy", 10, "Infosys Limited")
+    assert parsed.stock['Ticker'] == "INFY"
+
+
+def test_several_stocks_compare_or_price(store):
+    parsed = parse_query("compare TCS vs INFY on revenue", store)
+    assert parsed.intent == Intent.COMPARE
+    assert [s['Ticker'] for s in parsed.stocks] == ["TCS", "INFY"]
+    assert parse_query("prices of TCS and INFY", store).intent == Intent.PRICE
+    # Forecasts stay single-stock
+    assert parse_query("predict revenue of TCS and INFY", store).intent == Intent.FORECAST
+
+
+@pytest.mark.parametrize("query, intent, ticker", [
+    ("cash reserve of TCS vs sector, is Infosys Limited better?", Intent.VERDICT, "TCS"),
+    ("display cash reserve of Infosys Limited, is TCS better?", Intent.CASH_TIMELINE, "INFY"),
+    ("revenue trend of Asian Paints since 2019, ignore TCS", Intent.TREND, "ASIANPAINT"),
+    ("should I buy TCS or Infosys Limited", Intent.VERDICT, "TCS"),
+])
+def test_incidental_mentions_keep_the_single_stock_intent(store, query, intent, ticker):
+    parsed = parse_query(query, store)
+    assert parsed.intent == intent
+    assert parsed.stock['Ticker'] == ticker
+    assert parsed.stocks == ()
+
+
+def test_short_aliases_do_not_turn_questions_into_comparisons():
+    from stock_store import StockStore
+
+    store = StockStore([{"Stock": "Coal India Limited", "Ticker": "COALINDIA", "years": {}},
+                        {"Stock": "Axis Bank Limited", "Ticker": "AXISBANK", "years": {}}],
+                       aliases={"Coal India Limited": ["Coal", "CIL"], "Axis Bank Limited": ["Axis"]})
+    parsed = parse_query("cash reserve of Coal India vs sector, is Axis better?", store)
+    assert parsed.intent == Intent.VERDICT
+    assert parsed.stock['Ticker'] == "COALINDIA"
+    assert parse_query("Coal vs Axis on debt", store).intent == Intent.COMPARE
+    assert parse_query("compare CIL and Axis", store).intent == Intent.COMPARE
+    assert parse_query("share price of CIL and Axis", store).intent == Intent.PRICE
@@ -0,0 +1,88 @@
+import threading
+
+import pytest
+
+import quote_service
+from quote_service import QuoteService
+
+
+class FakeClient:
+    def __init__(self, prices, fail=False):
+        self.prices = prices
+        self.fail = fail
+        self.calls = []
+
+    def fetch_market_feed_scrip(self, req_data):
+        self.calls.append([entry["ScripData"] for entry in req_data])
+        if self.fail:
+            raise ConnectionError("feed down")
+        return {"Data": [{"LastRate": self.prices.get(entry["ScripData"])} for entry in req_data]}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [50.0]
+    monkeypatch.setattr(quote_service.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_prices_are_cached_for_the_ttl(clock):
+    client = FakeClient({"ITC_EQ": 450.0})
+    service = QuoteService(ttl=1.0, window=0)
+    assert service.get(client, "ITC_EQ") == 450.0
+    assert service.get(client, "ITC_EQ") == 450.0
+    assert len(client.calls) == 1
+    clock[0] += 1.5
+    client.prices["ITC_EQ"] = 452.0
+    assert service.get(client, "ITC_EQ") == 452.0
+    assert service.stats()["hits"] == 1
+
+
+def test_get_many_is_one_batched_call():
+    client = FakeClient({"ITC_EQ": 450.0, "TCS_EQ": 3900.0})
+    service = QuoteService(window=0)
+    assert service.get_many(client, ["ITC_EQ", "TCS_EQ", "ITC_EQ", "NONE_EQ"]) == {
+        "ITC_EQ": 450.0, "TCS_EQ": 3900.0, "NONE_EQ": None}
+    assert client.calls == [["ITC_EQ", "TCS_EQ", "NONE_EQ"]]
+    # A missing price is not cached
+    service.get(client, "NONE_EQ")
+    assert len(client.calls) == 2
+
+
+def test_concurrent_lookups_join_one_batch():
+    client = FakeClient({f"S{i}_EQ": float(i) for i in range(5)})
+    service = QuoteService(window=0.2)
+    results = {}
+    threads = [threading.Thread(target=lambda i=i: results.update({i: service.get(client, f"S{i}_EQ")}))
+               for i in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == {i: float(i) for i in range(5)}
+    assert len(client.calls) == 1
+    assert service.stats()["average_batch_size"] == 5
+
+
+def test_max_batch_splits_requests():
+    client = FakeClient({f"S{i}_EQ": float(i) for i in range(5)})
+    service = QuoteService(window=0, max_batch=2)
+    service.get_many(client, [f"S{i}_EQ" for i in range(5)])
+    assert [len(call) for call in client.calls] == [2, 2, 1]
+
+
+def test_failures_return_none_and_are_counted():
+    client = FakeClient({}, fail=True)
+    service = QuoteService(window=0)
+    assert service.get_many(client, ["ITC_EQ", "TCS_EQ"]) == {"ITC_EQ": None, "TCS_EQ": None}
+    assert service.stats()["errors"] == 2
+    assert service.stats()["cached_scrips"] == 0
+
+
+def test_short_feed_response_is_an_error():
+    class ShortClient(FakeClient):
+        def fetch_market_feed_scrip(self, req_data):
+            return {"Data": [{"LastRate": 1.0}]}
+
+    service = QuoteService(window=0)
+    assert service.get_many(ShortClient({}), ["A_EQ", "B_EQ"]) == {"A_EQ": None, "B_EQ": None}
@@ -0,0 +1,87 @@
+import pytest
+
+import rate_limiter
+from rate_limiter import LLMLimiter, Saturated, TokenBucket
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(rate_limiter.time, "monotonic", lambda: now[0])
+    monkeypatch.setattr(rate_limiter.time, "sleep", lambda seconds: now.__setitem__(0, now[0] + seconds))
+    return now
+
+
+def test_bucket_allows_burst_then_queues(clock):
+    bucket = TokenBucket(rate=2.0, burst=3)
+    assert [bucket.reserve(1.0) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.reserve(1.0) == pytest.approx(0.5)
+    assert bucket.reserve(1.0) == pytest.approx(1.0)
+    # Over the allowed wait: nothing is reserved
+    assert bucket.reserve(1.0) is None
+    clock[0] += 1.0
+    assert bucket.reserve(1.0) == pytest.approx(0.5)
+
+
+def test_bucket_refills_up_to_burst(clock):
+    bucket = TokenBucket(rate=10.0, burst=2)
+    bucket.reserve(0)
+    bucket.reserve(0)
+    clock[0] += 60
+    assert [bucket.reserve(0) for _ in range(2)] == [0.0, 0.0]
+    assert bucket.reserve(0) is None
+
+
+def test_refund_is_capped_at_burst(clock):
+    bucket = TokenBucket(rate=1.0, burst=1)
+    bucket.refund()
+    assert bucket.reserve(0) == 0.0
+    assert bucket.reserve(0) is None
+    bucket.refund()
+    assert bucket.reserve(0) == 0.0
+
+
+def test_rate_rejection(clock):
+    limiter = LLMLimiter(rate=1.0, burst=1, max_concurrent=4, max_waiting=8, max_wait=0.5)
+    with limiter.slot("a"):
+        pass
+    with pytest.raises(Saturated) as caught:
+        with limiter.slot("a"):
+            pass
+    assert caught.value.reason == "rate"
+    assert limiter.stats()["rejected"] == {"rate": 1}
+
+
+def test_full_bulkhead_refunds_its_token(clock):
+    limiter = LLMLimiter(rate=1.0, burst=2, max_concurrent=1, max_waiting=8, max_wait=0)
+    with limiter.slot("a"):
+        for _ in range(3):
+            with pytest.raises(Saturated) as caught:
+                with limiter.slot("a"):
+                    pass
+            assert caught.value.reason == "concurrency"
+        # The refunded token still admits a call to another model
+        with limiter.slot("b"):
+            assert limiter.stats()["in_flight"] == {"a": 1, "b": 1}
+    stats = limiter.stats()
+    assert stats["admitted"] == 2
+    assert stats["rejected"] == {"concurrency": 3}
+    assert stats["in_flight"] == {}
+
+
+def test_slot_is_released_when_the_call_raises(clock):
+    limiter = LLMLimiter(rate=100.0, burst=10, max_concurrent=1, max_waiting=8, max_wait=0)
+    with pytest.raises(RuntimeError):
+        with limiter.slot("a"):
+            raise RuntimeError("upstream failed")
+    with limiter.slot("a"):
+        pass
+    assert limiter.stats()["waiting"] == 0
+
+
+def test_queue_full_rejects_at_once(clock):
+    limiter = LLMLimiter(rate=1.0, burst=1, max_concurrent=1, max_waiting=0, max_wait=1)
+    with pytest.raises(Saturated) as caught:
+        with limiter.slot("a"):
+            pass
+    assert caught.value.reason == "queue_full"
@@ -0,0 +1,41 @@
+import json
+
+from record_index import RecordIndex, estimate_tokens
+
+
+def test_year_documents_match_metric_words_and_years(store):
+    index = store.record_index
+    top = json.loads(index.select("Infosys revenue growth 2023", token_budget=10 ** 6)[0])
+    assert top["Stock"] == "Infosys Limited"
+    assert top["Year"] == "2023-24"
+
+    texts = [json.loads(text) for text in index.select("TCS net profit margin 2021", token_budget=10 ** 6)]
+    assert texts[0]["Stock"] == "Tata Consultancy Services" and texts[0]["Year"] == "2021-22"
+
+
+def test_company_documents_carry_top_level_fields(store):
+    texts = [json.loads(text) for text in store.record_index.select("TCS insider trading")]
+    company = next(text for text in texts if "Year" not in text)
+    assert company["InsiderTrading"] == [{"Date": "2024-01-02", "Shares": 100}]
+
+
+def test_token_budget_and_fallback(store):
+    index = store.record_index
+    selected = index.select("TCS", token_budget=60)
+    assert sum(estimate_tokens(text) for text in selected) <= 60
+    # No match: company-level records so the model still knows the universe
+    fallback = [json.loads(text) for text in index.select("zzz")]
+    assert [text["Stock"] for text in fallback] == store.names
+    assert json.loads(index.context("zzz")) == fallback
+
+
+def test_aliases_are_indexed(store):
+    index = RecordIndex(store, aliases={"Asian Paints Ltd": ["Dulux rival"]})
+    assert json.loads(index.select("dulux")[0])["Stock"] == "Asian Paints Ltd"
+
+
+def test_store_builds_indexes_lazily(store):
+    assert store._record_index is None and store._search_index is None
+    store.warm_indexes()
+    assert store._record_index is store.record_index
+    assert len(store.record_index) == 3 + 5
@@ -0,0 +1,48 @@
+import pickle
+
+from fiscal_year import FiscalYear
+from records import Company, LazyRecords, YearMetrics
+
+RECORD = {"Stock": "ITC Ltd", "Ticker": "ITC", "Verdict": "Buy",
+          "years": {FiscalYear.of(2023): {"ROCE": 37.5, "DebtRisk": False}}}
+
+
+def test_year_metrics_reads_like_a_dict():
+    row = YearMetrics({"ROCE": 37.5, "EPSGrowth": None})
+    assert row["ROCE"] == 37.5 and row.get("Missing", 0) == 0
+    assert "EPSGrowth" in row and list(row) == ["ROCE", "EPSGrowth"]
+    assert row.to_dict() == {"ROCE": 37.5, "EPSGrowth": None}
+    # Rows with the same keys share one layout
+    assert YearMetrics({"ROCE": 1, "EPSGrowth": 2})._layout is row._layout
+
+
+def test_company_reads_like_the_json_record():
+    company = Company.from_dict(RECORD)
+    assert company["Stock"] == "ITC Ltd" and company["Ticker"] == "ITC"
+    assert company.get("Verdict") == "Buy" and company.get("Missing") is None
+    assert company["years"]["2023-24"]["ROCE"] == 37.5
+    assert list(company) == ["Stock", "Ticker", "years", "Verdict"]
+    assert company.to_dict() == {"Stock": "ITC Ltd", "Ticker": "ITC", "Verdict": "Buy",
+                                 "years": {"2023-24": {"ROCE": 37.5, "DebtRisk": False}}}
+    assert "Ticker" not in Company("No Ticker")
+
+
+def test_company_pickles():
+    company = Company.from_dict(RECORD)
+    assert pickle.loads(pickle.dumps(company)).to_dict() == company.to_dict()
+
+
+def test_lazy_records_build_once_on_access():
+    built = []
+
+    def build(position):
+        built.append(position)
+        return Company(f"Stock {position}")
+
+    records = LazyRecords(3, build)
+    assert len(records) == 3 and records.built == 0
+    assert records[1] is records[1]
+    assert built == [1]
+    assert [c.name for c in records[0:2]] == ["Stock 0", "Stock 1"]
+    assert [c.name for c in records] == ["Stock 0", "Stock 1", "Stock 2"]
+    assert records.built == 3 and sorted(built) == [0, 1, 2]
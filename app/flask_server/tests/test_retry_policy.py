@@ -0,0 +1,107 @@
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import pytest
+import requests
+
+import retry_policy
+from request_context import RequestContext, request_scope
+from retry_policy import DeadlineExceeded, RetryPolicy, classify_http_error, parse_retry_after
+
+
+def http_error(status, retry_after=None):
+    response = requests.Response()
+    response.status_code = status
+    if retry_after is not None:
+        response.headers["Retry-After"] = retry_after
+    return requests.exceptions.HTTPError(response=response)
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    calls = []
+    monkeypatch.setattr(retry_policy.time, "sleep", calls.append)
+    return calls
+
+
+def test_parse_retry_after_seconds_and_http_date():
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after("-1") == 0.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("soon") is None
+    when = datetime.now(timezone.utc) + timedelta(seconds=30)
+    assert 25 < parse_retry_after(format_datetime(when, usegmt=True)) <= 30
+
+
+def test_classify_http_error():
+    assert classify_http_error(http_error(429, "2")) == (True, 2.0)
+    assert classify_http_error(http_error(503)) == (True, None)
+    assert classify_http_error(http_error(400)) == (False, None)
+    assert classify_http_error(requests.exceptions.ConnectionError()) == (True, None)
+    assert classify_http_error(ValueError()) == (False, None)
+
+
+def test_backoff_is_capped_and_retry_after_is_a_floor():
+    policy = RetryPolicy(base_delay=1.0, max_delay=4.0)
+    assert all(0 <= policy.backoff(10) <= 4.0 for _ in range(100))
+    assert policy.backoff(0, retry_after=30.0) == 30.0
+
+
+def test_retries_until_success(sleeps):
+    outcomes = [http_error(502), http_error(429, "1"), "ok"]
+
+    def call(remaining):
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    assert RetryPolicy(max_attempts=3).run(call) == "ok"
+    assert len(sleeps) == 2
+    assert sleeps[1] >= 1.0
+
+
+def test_non_retryable_error_is_raised_at_once(sleeps):
+    calls = []
+
+    def call(remaining):
+        calls.append(remaining)
+        raise http_error(404)
+
+    with pytest.raises(requests.exceptions.HTTPError):
+        RetryPolicy(max_attempts=3).run(call)
+    assert len(calls) == 1
+    assert sleeps == []
+
+
+def test_gives_up_after_max_attempts(sleeps):
+    calls = []
+
+    def call(remaining):
+        calls.append(remaining)
+        raise requests.exceptions.ConnectionError()
+
+    with pytest.raises(requests.exceptions.ConnectionError):
+        RetryPolicy(max_attempts=3).run(call)
+    assert len(calls) == 3
+
+
+def test_no_retry_when_the_deadline_cannot_fit_another_attempt(sleeps):
+    calls = []
+
+    def call(remaining):
+        calls.append(remaining)
+        raise requests.exceptions.Timeout()
+
+    context = RequestContext("c", deadline=time.monotonic() + 1.0)
+    with request_scope(context), pytest.raises(requests.exceptions.Timeout):
+        RetryPolicy(max_attempts=5, min_attempt_seconds=2.0).run(call)
+    assert len(calls) == 1
+    assert 0 < calls[0] <= 1.0
+
+
+def test_expired_deadline_raises_before_calling():
+    context = RequestContext("c", deadline=time.monotonic() - 1)
+    with request_scope(context), pytest.raises(DeadlineExceeded):
+        RetryPolicy().run(lambda remaining: pytest.fail("called past the deadline"))
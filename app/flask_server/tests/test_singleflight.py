@@ -0,0 +1,111 @@
+import threading
+import time
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+def run_concurrently(flight, fn, callers=5):
+    """Start `callers` threads on the same key while fn blocks; returns their results"""
+    results = [None] * callers
+    threads = []
+    for i in range(callers):
+        def call(i=i):
+            try:
+                results[i] = flight.do("key", fn)
+            except Exception as e:
+                results[i] = e
+        threads.append(threading.Thread(target=call))
+    for thread in threads:
+        thread.start()
+    return threads, results
+
+
+def test_concurrent_callers_share_one_call():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        release.wait(5)
+        return "result"
+
+    threads, results = run_concurrently(flight, fn)
+    while flight.stats()["executed"] + flight.stats()["coalesced"] < 5:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert results == ["result"] * 5
+    assert len(calls) == 1
+    assert flight.stats() == {"executed": 1, "coalesced": 4, "in_flight": 0}
+
+
+def test_waiters_get_the_leaders_exception():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def fn():
+        release.wait(5)
+        raise ValueError("upstream failed")
+
+    threads, results = run_concurrently(flight, fn, callers=3)
+    while flight.stats()["coalesced"] < 2:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+def test_failures_are_not_remembered():
+    def fail():
+        raise ValueError("upstream failed")
+
+    flight = SingleFlight()
+    with pytest.raises(ValueError):
+        flight.do("key", fail)
+    assert flight.do("key", lambda: "ok") == "ok"
+    assert flight.in_flight() == 0
+
+
+def test_different_keys_run_separately():
+    flight = SingleFlight()
+    assert flight.do("a", lambda x: x * 2, 2) == 4
+    assert flight.do("b", lambda x, y=0: x + y, 2, y=3) == 5
+    assert flight.stats()["executed"] == 2
+
+
+def test_interrupted_leader_gives_waiters_an_ordinary_error():
+    class Cancelled(BaseException):
+        pass
+
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+
+    def fn():
+        started.set()
+        release.wait(5)
+        raise Cancelled()
+
+    errors = []
+
+    def call():
+        try:
+            flight.do("key", fn)
+        except BaseException as e:
+            errors.append(e)
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    started.wait(5)
+    waiter = threading.Thread(target=call)
+    waiter.start()
+    while flight.stats()["coalesced"] < 1:
+        time.sleep(0.01)
+    release.set()
+    leader.join()
+    waiter.join()
+    assert sorted(type(e).__name__ for e in errors) == ["Cancelled", "RuntimeError"]
@@ -0,0 +1,83 @@
+import os
+
+import numpy as np
+
+from ingest import ingest_directory
+from records import LazyRecords
+from snapshot import compile_snapshot, load_snapshot
+
+
+def test_round_trip_matches_json_load(stock_dir, tmp_path):
+    path = str(tmp_path / "stock_data.snap")
+    compile_snapshot(stock_dir, path)
+    expected = ingest_directory(stock_dir).to_store()
+    store = load_snapshot(path, stock_dir)
+
+    assert store is not None
+    assert store.version == expected.version
+    assert store.names == expected.names
+    assert store.sources == expected.sources
+    assert store.to_list() == expected.to_list()
+    assert store.fundamentals.stocks == expected.fundamentals.stocks
+    assert store.fundamentals.years == expected.fundamentals.years
+    assert store.fundamentals.metrics == expected.fundamentals.metrics
+    np.testing.assert_array_equal(store.fundamentals.values, expected.fundamentals.values)
+    np.testing.assert_array_equal(store.fundamentals.present, expected.fundamentals.present)
+
+
+def test_records_are_built_on_first_lookup(stock_dir, tmp_path):
+    path = str(tmp_path / "stock_data.snap")
+    compile_snapshot(stock_dir, path)
+    store = load_snapshot(path, stock_dir)
+    records = store._records
+    assert isinstance(records, LazyRecords)
+    assert records.built == 0
+
+    stock = store.get_by_ticker("TCS")
+    assert stock['Stock'] == "Tata Consultancy Services"
+    assert stock['InsiderTrading'] == [{"Date": "2024-01-02", "Shares": 100}]
+    assert records.built == 1
+    assert store.resolve("Tata Consultancy") is stock
+    assert store.fundamentals.value("Infosys Limited", "2023-24", "RevenueGrowth") == 4.7
+
+
+def test_stale_missing_or_invalid_snapshot_is_ignored(stock_dir, tmp_path):
+    path = str(tmp_path / "stock_data.snap")
+    assert load_snapshot(path, stock_dir) is None
+
+    compile_snapshot(stock_dir, path)
+    with open(os.path.join(stock_dir, "stock_2.json"), "w", encoding="utf-8") as file:
+        file.write('{"Stock": "New Co", "years": {}}')
+    assert load_snapshot(path, stock_dir) is None
+    # Without a directory the fingerprint is not checked
+    assert load_snapshot(path) is not None
+
+    with open(path, "wb") as file:
+        file.write(b"not a snapshot" * 20)
+    assert load_snapshot(path) is None
+
+
+def test_rewritten_mtimes_with_same_contents_keep_the_snapshot(stock_dir, tmp_path, caplog):
+    path = str(tmp_path / "stock_data.snap")
+    compile_snapshot(stock_dir, path)
+    # What a deploy copying the files does: same bytes, new mtimes
+    for name in os.listdir(stock_dir):
+        os.utime(os.path.join(stock_dir, name), (1e9, 1e9))
+    store = load_snapshot(path, stock_dir)
+    assert store is not None
+    assert "contents match" in caplog.text
+
+    with open(os.path.join(stock_dir, "stock_0.json"), "a", encoding="utf-8") as file:
+        file.write("\n")
+    assert load_snapshot(path, stock_dir) is None
+
+
+def test_quality_survives_the_snapshot(stock_dir, tmp_path):
+    path = str(tmp_path / "stock_data.snap")
+    compile_snapshot(stock_dir, path)
+    expected = ingest_directory(stock_dir).to_store()
+    store = load_snapshot(path, stock_dir)
+    assert store.quality is not None
+    assert store.quality.summary() == expected.quality.summary()
+    assert store.quality.summary()["invalid_values"] == 1
+    assert store.file_quality == expected.file_quality
@@ -0,0 +1,68 @@
+from records import Company
+from stock_store import StockStore, normalize_name, strip_name_suffix
+
+
+def test_normalize_name():
+    assert normalize_name("  Tata   Consultancy-Services Ltd. ") == "tata consultancy services ltd"
+    assert strip_name_suffix("infosys limited") == "infosys"
+    assert strip_name_suffix("limited") == "limited"
+
+
+def test_get_by_name_ticker_and_alias(store):
+    tcs = store.get("Tata Consultancy Services")
+    assert isinstance(tcs, Company)
+    assert store.get("tata consultancy services") is tcs
+    assert store.get("TCS") is tcs
+    assert store.get("Tata Consultancy") is tcs
+    assert store.get_by_ticker("tcs") is tcs
+    assert store.get("Wipro") is None
+    assert store.get("") is None
+    assert "INFY" in store and "Wipro" not in store
+
+
+def test_alias_table():
+    store = StockStore([{"Stock": "Larsen & Toubro Ltd", "Ticker": "LT", "years": {}}],
+                       aliases={"Larsen & Toubro Ltd": ["L&T"]})
+    assert store.get("l&t")['Ticker'] == "LT"
+
+
+def test_first_record_wins_on_duplicate_names():
+    store = StockStore([{"Stock": "Infosys", "Ticker": "INFY", "years": {}},
+                        {"Stock": "infosys", "Ticker": "OTHER", "years": {}}], aliases={})
+    assert len(store) == 1
+    assert store.get("Infosys")['Ticker'] == "INFY"
+
+
+def test_resolve_falls_back_to_fuzzy_search(store):
+    assert store.resolve("TCS")['Ticker'] == "TCS"
+    assert store.resolve("how is infosys doing")['Ticker'] == "INFY"
+    # Typo within the edit budget of a long token
+    assert store.resolve("asain paints results")['Ticker'] == "ASIANPAINT"
+    assert store.resolve("consultancy services")['Ticker'] == "TCS"
+    assert store.resolve("weather today") is None
+
+
+def test_mentions_in_order(store):
+    mentioned = store.mentions("Compare INFY, Tata Consultancy and asian paints ltd")
+    assert [stock['Ticker'] for stock in mentioned] == ["INFY", "TCS", "ASIANPAINT"]
+    assert store.mentions("TCS and TCS again") == [store.get("TCS")]
+
+
+def test_records_are_normalized_once_at_load(store):
+    stock = store.get("Asian Paints Ltd")
+    latest = next(iter(stock['years']))
+    assert str(latest) == "2023-24"
+    row = stock['years'][latest]
+    assert row['RevenueGrowth'] == 9.63
+    assert row['DebtRisk'] is False
+    assert str(row['MarketShareGrowth']) == "stable"
+    assert store.quality.summary()["invalid_values"] == 1
+
+
+def test_iteration_and_fundamentals(store):
+    assert store.names == ["Asian Paints Ltd", "Tata Consultancy Services", "Infosys Limited"]
+    assert [stock['Stock'] for stock in store] == store.names
+    assert store.fundamentals.value("Asian Paints Ltd", "2022-23", "CashReserve") == 1234.5
+    assert store.fundamentals.stock_years("Tata Consultancy Services") == [
+        year for year in store.get("TCS")['years']]
+    assert len(store.record_index) > 0
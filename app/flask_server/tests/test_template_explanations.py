@@ -0,0 +1,89 @@
+import math
+
+import pytest
+
+from template_explanations import (cagr, describe_comparison, describe_forecast, describe_scorecard,
+                                   describe_timeline, describe_trend)
+
+YEARS = ["2023-24", "2022-23", "2021-22"]
+
+
+def test_cagr_is_undefined_for_non_positive_endpoints_or_no_periods():
+    assert cagr(18.0, 10.0, 2) == pytest.approx(math.sqrt(1.8) - 1)
+    assert cagr(5.0, -2.0, 1) is None
+    assert cagr(0.0, 5.0, 1) is None
+    assert cagr(5.0, 5.0, 0) is None
+
+
+def test_trend_reads_values_latest_first():
+    text = describe_trend("ROCE", YEARS, [18.0, 12.0, 10.0])
+    assert text.startswith("ROCE improved from 10 in 2021-22 to 18 in 2023-24 (+8.0 points).")
+    assert "averaged 13.3 over 3 years and 13.3 over the latest 3" in text
+    assert "The peak was 18 in 2023-24 and the low 10 in 2021-22." in text
+    assert "The biggest year-over-year gain was +6.0 in 2023-24." in text
+    assert "compound annual change of 34.2%" in text
+
+
+def test_trend_with_only_falling_years():
+    text = describe_trend("RevenueGrowth", YEARS, [5.0, 8.0, 10.0])
+    assert text.startswith("RevenueGrowth declined from 10 in 2021-22 to 5 in 2023-24 (-5.0 points).")
+    assert "Every year was flat or lower; the biggest drop was -3.0 in 2023-24." in text
+
+
+def test_trend_without_a_defined_cagr():
+    text = describe_trend("NetProfitMargin", YEARS[:2], [5.0, -2.0])
+    assert "improved from -2 in 2022-23 to 5 in 2023-24" in text
+    assert "compound" not in text
+
+
+def test_trend_single_year_and_no_data():
+    assert describe_trend("ROCE", ["2023-24"], [7.5]) == \
+        "ROCE was 7.5 in 2023-24; one year of data is not enough to judge a trend."
+    assert describe_trend("ROCE", [], []) == "No ROCE data is available to explain."
+
+
+def test_forecast_skips_years_without_a_growth_rate():
+    text = describe_forecast("RevenueGrowth", YEARS, [12.0, 10.0, 8.0], [20.0, 25.0, None], 0.2247, 14.7)
+    assert text.startswith("Over 3 years RevenueGrowth moved from 8 (2021-22) to 12 (2023-24), "
+                           "a compound rate of 22.5% a year.")
+    assert "ranged from 20.0% in 2023-24 to 25.0% in 2022-23" in text
+    assert "about 14.7 next year; the trend is positive" in text
+
+    text = describe_forecast("RevenueGrowth", YEARS[:2], [8.0, 10.0], [None, None], -0.2, 6.4)
+    assert "ranged" not in text
+    assert "the trend is not positive" in text
+
+
+def test_timeline_latest_first_single_points_and_empty_series():
+    text = describe_timeline({
+        "CashReserve": [("2023-24", 120.0), ("2022-23", 100.0)],
+        "DebtToEquity": [("2023-24", 0.5)],
+        "ROCE": [],
+        "PromoterHolding": [("2023-24", 50.0), ("2022-23", 50.0)],
+    })
+    assert text == ("CashReserve rose from 100 in 2022-23 to 120 in 2023-24. "
+                    "DebtToEquity stood at 0.5 in 2023-24. PromoterHolding stood at 50 in 2023-24.")
+    assert describe_timeline({"ROCE": []}) == "No timeline data is available to explain."
+
+
+def test_scorecard():
+    rows = [("Revenue Growth", 20.0, "++10 (＞15%)"), ("Debt-to-Equity", 2.0, "+5 (Optimal 1.5-3)")]
+    text = describe_scorecard("TCS", "2023-24", rows, -2, 71, "🟢 Buy")
+    assert text.splitlines() == [
+        "Score: 71/100",
+        "Recommendation: 🟢 Buy",
+        "Analysis: Rule-based scoring for TCS in 2023-24: Revenue Growth 20 scores ++10 (＞15%); "
+        "Debt-to-Equity 2 scores +5 (Optimal 1.5-3). Risk adjustments subtract 2 points.",
+    ]
+    assert "Risk adjustments" not in describe_scorecard("TCS", "2023-24", rows, 0, 80, "✅ Strong Buy")
+
+
+def test_comparison_ignores_missing_values():
+    nan = float("nan")
+    text = describe_comparison(["A", "B", "C"], ["ROCE", "DebtToEquity"],
+                               [[10.0, nan], [20.0, 1.0], [nan, 0.5]], {"ROCE": "B", "DebtToEquity": "C"})
+    assert text == ("ROCE ranges from 10 (A) to 20 (B); B leads. "
+                    "DebtToEquity ranges from 0.5 (C) to 1 (B); C leads. "
+                    "Overall B leads on 1 of 2 metrics compared.")
+    assert describe_comparison(["A", "B"], ["ROCE"], [[10.0], [nan]], {"ROCE": "A"}) == \
+        "Not enough overlapping data to compare these companies."
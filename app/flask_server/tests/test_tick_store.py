@@ -0,0 +1,113 @@
+import json
+import threading
+
+from market_feed import ReplayFeed, scrips_for, synthesize
+from tick_store import TickStore
+
+
+def test_quotes_only_while_a_session_is_live():
+    store = TickStore(capacity=4)
+    store.track(["ITC_EQ"])
+    store.update("ITC_EQ", 450.5, 450.4, 450.6, 1000)
+    assert store.quote("ITC_EQ") is None
+
+    store.begin_session()
+    assert store.quote("ITC_EQ") is None  # written in an earlier session
+    store.update("ITC_EQ", 451.0, 450.9, 451.1, 1200, exchange_time=1.7e9)
+    tick = store.quote("ITC_EQ")
+    assert (tick.last, tick.bid, tick.ask, tick.volume, tick.exchange_time) == (451.0, 450.9, 451.1, 1200, 1.7e9)
+    assert store.price("ITC_EQ") == 451.0
+
+    store.end_session()
+    assert store.price("ITC_EQ") is None
+
+
+def test_capacity_and_untracked_scrips():
+    store = TickStore(capacity=2)
+    assert store.track(["A_EQ", "B_EQ", "C_EQ", "A_EQ"]) == 1
+    assert store.scrips() == ("A_EQ", "B_EQ")
+    store.begin_session()
+    store.update("C_EQ", 10.0)
+    assert store.quote("C_EQ") is None
+    assert store.stats()["dropped"] == 1
+
+
+def test_readers_never_see_a_half_written_row():
+    store = TickStore(capacity=1)
+    store.track(["X_EQ"])
+    store.begin_session()
+    store.update("X_EQ", 0.0, 0.0, 0.0, 0)
+    stop = threading.Event()
+
+    def write():
+        i = 0
+        while not stop.is_set():
+            i += 1
+            store.update("X_EQ", float(i), float(i), float(i), i)
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    try:
+        for _ in range(20000):
+            tick = store.quote("X_EQ")
+            assert tick.last == tick.bid == tick.ask == tick.volume
+    finally:
+        stop.set()
+        writer.join()
+
+
+def test_stats():
+    store = TickStore(capacity=8)
+    store.track(["A_EQ", "B_EQ"])
+    store.begin_session()
+    store.update("A_EQ", 1.0)
+    stats = store.stats()
+    assert (stats["live"], stats["tracked_scrips"], stats["scrips_with_ticks"], stats["updates"]) == (True, 2, 1, 1)
+
+
+def test_replay_feed_fills_the_store_and_ends_the_session(tmp_path):
+    ticks = synthesize(["ITC_EQ", "TCS_EQ"], seconds=2, rate=50, seed=1)
+    path = tmp_path / "ticks.jsonl"
+    path.write_text("".join(json.dumps(tick) + "\n" for tick in ticks), encoding="utf-8")
+    store = TickStore(capacity=4)
+    feed = ReplayFeed(store, str(path), speed=0, loop=False)
+    feed.run()
+    assert feed.stats()["replayed"] == len(ticks)
+    assert store.stats()["updates"] == len(ticks)
+    assert store.stats()["tracked_scrips"] == 2
+    # A finished replay ends its session, so callers fall back to REST quotes
+    assert not store.live
+    assert store.price("ITC_EQ") is None
+
+
+def test_scrips_for(store):
+    assert scrips_for(store) == ["ASIANPAINT_EQ", "TCS_EQ", "INFY_EQ"]
+
+
+def test_old_ticks_are_not_served_while_live(monkeypatch):
+    import tick_store
+
+    store = TickStore(capacity=2, max_age=5.0)
+    store.track(["ITC_EQ"])
+    store.begin_session()
+    now = [1000.0]
+    monkeypatch.setattr(tick_store.time, "time", lambda: now[0])
+    store.update("ITC_EQ", 451.0)
+    now[0] += 4.9
+    assert store.price("ITC_EQ") == 451.0
+    now[0] += 0.2
+    assert store.live and store.price("ITC_EQ") is None
+    store.update("ITC_EQ", 452.0)
+    assert store.price("ITC_EQ") == 452.0
+
+
+def test_reader_gives_up_on_a_row_stuck_mid_write():
+    store = TickStore(capacity=1)
+    store.track(["X_EQ"])
+    store.begin_session()
+    store.update("X_EQ", 1.0)
+    store.seq[0] += 1  # as if the writer died between its two increments
+    assert store.quote("X_EQ") is None
+    assert store.stats()["contended_reads"] == 1
+    store.seq[0] += 1
+    assert store.price("X_EQ") == 1.0
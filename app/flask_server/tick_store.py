@@ -0,0 +1,152 @@
+"""
+In-memory table of the latest streamed tick per scrip, preallocated so the feed never allocates per update
+"""
+import os
+import threading
+import time
+from typing import Dict, Iterable, NamedTuple, Optional
+
+import numpy as np
+
+# Rows reserved up front; scrips beyond this are not tracked and fall back to REST quotes
+TICK_STORE_CAPACITY = int(os.getenv("TICK_STORE_CAPACITY", "2048"))
+# Ticks received longer ago than this are not served even while the feed is live
+TICK_MAX_AGE_SECONDS = float(os.getenv("TICK_MAX_AGE_SECONDS", "15"))
+# Reads of a row that keeps changing under the reader give up after this many tries
+QUOTE_MAX_RETRIES = 64
+
+
+class Tick(NamedTuple):
+    scrip: str
+    last: float
+    bid: float
+    ask: float
+    volume: int
+    # Exchange timestamp (epoch seconds) when the feed sends one, else the receive time
+    exchange_time: float
+    received: float
+
+
+class TickStore:
+    """Latest last-trade, bid/ask and volume per scrip in fixed numpy columns.
+
+    Each scrip owns one row for the life of the store; `update` overwrites it
+    in place. Only the feed writes, under a lock. Readers take no lock: every
+    row carries a sequence number that is odd while a write is in progress,
+    and `quote` retries when it changes under it, so a reader never returns a
+    half-written row. A reader yields between tries (the writer may be a
+    green thread) and gives up after QUOTE_MAX_RETRIES, returning None.
+
+    Ticks are only served while a feed session is live and for `max_age`
+    seconds after they arrive, so a feed that stays connected but stops
+    sending does not serve old prices. `begin_session` starts a session and
+    `end_session` marks every row stale (on disconnect or end of a replay).
+    Whenever `quote` returns None callers fall back to REST quotes.
+    """
+
+    def __init__(self, capacity: int = TICK_STORE_CAPACITY, max_age: float = TICK_MAX_AGE_SECONDS):
+        self.capacity = capacity
+        self.max_age = max_age
+        self.last = np.full(capacity, np.nan)
+        self.bid = np.full(capacity, np.nan)
+        self.ask = np.full(capacity, np.nan)
+        self.volume = np.zeros(capacity, dtype=np.int64)
+        self.exchange_time = np.zeros(capacity)
+        self.received = np.zeros(capacity)
+        self.session = np.zeros(capacity, dtype=np.int64)
+        self.seq = np.zeros(capacity, dtype=np.int64)
+        self._rows: Dict[str, int] = {}
+        self._scrips = []
+        self._lock = threading.Lock()
+        self._session = 0
+        self.live = False
+        self.updates = 0
+        self.dropped = 0
+        self.contended = 0
+
+    def track(self, scrips: Iterable[str]) -> int:
+        """Reserve rows for `scrips`; returns how many could not be tracked for lack of capacity"""
+        missing = 0
+        with self._lock:
+            for scrip in scrips:
+                if scrip in self._rows:
+                    continue
+                if len(self._scrips) >= self.capacity:
+                    missing += 1
+                    continue
+                self._rows[scrip] = len(self._scrips)
+                self._scrips.append(scrip)
+        return missing
+
+    def scrips(self):
+        return tuple(self._scrips)
+
+    def begin_session(self):
+        with self._lock:
+            self._session += 1
+            self.live = True
+
+    def end_session(self):
+        with self._lock:
+            self.live = False
+
+    def update(self, scrip: str, last: float, bid: float = np.nan, ask: float = np.nan,
+               volume: int = 0, exchange_time: Optional[float] = None):
+        row = self._rows.get(scrip)
+        if row is None:
+            self.dropped += 1
+            return
+        received = time.time()
+        with self._lock:
+            self.seq[row] += 1
+            self.last[row] = last
+            self.bid[row] = bid
+            self.ask[row] = ask
+            self.volume[row] = volume
+            self.exchange_time[row] = exchange_time or received
+            self.received[row] = received
+            self.session[row] = self._session
+            self.seq[row] += 1
+            self.updates += 1
+
+    def quote(self, scrip: str) -> Optional[Tick]:
+        """Latest tick for `scrip` from the live session, or None if there is no fresh one"""
+        row = self._rows.get(scrip)
+        if row is None or not self.live:
+            return None
+        for _ in range(QUOTE_MAX_RETRIES):
+            seq = int(self.seq[row])
+            if not seq & 1:
+                tick = Tick(scrip, float(self.last[row]), float(self.bid[row]), float(self.ask[row]),
+                            int(self.volume[row]), float(self.exchange_time[row]), float(self.received[row]))
+                session = int(self.session[row])
+                if int(self.seq[row]) == seq:
+                    break
+            time.sleep(0)
+        else:
+            self.contended += 1
+            return None
+        if session != self._session or np.isnan(tick.last) or time.time() - tick.received > self.max_age:
+            return None
+        return tick
+
+    def price(self, scrip: str) -> Optional[float]:
+        tick = self.quote(scrip)
+        return tick.last if tick is not None else None
+
+    def stats(self) -> dict:
+        with self._lock:
+            tracked = len(self._scrips)
+            fresh = int(np.count_nonzero(self.session[:tracked] == self._session)) if self.live else 0
+            newest = float(self.received[:tracked].max()) if tracked else 0.0
+            return {
+                "live": self.live,
+                "capacity": self.capacity,
+                "tracked_scrips": tracked,
+                "scrips_with_ticks": fresh,
+                "updates": self.updates,
+                "dropped": self.dropped,
+                "contended_reads": self.contended,
+                "max_age_seconds": self.max_age,
+                "seconds_since_last_tick": round(time.time() - newest, 3) if newest else None,
+            }
@@ -53,6 +53,14 @@ const connectToFlask = () => {
     console.error("Flask connection error:", error.message);
   });
 
+  // Streamed LLM text for a message still being processed; relayed as-is,
+  // the final message_response below still carries the complete answer
+  flaskSocket.on("message_chunk", (chunk) => {
+    if (chunk?.correlation_id) {
+      io.to(chunk.correlation_id).emit('message_chunk', chunk);
+    }
+  });
+
   flaskSocket.on("message_response", (response) => {
     // Sanitize response content if it exists and is a string
     if (response?.content && typeof response.content === 'string') {
@@ -70,6 +78,7 @@ const connectToFlask = () => {
         contentType: response.contentType || 'text',
         status: response.status || 'success',
         error: response.error,
+        degraded: response.degraded || false,
         timestamp: response.timestamp || Date.now()
       });
     } else {